@@ -0,0 +1,174 @@
+"""
+Счётчики задач по статусам для эндпоинтов статистики.
+
+task_counters хранит число задач по (scope_type, scope_id, status) для
+досок, групп и исполнителей. Каждый обработчик, который создаёт, удаляет,
+переносит или переназначает задачи, собирает CounterDeltas и применяет их
+в своей транзакции — счётчики фиксируются или откатываются вместе с задачами.
+
+Пересчитать или проверить таблицу с нуля:
+
+    python -m backend.counters [--check]
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import delete, func, insert, literal, select, text, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import TaskCounters, Tasks, users_tasks_table
+
+
+def status_value(status) -> str:
+    return status.value if hasattr(status, "value") else str(status)
+
+
+class CounterDeltas:
+    """Накопитель изменений счётчиков в пределах одной транзакции"""
+
+    def __init__(self):
+        self._deltas: Dict[tuple, int] = defaultdict(int)
+
+    def add(self, status, board_id: Optional[int] = None, group_id: Optional[int] = None,
+            user_ids: Iterable[int] = (), sign: int = 1) -> None:
+        status = status_value(status)
+        if board_id is not None:
+            self._deltas[("board", board_id, status)] += sign
+        if group_id is not None:
+            self._deltas[("group", group_id, status)] += sign
+        for user_id in user_ids:
+            self._deltas[("user", user_id, status)] += sign
+
+    def remove(self, status, board_id: Optional[int] = None, group_id: Optional[int] = None,
+               user_ids: Iterable[int] = ()) -> None:
+        self.add(status, board_id, group_id, user_ids, sign=-1)
+
+    async def apply(self, db: AsyncSession) -> None:
+        """
+        Один INSERT ... ON CONFLICT DO UPDATE на все изменившиеся счётчики.
+        Строки идут в порядке ключа, чтобы параллельные транзакции
+        блокировали их в одном порядке и не попадали во взаимоблокировку.
+        """
+        rows = [
+            {"scope_type": scope_type, "scope_id": scope_id, "status": status, "count": delta}
+            for (scope_type, scope_id, status), delta in sorted(self._deltas.items())
+            if delta
+        ]
+        if not rows:
+            return
+        dialect_insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+        stmt = dialect_insert(TaskCounters).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TaskCounters.scope_type, TaskCounters.scope_id, TaskCounters.status],
+            set_={"count": TaskCounters.count + stmt.excluded.count},
+        )
+        await db.execute(stmt)
+
+
+async def read_counts(db: AsyncSession, scope_type: str, scope_id: int) -> Dict[str, int]:
+    """Задачи по статусам для одной доски/группы/исполнителя — чтение по первичному ключу"""
+    rows = await db.execute(
+        select(TaskCounters.status, TaskCounters.count)
+        .where(TaskCounters.scope_type == scope_type, TaskCounters.scope_id == scope_id, TaskCounters.count > 0)
+    )
+    return {status_value(status): count for status, count in rows}
+
+
+async def read_total_counts(db: AsyncSession) -> Dict[str, int]:
+    """
+    Задачи по статусам во всей системе — сумма по доскам плюс задачи без
+    доски, которые досчитываются по индексу ix_tasks_board_id_task_id.
+    Отдельный глобальный счётчик стал бы одной горячей строкой, через
+    блокировку которой проходила бы каждая запись задач.
+    """
+    totals: Dict[str, int] = defaultdict(int)
+    rows = await db.execute(
+        select(TaskCounters.status, func.sum(TaskCounters.count))
+        .where(TaskCounters.scope_type == "board")
+        .group_by(TaskCounters.status)
+    )
+    for status, count in rows:
+        totals[status_value(status)] += int(count or 0)
+    rows = await db.execute(
+        select(Tasks.status, func.count()).where(Tasks.board_id.is_(None)).group_by(Tasks.status)
+    )
+    for status, count in rows:
+        totals[status_value(status)] += count
+    return {status: count for status, count in totals.items() if count}
+
+
+def counted_query():
+    """Эталонные значения счётчиков, посчитанные по tasks и users_tasks"""
+    return union_all(
+        select(literal("board").label("scope_type"), Tasks.board_id.label("scope_id"), Tasks.status, func.count().label("count"))
+        .where(Tasks.board_id.is_not(None)).group_by(Tasks.board_id, Tasks.status),
+        select(literal("group"), Tasks.group_id, Tasks.status, func.count())
+        .where(Tasks.group_id.is_not(None)).group_by(Tasks.group_id, Tasks.status),
+        select(literal("user"), users_tasks_table.c.user_id, Tasks.status, func.count())
+        .join(users_tasks_table, users_tasks_table.c.task_id == Tasks.task_id)
+        .group_by(users_tasks_table.c.user_id, Tasks.status),
+    )
+
+
+async def find_drift(db: AsyncSession) -> Dict[tuple, tuple]:
+    """Расхождения {(scope_type, scope_id, status): (в счётчике, на самом деле)}"""
+    stored = {
+        (scope_type, scope_id, status_value(status)): count
+        for scope_type, scope_id, status, count in await db.execute(
+            select(TaskCounters.scope_type, TaskCounters.scope_id, TaskCounters.status, TaskCounters.count)
+        )
+    }
+    actual = {
+        (scope_type, scope_id, status_value(status)): count
+        for scope_type, scope_id, status, count in await db.execute(counted_query())
+    }
+    return {
+        key: (stored.get(key, 0), actual.get(key, 0))
+        for key in stored.keys() | actual.keys()
+        if stored.get(key, 0) != actual.get(key, 0)
+    }
+
+
+async def rebuild_counters(db: AsyncSession) -> None:
+    """Пересчитывает task_counters с нуля в текущей транзакции"""
+    if db.bind.dialect.name == "postgresql":
+        # Пишущие транзакции подождут: иначе их дельты лягут поверх
+        # пересчёта, который их ещё не видит
+        await db.execute(text("LOCK TABLE task_counters IN EXCLUSIVE MODE"))
+    await db.execute(delete(TaskCounters))
+    counted = counted_query().subquery()
+    await db.execute(
+        insert(TaskCounters).from_select(
+            ["scope_type", "scope_id", "status", "count"],
+            select(counted.c.scope_type, counted.c.scope_id, counted.c.status, counted.c.count),
+        )
+    )
+
+
+async def reconcile(check: bool) -> int:
+    from .db import SessionLocal, engine
+
+    try:
+        async with SessionLocal() as db:
+            drift = await find_drift(db)
+            for (scope_type, scope_id, status), (stored, actual) in sorted(drift.items()):
+                print(f"{scope_type}:{scope_id} {status}: stored {stored}, actual {actual}")
+            print(f"{len(drift)} counters out of sync")
+            if check:
+                return 1 if drift else 0
+            await rebuild_counters(db)
+            await db.commit()
+            print("Counters rebuilt")
+            return 0
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild task status counters from the tasks table")
+    parser.add_argument("--check", action="store_true", help="only report drift, exit with 1 if any")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(reconcile(args.check)))
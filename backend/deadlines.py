@@ -0,0 +1,252 @@
+"""
+Напоминания о дедлайнах: события "deadline_due_soon" и "deadline_overdue".
+
+Каждый воркер держит открытые задачи, чей дедлайн попадает в ближайшее
+окно (deadline_due_soon_minutes + deadline_lookahead_hours), в min-куче
+по моменту напоминания: deadline - due_soon для deadline_due_soon, сам
+дедлайн для deadline_overdue. Одна фоновая задача спит до вершины кучи
+или пока её не разбудит хук. create/update/delete и массовая смена
+статуса вызывают хуки после commit, так что куча следит за изменениями,
+не перечитывая таблицу. Запись изменившейся задачи в куче не ищется:
+её пропускают, когда она всплывёт, — текущий дедлайн задачи хранится в словаре.
+
+Окно (пере)загружается при старте и раз в deadline_reload_interval одним
+запросом по диапазону частичного индекса ix_tasks_open_deadline, поэтому
+при перезапуске ничего не теряется: напоминания, наступившие, пока процесс
+лежал (не дальше deadline_overdue_lookback_hours назад), срабатывают сразу
+после загрузки. Перед отправкой задачи перечитываются, а каждое напоминание
+закрепляется строкой task_reminders (задача, вид, дедлайн) в одной
+транзакции с его событием outbox. Поэтому при нескольких воркерах или после
+перезапуска каждое напоминание уходит один раз. До сокетов события доходят
+через outbox и ws_notify, как и остальные события задач.
+"""
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .db import SessionLocal
+from .loaders import load_task_people
+from .models import TaskReminders, Tasks, TaskStatusEnum
+from .outbox import enqueue_events, wake_dispatcher
+from .routers.ws_notify import task_topics
+
+logger = logging.getLogger(__name__)
+
+DUE_SOON = "due_soon"
+OVERDUE = "overdue"
+# Напоминаний в одной транзакции
+REMINDER_BATCH = 500
+# Пауза перед повтором после ошибки, сек.
+RETRY_DELAY = 30.0
+# Литерал, а не параметр: только так Postgres применит частичный индекс ix_tasks_open_deadline
+OPEN_TASK = text("tasks.status <> 'done'")
+
+# (когда сработать, task_id, вид, дедлайн)
+Entry = Tuple[datetime, int, str, datetime]
+
+
+def due_soon_delta() -> timedelta:
+    return timedelta(minutes=settings.deadline_due_soon_minutes)
+
+
+async def claim_reminders(db: AsyncSession, reminders: List[dict]) -> List[Tuple[int, str]]:
+    """Записывает отметки об отправке; возвращает только те (task_id, вид), что ещё не были отправлены"""
+    dialect_insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    stmt = (
+        dialect_insert(TaskReminders)
+        .values(reminders)
+        .on_conflict_do_nothing()
+        .returning(TaskReminders.task_id, TaskReminders.kind)
+    )
+    return [tuple(row) for row in await db.execute(stmt)]
+
+
+async def send_reminders(due: List[Entry], now: datetime) -> int:
+    """Публикует напоминания через outbox, перепроверив задачи; возвращает число событий"""
+    task_ids = list({task_id for _, task_id, _, _ in due})
+    async with SessionLocal() as db:
+        rows = await db.execute(
+            select(Tasks.task_id, Tasks.deadline, Tasks.status, Tasks.board_id, Tasks.group_id)
+            .where(Tasks.task_id.in_(task_ids))
+        )
+        tasks = {row.task_id: row for row in rows}
+        reminders = []
+        for _, task_id, kind, deadline in due:
+            task = tasks.get(task_id)
+            if task is None or task.status == TaskStatusEnum.done or task.deadline != deadline:
+                continue
+            if kind == DUE_SOON and deadline <= now:
+                # Уже просрочена — хватит deadline_overdue
+                continue
+            reminders.append({"task_id": task_id, "kind": kind, "deadline": deadline, "created_at": now})
+        if not reminders:
+            return 0
+        claimed = await claim_reminders(db, reminders)
+        if not claimed:
+            await db.rollback()
+            return 0
+
+        people, assigners = await load_task_people(db, [task_id for task_id, _ in claimed])
+        timestamp = int(now.timestamp() * 1000)
+        events = []
+        for task_id, kind in claimed:
+            task = tasks[task_id]
+            notify_ids = sorted(set(people.get(task_id, []) + assigners.get(task_id, [])))
+            events.append(({
+                "event": f"deadline_{kind}",
+                "user_ids": notify_ids,
+                "task_id": task_id,
+                "deadline": task.deadline.isoformat(),
+                "timestamp": timestamp,
+            }, task_topics(notify_ids, task.board_id, task.group_id)))
+        enqueue_events(db, events)
+        await db.commit()
+    wake_dispatcher()
+    return len(events)
+
+
+class DeadlineScheduler:
+    """
+    Куча ближайших напоминаний в памяти процесса. Хуки task_changed /
+    task_removed / refresh вызываются после commit и не ходят в БД
+    (кроме refresh); всё остальное делает фоновая задача.
+    """
+
+    def __init__(self):
+        self._heap: List[Entry] = []
+        self._deadlines: Dict[int, datetime] = {}  # задача -> дедлайн, по которому в куче есть напоминания
+        self._horizon: Optional[datetime] = None  # дедлайны до этого момента загружены в окно
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _push(self, task_id: int, deadline: datetime) -> None:
+        self._deadlines[task_id] = deadline
+        heapq.heappush(self._heap, (deadline - due_soon_delta(), task_id, DUE_SOON, deadline))
+        heapq.heappush(self._heap, (deadline, task_id, OVERDUE, deadline))
+
+    def task_changed(self, task_id: int, deadline: Optional[datetime], status) -> None:
+        """Задача создана или изменена; status — TaskStatusEnum или его значение"""
+        if self._horizon is None:
+            # Окно ещё не загружено — задачу подхватит первая загрузка
+            return
+        done = status in (TaskStatusEnum.done, TaskStatusEnum.done.value)
+        lookback = datetime.now() - timedelta(hours=settings.deadline_overdue_lookback_hours)
+        if done or deadline is None or deadline > self._horizon or deadline < lookback:
+            self.task_removed(task_id)
+            return
+        if self._deadlines.get(task_id) == deadline:
+            return
+        self._push(task_id, deadline)
+        self._wake()
+
+    def task_removed(self, task_id: int) -> None:
+        # Записи в куче остаются и будут пропущены, когда до них дойдёт очередь
+        self._deadlines.pop(task_id, None)
+
+    async def refresh(self, db: AsyncSession, task_ids: Iterable[int]) -> None:
+        """Перечитывает дедлайны задач после массового изменения"""
+        task_ids = list(task_ids)
+        if self._horizon is None or not task_ids:
+            return
+        rows = await db.execute(
+            select(Tasks.task_id, Tasks.deadline, Tasks.status).where(Tasks.task_id.in_(task_ids))
+        )
+        for task_id, deadline, status in rows:
+            self.task_changed(task_id, deadline, status)
+
+    async def reload(self) -> int:
+        """Заново строит кучу из БД по окну [now - lookback, now + due_soon + lookahead]"""
+        now = datetime.now()
+        lookback = now - timedelta(hours=settings.deadline_overdue_lookback_hours)
+        horizon = now + due_soon_delta() + timedelta(hours=settings.deadline_lookahead_hours)
+        async with SessionLocal() as db:
+            rows = (await db.execute(
+                select(Tasks.task_id, Tasks.deadline)
+                .where(OPEN_TASK, Tasks.deadline >= lookback, Tasks.deadline <= horizon)
+                .order_by(Tasks.deadline, Tasks.task_id)
+            )).all()
+            # Отметки по дедлайнам старше окна больше не нужны
+            await db.execute(delete(TaskReminders).where(TaskReminders.deadline < lookback))
+            await db.commit()
+        self._heap, self._deadlines = [], {}
+        for task_id, deadline in rows:
+            self._push(task_id, deadline)
+        self._horizon = horizon
+        return len(rows)
+
+    async def fire_due(self) -> int:
+        """Отправляет наступившие напоминания (не больше REMINDER_BATCH за раз)"""
+        now = datetime.now()
+        due: List[Entry] = []
+        while self._heap and self._heap[0][0] <= now and len(due) < REMINDER_BATCH:
+            entry = heapq.heappop(self._heap)
+            if self._deadlines.get(entry[1]) == entry[3]:
+                due.append(entry)
+        if not due:
+            return 0
+        try:
+            sent = await send_reminders(due, now)
+        except BaseException:
+            # Не отправлено — вернём в кучу до следующей попытки
+            for entry in due:
+                heapq.heappush(self._heap, entry)
+            raise
+        for _, task_id, kind, deadline in due:
+            if kind == OVERDUE and self._deadlines.get(task_id) == deadline:
+                self._deadlines.pop(task_id)
+        return sent
+
+    def _delay(self, reload_at: datetime) -> float:
+        """Сколько спать: до ближайшего напоминания или до перезагрузки окна"""
+        wake_at = min(self._heap[0][0], reload_at) if self._heap else reload_at
+        return max((wake_at - datetime.now()).total_seconds(), 0.0)
+
+    async def _run(self) -> None:
+        reload_at = datetime.min
+        while True:
+            delay = None
+            try:
+                if datetime.now() >= reload_at:
+                    loaded = await self.reload()
+                    reload_at = datetime.now() + timedelta(seconds=settings.deadline_reload_interval)
+                    logger.info(f"Loaded {loaded} upcoming deadlines")
+                sent = await self.fire_due()
+                if sent:
+                    logger.info(f"Sent {sent} deadline reminders")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Deadline reminders failed: {str(e)}")
+                delay = RETRY_DELAY
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay if delay is not None else self._delay(reload_at))
+            except asyncio.TimeoutError:
+                pass
+
+
+deadline_scheduler = DeadlineScheduler()
@@ -0,0 +1,193 @@
+"""
+Скачивание вложений с поддержкой HTTP Range и кэширования.
+
+- Range: один диапазон — 206 с Content-Range; несколько — 206
+  multipart/byteranges; диапазон за концом файла — 416. If-Range
+  учитывается.
+- Валидаторы: файлы, хранимые по содержимому, получают сильный ETag
+  (sha256) и неизменяемы, поэтому клиенты кэшируют их на год без
+  перепроверки. Старые файлы /uploads/<имя> получают слабый ETag из
+  размера и mtime и перепроверяются при каждом обращении.
+- Тело: если сервер поддерживает ASGI-расширение "http.response.zerocopy",
+  части отправляются через sendfile из открытого файла. Иначе файл
+  читается блоками в рабочем потоке, как в FileResponse из Starlette.
+"""
+import mimetypes
+import os
+import re
+import secrets
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from fastapi import Request, Response
+from starlette.types import Receive, Scope, Send
+
+from .etag import etag_matches
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+# Больше диапазонов (после слияния пересекающихся) — отдаём файл целиком
+MAX_RANGES = 16
+
+RANGE_RE = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Range: bytes=... -> отсортированные непересекающиеся (start, end)
+    включительно. None — заголовок непонятен, его следует игнорировать
+    (RFC 9110, 14.2); RangeNotSatisfiable — ни один диапазон не попал в файл.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+    ranges = []
+    for part in spec.split(","):
+        match = RANGE_RE.match(part)
+        if not match or match.groups() == ("", ""):
+            return None
+        first, last = match.groups()
+        if not first:
+            # bytes=-N: последние N байт
+            if int(last) == 0:
+                continue
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+        if start < size:
+            ranges.append((start, end))
+    if not ranges:
+        raise RangeNotSatisfiable
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged if len(merged) <= MAX_RANGES else None
+
+
+class RangeFileResponse(Response):
+    """Отдаёт части файла: [(заголовок части, start, end)] и завершающие байты"""
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: str, status_code: int, headers: dict,
+                 parts: List[Tuple[bytes, int, int]], epilogue: bytes = b""):
+        self.path = path
+        self.parts = parts
+        self.epilogue = epilogue
+        headers["Content-Length"] = str(
+            sum(len(prefix) + end - start + 1 for prefix, start, end in parts) + len(epilogue)
+        )
+        super().__init__(status_code=status_code, headers=headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        zerocopy = "http.response.zerocopy" in scope.get("extensions", {})
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            for prefix, start, end in self.parts:
+                if prefix:
+                    await send({"type": "http.response.body", "body": prefix, "more_body": True})
+                if zerocopy:
+                    await send({
+                        "type": "http.response.zerocopy",
+                        "file": file.wrapped,
+                        "offset": start,
+                        "count": end - start + 1,
+                        "more_body": True,
+                    })
+                    continue
+                await file.seek(start)
+                remaining = end - start + 1
+                while remaining:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        raise RuntimeError(f"File at path {self.path} was truncated while sending")
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": self.epilogue, "more_body": False})
+
+
+def not_modified_since(request: Request, mtime: float) -> bool:
+    header = request.headers.get("if-modified-since")
+    if not header or "if-none-match" in request.headers:
+        return False
+    try:
+        return int(mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def range_applies(request: Request, etag: str, last_modified: str) -> bool:
+    """If-Range: диапазон действует, только если у клиента та же версия (сильное сравнение)"""
+    if_range = request.headers.get("if-range")
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return not etag.startswith("W/") and if_range == etag
+    return if_range == last_modified
+
+
+def file_response(request: Request, path: str, filename: str, sha256: Optional[str] = None) -> Response:
+    """
+    Ответ на GET/HEAD файла вложения. sha256 — для файлов из
+    контентно-адресуемого хранилища: содержимое по адресу не меняется.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    etag = f'"{sha256}"' if sha256 else f'W/"{size:x}-{int(stat.st_mtime):x}"'
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    headers = {
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": IMMUTABLE if sha256 else REVALIDATE,
+        "Accept-Ranges": "bytes",
+    }
+    if etag_matches(request, etag) or not_modified_since(request, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+    ranges = None
+    range_header = request.headers.get("range")
+    if range_header and range_applies(request, etag, last_modified):
+        try:
+            ranges = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if not ranges:
+        headers["Content-Type"] = media_type
+        return RangeFileResponse(path, 200, headers, [(b"", 0, size - 1)] if size else [])
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Type"] = media_type
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return RangeFileResponse(path, 206, headers, [(b"", start, end)])
+
+    boundary = secrets.token_hex(16)
+    headers["Content-Type"] = f"multipart/byteranges; boundary={boundary}"
+    parts = [
+        (
+            (b"\r\n" if i else b"")
+            + f"--{boundary}\r\nContent-Type: {media_type}\r\nContent-Range: bytes {start}-{end}/{size}\r\n\r\n".encode(),
+            start,
+            end,
+        )
+        for i, (start, end) in enumerate(ranges)
+    ]
+    return RangeFileResponse(path, 206, headers, parts, f"\r\n--{boundary}--\r\n".encode())
@@ -0,0 +1,72 @@
+"""
+Быстрая сериализация горячих списков задач.
+
+Эндпоинты Page[Task] выбирают колонки задач простыми кортежами (без
+ORM-объектов и identity map), добавляют людей и вложения, загруженные
+пачкой на всю страницу, и кодируют страницу orjson сразу в байты. Модель
+Pydantic на строку не строится, и FastAPI не валидирует возвращённый
+Response по response_model — он остаётся только для схемы.
+
+Словари повторяют порядок полей schemas.task.Task, поэтому ответ тот же,
+что и по ORM-пути (loaders.to_task_schemas). Бенчмарк:
+
+    python -m bench.serialization
+"""
+from typing import List, Mapping, Optional, Sequence
+
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .loaders import load_task_files, load_task_people
+from .models import Tasks
+from .pagination import PageParams, paginate_rows
+
+# Колонки tasks, которые попадают в Task
+TASK_COLUMNS = (
+    Tasks.title, Tasks.description, Tasks.deadline, Tasks.group_id, Tasks.board_id,
+    Tasks.task_id, Tasks.created_at, Tasks.updated_at, Tasks.status, Tasks.priority,
+)
+
+
+def select_task_rows(*where) -> Select:
+    return select(*TASK_COLUMNS).where(*where)
+
+
+async def task_dicts(db: AsyncSession, rows: Sequence) -> List[dict]:
+    """Строки TASK_COLUMNS -> словари в форме Task (два доп. запроса на страницу)"""
+    task_ids = [row.task_id for row in rows]
+    user_ids, assigner_ids = await load_task_people(db, task_ids)
+    files = await load_task_files(db, task_ids)
+
+    items = []
+    for title, description, deadline, group_id, board_id, task_id, created_at, updated_at, status, priority in rows:
+        assigners = sorted(assigner_ids.get(task_id, ()))
+        task_files = files.get(task_id, [])
+        items.append({
+            "title": title,
+            "description": description,
+            "deadline": deadline,
+            "assigned_files": [f["path"] for f in task_files],
+            "group_id": group_id,
+            "board_id": board_id,
+            "assigner_id": assigners[0] if assigners else None,
+            "task_id": task_id,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "status": status.value,
+            "priority": priority,
+            "user_ids": sorted(user_ids.get(task_id, ())),
+            "assigner_ids": assigners,
+            "files": task_files,
+        })
+    return items
+
+
+async def task_page_response(
+    db: AsyncSession, query: Select, keys: Sequence, page: PageParams,
+    headers: Optional[Mapping[str, str]] = None,
+) -> ORJSONResponse:
+    """Страница Page[Task] готовыми байтами; headers — например, ETag из not_modified"""
+    rows, next_cursor = await paginate_rows(db, query, keys, page)
+    return ORJSONResponse({"items": await task_dicts(db, rows), "next_cursor": next_cursor}, headers=headers)
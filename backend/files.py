@@ -0,0 +1,270 @@
+"""
+Вложения задач: где лежат загруженные файлы и как они описываются.
+
+Загрузки хранятся по содержимому: байты лежат в
+UPLOAD_DIR/sha256/<2 hex-символа>/<sha256>, а URL вложения —
+/uploads/<sha256>/<исходное имя>. Одинаковые файлы хранятся один раз,
+как бы они ни назывались. Файлы, загруженные раньше, остаются прямо
+в UPLOAD_DIR и доступны по прежним URL /uploads/<имя>.
+
+Вложения — строки task_files (путь, исходное имя, размер, sha256); они
+создаются вместе с задачей и грузятся на страницу в backend/loaders.py.
+"""
+import hashlib
+import os
+from functools import lru_cache
+import re
+import tempfile
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from fastapi import HTTPException, Request
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from multipart.exceptions import FormParserError
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+from .models import TaskFiles
+
+UPLOAD_DIR = os.path.join(os.path.dirname(__file__), 'uploads')
+BLOB_DIR = os.path.join(UPLOAD_DIR, 'sha256')
+# Недописанные файлы: на той же файловой системе, чтобы os.replace был атомарным
+PARTIAL_DIR = os.path.join(UPLOAD_DIR, '.partial')
+UPLOAD_URL = "/uploads/"
+HASH_CHUNK = 1024 * 1024
+# Запас на заголовки частей multipart сверх upload_max_bytes
+MULTIPART_OVERHEAD = 64 * 1024
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+# Хэшей старых файлов /uploads/<имя> в кэше процесса
+LEGACY_HASH_CACHE = 4096
+
+os.makedirs(BLOB_DIR, exist_ok=True)
+os.makedirs(PARTIAL_DIR, exist_ok=True)
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(BLOB_DIR, sha256[:2], sha256)
+
+
+def content_url(sha256: str, name: str) -> str:
+    return f"{UPLOAD_URL}{sha256}/{quote(name)}"
+
+
+def safe_name(filename: Optional[str]) -> str:
+    """Имя файла от клиента без каталогов; пустое — 'file'"""
+    return os.path.basename((filename or "").replace("\\", "/")).strip() or "file"
+
+
+def parse_upload_url(url_path: str) -> Tuple[Optional[str], str]:
+    """'/uploads/<sha256>/<name>' -> (sha256, name); '/uploads/<name>' -> (None, name)"""
+    name = url_path[len(UPLOAD_URL):] if url_path.startswith(UPLOAD_URL) else url_path
+    digest, _, rest = name.partition("/")
+    if rest and SHA256_RE.match(digest):
+        return digest, unquote(rest)
+    return None, unquote(os.path.basename(url_path)) or url_path
+
+
+def upload_path(url_path: str) -> Optional[str]:
+    """Путь файла вложения на диске; None — файл не наш или его нет"""
+    if not url_path.startswith(UPLOAD_URL):
+        return None
+    digest, name = parse_upload_url(url_path)
+    path = blob_path(digest) if digest else os.path.join(UPLOAD_DIR, os.path.basename(name))
+    return path if os.path.isfile(path) else None
+
+
+@lru_cache(maxsize=LEGACY_HASH_CACHE)
+def legacy_sha256(path: str, size: int, mtime_ns: int) -> str:
+    """
+    sha256 старого файла из UPLOAD_DIR. Размер и mtime входят в ключ кэша:
+    файл читается один раз, пока его не перезапишут
+    """
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def describe_file(url_path: str) -> dict:
+    """Метаданные вложения; размер и хэш — только для файлов из UPLOAD_DIR"""
+    digest, name = parse_upload_url(url_path)
+    description = {"path": url_path, "name": name, "size": None, "sha256": None}
+    path = upload_path(url_path)
+    if path is None:
+        return description
+    stat = os.stat(path)
+    description["size"] = stat.st_size
+    # Для файлов по содержимому хэш — это имя файла, он проверен при загрузке
+    description["sha256"] = digest or legacy_sha256(path, stat.st_size, stat.st_mtime_ns)
+    return description
+
+
+async def describe_files(url_paths: Iterable[str]) -> Dict[str, dict]:
+    """Метаданные по каждому различному пути; чтение файлов — в пуле потоков"""
+    unique = list(dict.fromkeys(url_paths))
+    if not unique:
+        return {}
+    return dict(zip(unique, await run_in_threadpool(lambda: [describe_file(p) for p in unique])))
+
+
+def task_file_rows(task_id: int, url_paths: List[str], described: Dict[str, dict], first_position: int = 0) -> List[dict]:
+    """Строки task_files для задачи в порядке вложений"""
+    return [
+        {**described[url_path], "task_id": task_id, "position": position}
+        for position, url_path in enumerate(url_paths, first_position)
+    ]
+
+
+async def attach_files(db: AsyncSession, task_id: int, url_paths: List[str], first_position: int = 0) -> List[dict]:
+    """Добавляет вложения задаче в текущей транзакции; метаданные файлов читаются в пуле потоков"""
+    rows = task_file_rows(task_id, url_paths, await describe_files(url_paths), first_position)
+    if rows:
+        await db.execute(insert(TaskFiles), rows)
+    return rows
+
+
+def store_blob(partial_path: str, sha256: str) -> bool:
+    """
+    Переносит дописанный файл в хранилище под его хэшем. Если такое
+    содержимое уже есть, новый файл удаляется; возвращает True в этом случае.
+    """
+    target = blob_path(sha256)
+    if os.path.exists(target):
+        os.remove(partial_path)
+        return True
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(partial_path, target)
+    return False
+
+
+class BlobWriter:
+    """Запись загрузки во временный файл с подсчётом sha256; методы блокирующие — для пула потоков"""
+
+    def __init__(self):
+        fd, self.partial_path = tempfile.mkstemp(dir=PARTIAL_DIR)
+        self.file = os.fdopen(fd, "wb")
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> None:
+        self.hasher.update(data)
+        self.file.write(data)
+        self.size += len(data)
+
+    def commit(self) -> Tuple[str, int, bool]:
+        """(sha256, размер, был ли уже такой файл)"""
+        self.file.close()
+        sha256 = self.hasher.hexdigest()
+        return sha256, self.size, store_blob(self.partial_path, sha256)
+
+    def discard(self) -> None:
+        self.file.close()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+
+class FilePartParser:
+    """
+    Разбор multipart/form-data по мере чтения тела запроса: данные поля
+    field_name копятся в pending, остальные поля пропускаются
+    """
+
+    def __init__(self, boundary: bytes, field_name: str):
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self.pending: List[bytes] = []
+        self._in_file = False
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        })
+
+    def on_part_begin(self) -> None:
+        self._disposition = b""
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self.pending.append(data[start:end])
+
+    def on_part_end(self) -> None:
+        self._in_file = False
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        # Берём только первый файл поля
+        if name == self.field_name and b"filename" in options and self.filename is None:
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self._in_file = True
+
+
+async def receive_upload(request: Request, field_name: str = "file") -> dict:
+    """
+    Сохраняет файл из multipart-запроса: тело читается потоком, на диск
+    пишется и хэшируется блоками upload_chunk_size в пуле потоков, сверх
+    upload_max_bytes — 413. Готовый файл ложится в хранилище под своим хэшем.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+    limit = settings.upload_max_bytes
+    too_large = HTTPException(status_code=413, detail=f"File is larger than {limit} bytes")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > limit + MULTIPART_OVERHEAD:
+        raise too_large
+
+    parser = FilePartParser(params[b"boundary"], field_name)
+    writer = await run_in_threadpool(BlobWriter)
+    buffer = bytearray()
+    received = 0
+    try:
+        try:
+            async for chunk in request.stream():
+                parser.parser.write(chunk)
+                for data in parser.pending:
+                    buffer += data
+                    received += len(data)
+                parser.pending.clear()
+                if received > limit:
+                    raise too_large
+                while len(buffer) >= settings.upload_chunk_size:
+                    block = bytes(buffer[:settings.upload_chunk_size])
+                    del buffer[:settings.upload_chunk_size]
+                    await run_in_threadpool(writer.write, block)
+            parser.parser.finalize()
+        except FormParserError:
+            raise HTTPException(status_code=400, detail="Malformed multipart body")
+        if parser.filename is None:
+            raise HTTPException(status_code=400, detail=f"Missing file field '{field_name}'")
+        if buffer:
+            await run_in_threadpool(writer.write, bytes(buffer))
+        sha256, size, deduplicated = await run_in_threadpool(writer.commit)
+    except BaseException:
+        await run_in_threadpool(writer.discard)
+        raise
+
+    name = safe_name(parser.filename)
+    return {"file_path": content_url(sha256, name), "name": name, "size": size, "sha256": sha256, "deduplicated": deduplicated}
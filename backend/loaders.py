@@ -0,0 +1,75 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import TaskFiles, Tasks, users_tasks_table, task_assigners_table
+from .schemas.task import Task
+
+
+async def load_task_people(
+    db: AsyncSession, task_ids: Iterable[int]
+) -> Tuple[Dict[int, List[int]], Dict[int, List[int]]]:
+    """
+    Исполнители и назначившие для набора задач одним запросом
+    (вместо ленивых task.users / task.assigners на каждую строку).
+    """
+    task_ids = list(task_ids)
+    user_ids: Dict[int, List[int]] = defaultdict(list)
+    assigner_ids: Dict[int, List[int]] = defaultdict(list)
+    if not task_ids:
+        return user_ids, assigner_ids
+
+    query = union_all(
+        select(users_tasks_table.c.task_id, users_tasks_table.c.user_id, literal(False).label("is_assigner"))
+        .where(users_tasks_table.c.task_id.in_(task_ids)),
+        select(task_assigners_table.c.task_id, task_assigners_table.c.user_id, literal(True).label("is_assigner"))
+        .where(task_assigners_table.c.task_id.in_(task_ids)),
+    )
+    for task_id, user_id, is_assigner in await db.execute(query):
+        (assigner_ids if is_assigner else user_ids)[task_id].append(user_id)
+    return user_ids, assigner_ids
+
+
+async def load_task_files(db: AsyncSession, task_ids: Iterable[int]) -> Dict[int, List[dict]]:
+    """Вложения (словари полей TaskFile) для набора задач одним запросом, в порядке position"""
+    task_ids = list(task_ids)
+    files: Dict[int, List[dict]] = defaultdict(list)
+    if not task_ids:
+        return files
+
+    query = (
+        select(TaskFiles.task_id, TaskFiles.path, TaskFiles.name, TaskFiles.size, TaskFiles.sha256)
+        .where(TaskFiles.task_id.in_(task_ids))
+        .order_by(TaskFiles.task_id, TaskFiles.position)
+    )
+    for task_id, path, name, size, sha256 in await db.execute(query):
+        files[task_id].append({"path": path, "name": name, "size": size, "sha256": sha256})
+    return files
+
+
+def build_task(task: Tasks, user_ids: List[int], assigner_ids: List[int], files: List[dict] = ()) -> Task:
+    return Task(
+        **task.__dict__,
+        assigned_files=[f["path"] for f in files],
+        files=list(files),
+        user_ids=sorted(user_ids),
+        assigner_ids=sorted(assigner_ids),
+        assigner_id=min(assigner_ids) if assigner_ids else None,
+    )
+
+
+async def to_task_schemas(db: AsyncSession, tasks: Sequence[Tasks]) -> List[Task]:
+    """ORM-задачи страницы -> схемы Task с людьми и вложениями (два доп. запроса на страницу)"""
+    task_ids = [t.task_id for t in tasks]
+    user_ids, assigner_ids = await load_task_people(db, task_ids)
+    files = await load_task_files(db, task_ids)
+    return [
+        build_task(t, user_ids.get(t.task_id, []), assigner_ids.get(t.task_id, []), files.get(t.task_id, []))
+        for t in tasks
+    ]
+
+
+async def to_task_schema(db: AsyncSession, task: Tasks) -> Task:
+    return (await to_task_schemas(db, [task]))[0]
@@ -1,19 +1,36 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 
-from .routers import user, task, board, group
+from .routers import user, task, board, group, search, sync, uploads, metrics, ws_notify
+from .outbox import OutboxDispatcher
+from .sync import prune_tombstones_periodically
+from .resumable import prune_upload_sessions_periodically
+from .deadlines import deadline_scheduler
 from .db import engine
-from .models import Base
+from .metrics import MetricsMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Создание таблиц при запуске приложения
-    Base.metadata.create_all(bind=engine)
+    # Схема БД ведётся миграциями: перед запуском — alembic upgrade head
+    await ws_notify.start_notifications()
+    dispatcher = OutboxDispatcher(ws_notify.publish)
+    dispatcher.start()
+    deadline_scheduler.start()
+    pruners = [
+        asyncio.create_task(prune_tombstones_periodically()),
+        asyncio.create_task(prune_upload_sessions_periodically()),
+    ]
     yield
     # Очистка ресурсов при завершении работы приложения
-    engine.dispose()
+    for pruner in pruners:
+        pruner.cancel()
+    await deadline_scheduler.stop()
+    await dispatcher.stop()
+    await ws_notify.stop_notifications()
+    await engine.dispose()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -43,9 +60,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Добавлен последним — внешний слой: время запроса включает все middleware
+app.add_middleware(MetricsMiddleware)
 
 # Подключаем роутеры с тегами
 app.include_router(user.router, tags=["users"])
+# До tasks: иначе /uploads/{sha256}/{filename} перехватил бы /uploads/sessions/{id}
+app.include_router(uploads.router, tags=["uploads"])
 app.include_router(task.router, tags=["tasks"])
 app.include_router(board.router, tags=["boards"])
 app.include_router(group.router, tags=["groups"])
+app.include_router(search.router, tags=["search"])
+app.include_router(sync.router, tags=["sync"])
+app.include_router(metrics.router, tags=["metrics"])
+app.include_router(ws_notify.router, tags=["websocket"])
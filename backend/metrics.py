@@ -0,0 +1,304 @@
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.cursor import CursorFetchStrategy
+from sqlalchemy.pool import Pool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Границы корзин гистограммы времени ожидания соединения (секунды)
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Длительность запроса и суммарное время в БД за запрос (секунды)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# SQL-запросов и строк результата за HTTP-запрос
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+# Метка маршрута для запросов, не попавших ни в один маршрут (404)
+UNMATCHED = "unmatched"
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (кумулятивная, как в Prometheus)"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # последняя — +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        result, total = [], 0
+        for c in self.counts:
+            total += c
+            result.append(total)
+        return result
+
+    def snapshot(self) -> Dict:
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "buckets": dict(zip(bounds, self.cumulative())),
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+class PoolStats:
+    """Счётчики пула соединений, заполняемые событиями пула"""
+
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.checkout_timeouts = 0
+        self.checkout_wait = Histogram(WAIT_BUCKETS)
+
+    def snapshot(self, pool: Pool) -> Dict:
+        return {
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "connects_total": self.connects,
+            "checkouts_total": self.checkouts,
+            "checkins_total": self.checkins,
+            "invalidations_total": self.invalidations,
+            "checkout_timeouts_total": self.checkout_timeouts,
+            "checkout_wait_seconds": self.checkout_wait.snapshot(),
+        }
+
+
+pool_stats = PoolStats()
+
+
+def instrument_pool(pool: Pool, stats: PoolStats = pool_stats) -> None:
+    """Подписывает счётчики stats на события пула"""
+
+    @event.listens_for(pool, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.checkouts += 1
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        stats.checkins += 1
+
+    @event.listens_for(pool, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        stats.invalidations += 1
+
+
+class QueryUsage:
+    """Запросы к БД, сделанные в рамках одного HTTP-запроса"""
+
+    __slots__ = ("queries", "seconds", "rows")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.rows = 0
+
+
+# Учёт текущего HTTP-запроса; None — вне запроса (outbox, фоновые задачи)
+current_usage: ContextVar[Optional[QueryUsage]] = ContextVar("current_usage", default=None)
+
+
+class CountingFetchStrategy(CursorFetchStrategy):
+    """
+    Обычная выборка из курсора DBAPI, которая считает выданные строки на счёт
+    QueryUsage. Строки считаются на стороне результата, а не по внутренностям
+    курсора, поэтому число не зависит от драйвера: учитывается то, что
+    приложение действительно прочитало.
+    """
+
+    __slots__ = ("usage",)
+
+    def __init__(self, usage: QueryUsage):
+        self.usage = usage
+
+    def fetchone(self, result, dbapi_cursor, hard_close: bool = False):
+        row = super().fetchone(result, dbapi_cursor, hard_close)
+        if row is not None:
+            self.usage.rows += 1
+        return row
+
+    def fetchmany(self, result, dbapi_cursor, size: Optional[int] = None):
+        rows = super().fetchmany(result, dbapi_cursor, size)
+        self.usage.rows += len(rows or ())
+        return rows
+
+    def fetchall(self, result, dbapi_cursor):
+        rows = super().fetchall(result, dbapi_cursor)
+        self.usage.rows += len(rows or ())
+        return rows
+
+
+class RouteStats:
+    """Метрики одного маршрута (метод + шаблон пути)"""
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statuses: Dict[int, int] = defaultdict(int)
+        self.db_queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_seconds = Histogram(LATENCY_BUCKETS)
+        self.db_rows = Histogram(ROW_BUCKETS)
+
+
+class RequestStats:
+    """HTTP-запросы по маршрутам, запросы в обработке и запросы к БД вне HTTP"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+        self.background = QueryUsage()
+
+    def observe(self, method: str, route: str, status: int, seconds: float, usage: QueryUsage) -> None:
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats()
+        stats.latency.observe(seconds)
+        stats.statuses[status] += 1
+        stats.db_queries.observe(usage.queries)
+        stats.db_seconds.observe(usage.seconds)
+        stats.db_rows.observe(usage.rows)
+
+
+request_stats = RequestStats()
+
+
+def instrument_engine(engine: Engine, stats: RequestStats = request_stats) -> None:
+    """Считает запросы, время и строки результата на счёт текущего HTTP-запроса"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info["query_started"].pop()
+        usage = current_usage.get() or stats.background
+        usage.queries += 1
+        usage.seconds += elapsed
+        # Строки считаются при выборке; особую стратегию (stream_results) не подменяем
+        if context is not None and cursor.description is not None \
+                and type(context.cursor_fetch_strategy) is CursorFetchStrategy:
+            context.cursor_fetch_strategy = CountingFetchStrategy(usage)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: длительность и статусы HTTP-запросов по шаблону маршрута
+    ("/tasks/{task_id}", а не каждый ID отдельно), число запросов в обработке
+    и использование БД каждым запросом (через current_usage и instrument_engine)
+    """
+
+    def __init__(self, app: ASGIApp, stats: RequestStats = request_stats):
+        self.app = app
+        self.stats = stats
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # если исключение вылетит до ответа
+        usage = QueryUsage()
+        token = current_usage.set(usage)
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.stats.in_flight += 1
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - started
+            self.stats.in_flight -= 1
+            current_usage.reset(token)
+            # Маршрут FastAPI кладёт в scope при сопоставлении пути
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED
+            self.stats.observe(scope["method"], route, status, elapsed, usage)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, histogram: Histogram, **labels) -> List[str]:
+    lines = [
+        f"{name}_bucket{_labels(**labels, le=bound)} {count}"
+        for bound, count in histogram.snapshot()["buckets"].items()
+    ]
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+
+def render_prometheus(stats: RequestStats, pool: Pool, pool_counters: PoolStats) -> str:
+    """Все метрики в текстовом формате Prometheus 0.0.4"""
+    lines = [
+        "# HELP http_requests_in_flight HTTP requests being processed.",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {stats.in_flight}",
+    ]
+    routes = sorted(stats.routes.items())
+    families = [
+        ("http_request_duration_seconds", "HTTP request latency by route template.", lambda s: s.latency),
+        ("http_request_db_queries", "SQL queries per HTTP request.", lambda s: s.db_queries),
+        ("http_request_db_seconds", "Time spent in SQL queries per HTTP request.", lambda s: s.db_seconds),
+        ("http_request_db_rows", "Rows fetched from SQL results per HTTP request.", lambda s: s.db_rows),
+    ]
+    lines += ["# HELP http_requests_total HTTP requests by route template and status.", "# TYPE http_requests_total counter"]
+    for (method, route), route_stats in routes:
+        for status, count in sorted(route_stats.statuses.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+    for name, help_text, histogram_of in families:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (method, route), route_stats in routes:
+            lines += _histogram_lines(name, histogram_of(route_stats), method=method, route=route)
+
+    lines += [
+        "# HELP db_background_queries_total SQL queries made outside HTTP requests.",
+        "# TYPE db_background_queries_total counter",
+        f"db_background_queries_total {stats.background.queries}",
+        "# HELP db_background_seconds_total Time in SQL queries made outside HTTP requests.",
+        "# TYPE db_background_seconds_total counter",
+        f"db_background_seconds_total {stats.background.seconds}",
+    ]
+
+    snapshot = pool_counters.snapshot(pool)
+    for key in ("pool_size", "checked_out", "checked_in", "overflow"):
+        lines += [f"# TYPE db_pool_{key} gauge", f"db_pool_{key} {snapshot[key]}"]
+    for key in ("connects_total", "checkouts_total", "checkins_total", "invalidations_total", "checkout_timeouts_total"):
+        lines += [f"# TYPE db_pool_{key} counter", f"db_pool_{key} {snapshot[key]}"]
+    lines += ["# TYPE db_pool_checkout_wait_seconds histogram"]
+    lines += _histogram_lines("db_pool_checkout_wait_seconds", pool_counters.checkout_wait)
+    return "\n".join(lines) + "\n"
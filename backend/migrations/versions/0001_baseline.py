@@ -0,0 +1,85 @@
+"""baseline schema
+
+Схема, которую раньше создавал Base.metadata.create_all при старте.
+Таблицы создаются, только если их ещё нет, поэтому базы, поднятые
+create_all, переводятся на миграции обычным alembic upgrade head.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("user_id", sa.Integer, primary_key=True),
+            sa.Column("telegram_id", sa.Integer, nullable=False, unique=True),
+            sa.Column("name", sa.String, nullable=False),
+            sa.Column("role", sa.Enum("teacher", "student", "admin", name="roleenum"), nullable=False),
+            sa.Column("email", sa.String, unique=True),
+            sa.Column("created_at", sa.DateTime),
+        )
+    if "groups" not in existing:
+        op.create_table(
+            "groups",
+            sa.Column("group_id", sa.Integer, primary_key=True),
+            sa.Column("name", sa.String, nullable=False),
+            sa.Column("description", sa.Text),
+            sa.Column("created_at", sa.DateTime),
+        )
+    if "kanban_boards" not in existing:
+        op.create_table(
+            "kanban_boards",
+            sa.Column("board_id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.user_id")),
+            sa.Column("name", sa.String, nullable=False),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+        )
+    if "tasks" not in existing:
+        op.create_table(
+            "tasks",
+            sa.Column("task_id", sa.Integer, primary_key=True),
+            sa.Column("title", sa.String, nullable=False),
+            sa.Column("description", sa.Text),
+            sa.Column("deadline", sa.DateTime),
+            sa.Column("status", sa.Enum("todo", "in_progress", "done", name="taskstatusenum"), nullable=False),
+            sa.Column("assigned_files", sa.Text),
+            sa.Column("priority", sa.String),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+            sa.Column("group_id", sa.Integer, sa.ForeignKey("groups.group_id")),
+            sa.Column("board_id", sa.Integer, sa.ForeignKey("kanban_boards.board_id")),
+        )
+    if "user_groups" not in existing:
+        op.create_table(
+            "user_groups",
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.user_id"), primary_key=True),
+            sa.Column("group_id", sa.Integer, sa.ForeignKey("groups.group_id"), primary_key=True),
+        )
+    for name in ("users_tasks", "task_assigners"):
+        if name not in existing:
+            op.create_table(
+                name,
+                sa.Column("user_id", sa.Integer, sa.ForeignKey("users.user_id"), primary_key=True),
+                sa.Column("task_id", sa.Integer, sa.ForeignKey("tasks.task_id"), primary_key=True),
+                sa.Column("assigned_at", sa.DateTime),
+            )
+
+
+def downgrade() -> None:
+    for name in ("task_assigners", "users_tasks", "user_groups", "tasks", "kanban_boards", "groups", "users"):
+        op.drop_table(name)
+    sa.Enum(name="taskstatusenum").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="roleenum").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,101 @@
+"""outbox, status counters, sync positions, search extension
+
+Объекты, которые появились после baseline: outbox task_events, счётчики
+task_counters (с заполнением по текущим задачам), tombstone и позиции
+изменений задач для /sync (с нумерацией существующих строк), pg_trgm.
+Как и 0001, пропускает уже созданное через create_all.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# Тип уже создан в 0001 вместе с tasks
+task_status = postgresql.ENUM("todo", "in_progress", "done", name="taskstatusenum", create_type=False)
+big_id = sa.BigInteger().with_variant(sa.Integer, "sqlite")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    is_postgresql = bind.dialect.name == "postgresql"
+    inspector = sa.inspect(bind)
+    existing = set(inspector.get_table_names())
+
+    if is_postgresql:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE SEQUENCE IF NOT EXISTS task_change_seq")
+
+    if "task_events" not in existing:
+        op.create_table(
+            "task_events",
+            sa.Column("event_id", big_id, primary_key=True),
+            sa.Column("payload", sa.JSON, nullable=False),
+            sa.Column("topics", sa.JSON, nullable=False),
+            sa.Column("attempts", sa.Integer, nullable=False),
+            sa.Column("available_at", sa.DateTime, nullable=False),
+            sa.Column("created_at", sa.DateTime, nullable=False),
+        )
+
+    if "task_tombstones" not in existing:
+        op.create_table(
+            "task_tombstones",
+            sa.Column("tombstone_id", big_id, primary_key=True),
+            sa.Column("task_id", sa.Integer, nullable=False),
+            sa.Column("scope_type", sa.String, nullable=False),
+            sa.Column("scope_id", sa.Integer, nullable=False),
+            sa.Column("reason", sa.String, nullable=False),
+            sa.Column("change_xid", sa.BigInteger, nullable=False),
+            sa.Column("change_seq", sa.BigInteger, nullable=False),
+            sa.Column("created_at", sa.DateTime, nullable=False),
+        )
+
+    task_columns = {column["name"] for column in inspector.get_columns("tasks")}
+    for name in ("change_xid", "change_seq"):
+        if name not in task_columns:
+            op.add_column("tasks", sa.Column(name, sa.BigInteger))
+    # Существующим задачам — позиции до любых новых изменений
+    if is_postgresql:
+        op.execute("UPDATE tasks SET change_xid = 0, change_seq = nextval('task_change_seq') WHERE change_seq IS NULL")
+    else:
+        op.execute("UPDATE tasks SET change_xid = 0, change_seq = task_id WHERE change_seq IS NULL")
+
+    if "task_counters" not in existing:
+        op.create_table(
+            "task_counters",
+            sa.Column("scope_type", sa.String, primary_key=True),
+            sa.Column("scope_id", sa.Integer, primary_key=True),
+            sa.Column("status", task_status, primary_key=True),
+            sa.Column("count", sa.Integer, nullable=False),
+        )
+    # Заполняем счётчики, если их ещё не вели (то же, что python -m backend.counters)
+    if bind.execute(sa.text("SELECT count(*) FROM task_counters")).scalar() == 0:
+        op.execute("""
+            INSERT INTO task_counters (scope_type, scope_id, status, count)
+            SELECT 'board', board_id, status, count(*) FROM tasks
+            WHERE board_id IS NOT NULL GROUP BY board_id, status
+            UNION ALL
+            SELECT 'group', group_id, status, count(*) FROM tasks
+            WHERE group_id IS NOT NULL GROUP BY group_id, status
+            UNION ALL
+            SELECT 'user', users_tasks.user_id, tasks.status, count(*) FROM users_tasks
+            JOIN tasks ON tasks.task_id = users_tasks.task_id
+            GROUP BY users_tasks.user_id, tasks.status
+        """)
+
+
+def downgrade() -> None:
+    op.drop_table("task_counters")
+    op.drop_column("tasks", "change_seq")
+    op.drop_column("tasks", "change_xid")
+    op.drop_table("task_tombstones")
+    op.drop_table("task_events")
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP SEQUENCE IF EXISTS task_change_seq")
@@ -0,0 +1,83 @@
+"""performance indexes
+
+Индексы под запросы роутеров. В Postgres строятся CONCURRENTLY — без
+блокировки записи в таблицы, поэтому вне транзакции. Если построение
+прервалось, Postgres оставляет невалидный индекс: он удаляется и
+строится заново при повторном upgrade.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+OPEN_TASKS = sa.text("status <> 'done'")
+
+# (имя, таблица, колонки, доп. параметры)
+INDEXES = [
+    # Keyset-страницы /boards/{id}/tasks, /tasks?group_id=, /tasks/group/{id},
+    # /tasks/status/{status}, /tasks/priority/{priority}: фильтр + ORDER BY task_id
+    ("ix_tasks_board_id_task_id", "tasks", ["board_id", "task_id"], {}),
+    ("ix_tasks_group_id_task_id", "tasks", ["group_id", "task_id"], {}),
+    ("ix_tasks_status_task_id", "tasks", ["status", "task_id"], {}),
+    ("ix_tasks_priority_task_id", "tasks", ["priority", "task_id"], {}),
+    # /tasks/upcoming: только незавершённые задачи по дедлайну
+    ("ix_tasks_open_deadline", "tasks", ["deadline", "task_id"], {"postgresql_where": OPEN_TASKS, "sqlite_where": OPEN_TASKS}),
+    # /sync и ETag: позиции изменений в области
+    ("ix_tasks_board_change", "tasks", ["board_id", "change_xid", "change_seq"], {}),
+    ("ix_tasks_group_change", "tasks", ["group_id", "change_xid", "change_seq"], {}),
+    ("ix_task_tombstones_scope_change", "task_tombstones", ["scope_type", "scope_id", "change_xid", "change_seq"], {}),
+    ("ix_task_tombstones_created_at", "task_tombstones", ["created_at"], {}),
+    # Обратные стороны составных первичных ключей (user_id, ...):
+    # исполнители/назначившие задач страницы, пользователи группы
+    ("ix_users_tasks_task_id", "users_tasks", ["task_id", "user_id"], {}),
+    ("ix_task_assigners_task_id", "task_assigners", ["task_id", "user_id"], {}),
+    ("ix_user_groups_group_id", "user_groups", ["group_id", "user_id"], {}),
+    # /users/{id}/boards
+    ("ix_kanban_boards_user_id", "kanban_boards", ["user_id"], {}),
+]
+
+# Поисковые индексы (backend/search.py) — только Postgres
+POSTGRESQL_INDEXES = [
+    (
+        "ix_tasks_search", "tasks",
+        [sa.text("to_tsvector('simple'::regconfig, (coalesce(title, '') || ' ') || coalesce(description, ''))")],
+        {"postgresql_using": "gin"},
+    ),
+    ("ix_users_name_trgm", "users", ["name"], {"postgresql_using": "gin", "postgresql_ops": {"name": "gin_trgm_ops"}}),
+    ("ix_groups_name_trgm", "groups", ["name"], {"postgresql_using": "gin", "postgresql_ops": {"name": "gin_trgm_ops"}}),
+    ("ix_kanban_boards_name_trgm", "kanban_boards", ["name"], {"postgresql_using": "gin", "postgresql_ops": {"name": "gin_trgm_ops"}}),
+]
+
+
+def drop_if_invalid(name: str) -> None:
+    invalid = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+        "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+    ), {"name": name}).first()
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def upgrade() -> None:
+    is_postgresql = op.get_context().dialect.name == "postgresql"
+    indexes = INDEXES + (POSTGRESQL_INDEXES if is_postgresql else [])
+    with op.get_context().autocommit_block():
+        for name, table, columns, kw in indexes:
+            if is_postgresql and not context.is_offline_mode():
+                drop_if_invalid(name)
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True, **kw)
+
+
+def downgrade() -> None:
+    is_postgresql = op.get_context().dialect.name == "postgresql"
+    indexes = INDEXES + (POSTGRESQL_INDEXES if is_postgresql else [])
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(indexes):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
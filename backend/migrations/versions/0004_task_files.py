@@ -0,0 +1,104 @@
+"""task_files instead of tasks.assigned_files
+
+Вложения задач переезжают из JSON-строки tasks.assigned_files в строки
+task_files. Существующие списки переносятся пачками по task_id; размер
+и хэш у перенесённых вложений пустые — файлы на диске миграция не читает.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+import json
+import os
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+big_id = sa.BigInteger().with_variant(sa.Integer, "sqlite")
+BATCH = 1000
+
+task_files = sa.table(
+    "task_files",
+    sa.column("task_id", sa.Integer),
+    sa.column("position", sa.Integer),
+    sa.column("path", sa.String),
+    sa.column("name", sa.String),
+    sa.column("created_at", sa.DateTime),
+)
+
+
+def parse_paths(value):
+    """Содержимое assigned_files -> список путей; мусор переносится как есть"""
+    try:
+        paths = json.loads(value)
+    except ValueError:
+        return [value]
+    if paths is None:
+        return []
+    return [str(path) for path in paths] if isinstance(paths, list) else [str(paths)]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    op.create_table(
+        "task_files",
+        sa.Column("file_id", big_id, primary_key=True),
+        sa.Column("task_id", sa.Integer, sa.ForeignKey("tasks.task_id", ondelete="CASCADE"), nullable=False),
+        sa.Column("position", sa.Integer, nullable=False),
+        sa.Column("path", sa.String, nullable=False),
+        sa.Column("name", sa.String),
+        sa.Column("size", sa.BigInteger),
+        sa.Column("sha256", sa.String(64)),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_task_files_task_id", "task_files", ["task_id", "position"])
+
+    # Keyset по task_id: таблица задач не читается в память целиком
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text(
+            "SELECT task_id, assigned_files, created_at FROM tasks "
+            "WHERE task_id > :last_id AND assigned_files IS NOT NULL AND assigned_files <> '' "
+            "ORDER BY task_id LIMIT :batch"
+        ).columns(task_id=sa.Integer, assigned_files=sa.Text, created_at=sa.DateTime), {"last_id": last_id, "batch": BATCH}).all()
+        if not rows:
+            break
+        files = [
+            {
+                "task_id": task_id,
+                "position": position,
+                "path": path,
+                "name": os.path.basename(path) or path,
+                "created_at": created_at or datetime.now(),
+            }
+            for task_id, assigned_files, created_at in rows
+            for position, path in enumerate(parse_paths(assigned_files))
+        ]
+        if files:
+            op.bulk_insert(task_files, files, multiinsert=False)
+        last_id = rows[-1].task_id
+
+    op.drop_column("tasks", "assigned_files")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    op.add_column("tasks", sa.Column("assigned_files", sa.Text))
+
+    paths = {}
+    for task_id, path in bind.execute(sa.text("SELECT task_id, path FROM task_files ORDER BY task_id, position")):
+        paths.setdefault(task_id, []).append(path)
+    for task_id, task_paths in paths.items():
+        bind.execute(
+            sa.text("UPDATE tasks SET assigned_files = :files WHERE task_id = :task_id"),
+            {"files": json.dumps(task_paths), "task_id": task_id},
+        )
+
+    op.drop_index("ix_task_files_task_id", table_name="task_files")
+    op.drop_table("task_files")
@@ -0,0 +1,47 @@
+"""resumable upload sessions
+
+Сессии возобновляемой загрузки и полученные диапазоны байт.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+big_id = sa.BigInteger().with_variant(sa.Integer, "sqlite")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "upload_sessions",
+        sa.Column("session_id", sa.String(32), primary_key=True),
+        sa.Column("name", sa.String, nullable=False),
+        sa.Column("size", sa.BigInteger, nullable=False),
+        sa.Column("sha256", sa.String(64)),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_upload_sessions_created_at", "upload_sessions", ["created_at"])
+    op.create_table(
+        "upload_chunks",
+        sa.Column("chunk_id", big_id, primary_key=True),
+        sa.Column(
+            "session_id", sa.String(32),
+            sa.ForeignKey("upload_sessions.session_id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column("start", sa.BigInteger, nullable=False),
+        sa.Column("end", sa.BigInteger, nullable=False),
+    )
+    op.create_index("ix_upload_chunks_session_id", "upload_chunks", ["session_id", "start"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_upload_chunks_session_id", table_name="upload_chunks")
+    op.drop_table("upload_chunks")
+    op.drop_index("ix_upload_sessions_created_at", table_name="upload_sessions")
+    op.drop_table("upload_sessions")
@@ -0,0 +1,31 @@
+"""deadline reminders
+
+Отметки об отправленных напоминаниях о дедлайнах.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "task_reminders",
+        sa.Column("task_id", sa.Integer, primary_key=True),
+        sa.Column("kind", sa.String, primary_key=True),
+        sa.Column("deadline", sa.DateTime, primary_key=True),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_task_reminders_deadline", "task_reminders", ["deadline"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_task_reminders_deadline", table_name="task_reminders")
+    op.drop_table("task_reminders")
@@ -1,7 +1,9 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Table, Text, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, Table, Text, DateTime, ForeignKey, Enum, JSON, Index, DDL, Sequence, event, func, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 import enum
 
 Base = declarative_base()
@@ -29,6 +31,7 @@ users_tasks_table = Table(
     Column("user_id", ForeignKey("users.user_id"), primary_key=True),
     Column("task_id", ForeignKey("tasks.task_id"), primary_key=True),
     Column("assigned_at", DateTime, default=datetime.now), # изменили на True
+    Index("ix_users_tasks_task_id", "task_id", "user_id"),
 )
 
 
@@ -37,9 +40,52 @@ task_assigners_table = Table(
     Base.metadata,
     Column("user_id", ForeignKey("users.user_id"), primary_key=True),
     Column("task_id", ForeignKey("tasks.task_id"), primary_key=True),
-    Column("assigned_at", DateTime, default=datetime.now)
+    Column("assigned_at", DateTime, default=datetime.now),
+    Index("ix_task_assigners_task_id", "task_id", "user_id"),
 )
 
+# Позиция изменения задачи для /sync (backend/sync.py): пара (change_xid, change_seq).
+# change_seq — общая для tasks и task_tombstones монотонная последовательность,
+# change_xid — транзакция, внёсшая изменение
+task_change_seq = Sequence("task_change_seq", metadata=Base.metadata)
+
+
+class next_change_seq(FunctionElement):
+    type = BigInteger()
+    inherit_cache = True
+
+
+@compiles(next_change_seq)
+def _next_change_seq(element, compiler, **kw):
+    # В SQLite нет последовательностей, но запись и так сериализована
+    return (
+        "(SELECT coalesce(max(seq), 0) + 1 FROM ("
+        "SELECT max(change_seq) AS seq FROM tasks "
+        "UNION ALL SELECT max(change_seq) FROM task_tombstones))"
+    )
+
+
+@compiles(next_change_seq, "postgresql")
+def _next_change_seq_postgresql(element, compiler, **kw):
+    return "nextval('task_change_seq')"
+
+
+class current_change_xid(FunctionElement):
+    type = BigInteger()
+    inherit_cache = True
+
+
+@compiles(current_change_xid)
+def _current_change_xid(element, compiler, **kw):
+    return "0"
+
+
+@compiles(current_change_xid, "postgresql")
+def _current_change_xid_postgresql(element, compiler, **kw):
+    # xid8 — 64-битный, не переполняется
+    return "pg_current_xact_id()::text::bigint"
+
+
 class Users(Base):
     __tablename__ = "users"
     user_id = Column(Integer, primary_key=True)
@@ -66,7 +112,6 @@ class Tasks(Base):
     description = Column(Text)
     deadline = Column(DateTime, nullable=True)
     status = Column(Enum(TaskStatusEnum), nullable=False, default=TaskStatusEnum.todo)
-    assigned_files = Column(Text)
     priority = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.now())
     updated_at = Column(DateTime, default=datetime.now(), onupdate=datetime.now())
@@ -74,12 +119,137 @@ class Tasks(Base):
     group_id = Column(Integer, ForeignKey("groups.group_id"), default=1)
     board_id = Column(Integer, ForeignKey("kanban_boards.board_id"), default=1)
 
+    # Проставляются при каждом INSERT/UPDATE строки
+    change_xid = Column(BigInteger, default=current_change_xid(), onupdate=current_change_xid())
+    change_seq = Column(BigInteger, default=next_change_seq(), onupdate=next_change_seq())
+
+    # Индексы создаются миграциями (backend/migrations), здесь — для полноты метаданных
+    __table_args__ = (
+        Index("ix_tasks_board_id_task_id", "board_id", "task_id"),
+        Index("ix_tasks_group_id_task_id", "group_id", "task_id"),
+        Index("ix_tasks_status_task_id", "status", "task_id"),
+        Index("ix_tasks_priority_task_id", "priority", "task_id"),
+        Index(
+            "ix_tasks_open_deadline", "deadline", "task_id",
+            postgresql_where=text("status <> 'done'"),
+            sqlite_where=text("status <> 'done'"),
+        ),
+        Index("ix_tasks_board_change", "board_id", "change_xid", "change_seq"),
+        Index("ix_tasks_group_change", "group_id", "change_xid", "change_seq"),
+    )
+
     group = relationship("Groups", back_populates="tasks")
     board = relationship("KanbanBoards", back_populates="tasks")
     users = relationship("Users", secondary=users_tasks_table, back_populates="tasks")
     assigners = relationship("Users", secondary=task_assigners_table, back_populates="assigned_tasks")
 
 
+class TaskFiles(Base):
+    '''
+    Вложения задачи (раньше — JSON-список путей в tasks.assigned_files).
+    Размер и sha256 известны для файлов, загруженных через /upload-file
+    '''
+    __tablename__ = "task_files"
+    file_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    task_id = Column(Integer, ForeignKey("tasks.task_id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False, default=0)  # порядок вложений в задаче
+    path = Column(String, nullable=False)  # /uploads/<имя> или внешний URL
+    name = Column(String)
+    size = Column(BigInteger)
+    sha256 = Column(String(64))
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (Index("ix_task_files_task_id", "task_id", "position"),)
+
+
+class UploadSessions(Base):
+    '''
+    Возобновляемая загрузка: файл собирается по частям в uploads/.partial
+    и после проверки хэша переносится в хранилище (backend/resumable.py)
+    '''
+    __tablename__ = "upload_sessions"
+    session_id = Column(String(32), primary_key=True)  # случайный токен, он же право на загрузку
+    name = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64))  # ожидаемый хэш, если клиент его знает заранее
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (Index("ix_upload_sessions_created_at", "created_at"),)
+
+
+class UploadChunks(Base):
+    '''Записанные на диск диапазоны [start, end) сессии загрузки'''
+    __tablename__ = "upload_chunks"
+    chunk_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    session_id = Column(String(32), ForeignKey("upload_sessions.session_id", ondelete="CASCADE"), nullable=False)
+    start = Column(BigInteger, nullable=False)
+    end = Column(BigInteger, nullable=False)
+
+    __table_args__ = (Index("ix_upload_chunks_session_id", "session_id", "start"),)
+
+
+class TaskEvents(Base):
+    '''
+    Outbox событий задач: строка пишется в той же транзакции, что и изменение
+    задачи, а фоновый диспетчер (backend/outbox.py) публикует её и удаляет
+    '''
+    __tablename__ = "task_events"
+    event_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    payload = Column(JSON, nullable=False)
+    topics = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False, default=datetime.now)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+
+class TaskTombstones(Base):
+    '''
+    Записи об уходе задачи из доски, группы или списка исполнителя
+    (удаление, перенос, снятие назначения) для /sync
+    '''
+    __tablename__ = "task_tombstones"
+    tombstone_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    task_id = Column(Integer, nullable=False)  # без внешнего ключа: задачи уже может не быть
+    scope_type = Column(String, nullable=False)  # board / group / user
+    scope_id = Column(Integer, nullable=False)
+    reason = Column(String, nullable=False)  # deleted / moved / unassigned
+    change_xid = Column(BigInteger, nullable=False, default=current_change_xid())
+    change_seq = Column(BigInteger, nullable=False, default=next_change_seq())
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_task_tombstones_scope_change", "scope_type", "scope_id", "change_xid", "change_seq"),
+        Index("ix_task_tombstones_created_at", "created_at"),
+    )
+
+
+class TaskReminders(Base):
+    '''
+    Отправленные напоминания о дедлайне: по одному на (задачу, вид, дедлайн),
+    сколько бы воркеров ни держали планировщик и сколько бы раз он ни перезапускался
+    '''
+    __tablename__ = "task_reminders"
+    task_id = Column(Integer, primary_key=True)  # без внешнего ключа: задачу могут удалить
+    kind = Column(String, primary_key=True)  # due_soon / overdue
+    deadline = Column(DateTime, primary_key=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (Index("ix_task_reminders_deadline", "deadline"),)
+
+
+class TaskCounters(Base):
+    '''
+    Число задач по статусам в разрезе доски, группы и исполнителя.
+    Обновляется в той же транзакции, что и задачи (backend/counters.py),
+    эндпоинты статистики читают его вместо COUNT(*) по tasks
+    '''
+    __tablename__ = "task_counters"
+    scope_type = Column(String, primary_key=True)  # board / group / user
+    scope_id = Column(Integer, primary_key=True)
+    status = Column(Enum(TaskStatusEnum), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
 class Groups(Base):
     __tablename__ = "groups"
     group_id = Column(Integer, primary_key=True)
@@ -99,6 +269,8 @@ class UserGroups(Base):
     user = relationship("Users", back_populates="groups")
     group = relationship("Groups", back_populates="users")
 
+    __table_args__ = (Index("ix_user_groups_group_id", "group_id", "user_id"),)
+
 
 class KanbanBoards(Base):
     __tablename__ = "kanban_boards"
@@ -110,6 +282,32 @@ class KanbanBoards(Base):
     user = relationship("Users", back_populates="boards")
     tasks = relationship("Tasks", back_populates="board")
 
+    __table_args__ = (Index("ix_kanban_boards_user_id", "user_id"),)
+
+
+# Поисковые индексы (только Postgres). Выражение tsvector должно совпадать
+# с тем, что строит backend/search.py, иначе планировщик не возьмёт индекс
+def task_search_vector():
+    columns = Tasks.__table__.c
+    return func.to_tsvector(
+        text("'simple'::regconfig"),
+        func.coalesce(columns.title, text("''"))
+        .op("||")(text("' '"))
+        .op("||")(func.coalesce(columns.description, text("''"))),
+    )
+
+
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+Index("ix_tasks_search", task_search_vector(), postgresql_using="gin").ddl_if(dialect="postgresql")
+Index("ix_users_name_trgm", Users.name, postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql")
+Index("ix_groups_name_trgm", Groups.name, postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql")
+Index("ix_kanban_boards_name_trgm", KanbanBoards.name, postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql")
+
 
 # class CalendarEvents(Base):
 #     __tablename__ = "calendar_events"
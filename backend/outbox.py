@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .db import SessionLocal
+from .models import TaskEvents
+
+logger = logging.getLogger(__name__)
+
+Publish = Callable[[dict, List[str]], Awaitable[None]]
+
+_wakeup = asyncio.Event()
+
+
+def enqueue_event(db: AsyncSession, event: dict, topics: Iterable[str]) -> None:
+    """
+    Добавляет событие в outbox текущей транзакции. Событие будет опубликовано
+    только если транзакция зафиксируется, и не потеряется при падении процесса.
+    """
+    db.add(TaskEvents(payload=event, topics=sorted(topics)))
+
+
+def enqueue_events(db: AsyncSession, events: Iterable[tuple]) -> None:
+    """Пакетная версия enqueue_event: пары (event, topics)"""
+    db.add_all([TaskEvents(payload=event, topics=sorted(topics)) for event, topics in events])
+
+
+def wake_dispatcher() -> None:
+    """Будит диспетчер после commit, чтобы не ждать очередного опроса"""
+    _wakeup.set()
+
+
+class OutboxDispatcher:
+    """
+    Фоновая задача, разбирающая outbox пачками. Доставка «хотя бы один раз»:
+    строка удаляется только после успешной публикации, а при ошибке
+    откладывается с экспоненциальной паузой. FOR UPDATE SKIP LOCKED позволяет
+    нескольким воркерам разбирать outbox параллельно, не дублируя друг друга.
+    """
+
+    def __init__(self, publish: Publish, batch_size: int = settings.outbox_batch_size):
+        self.publish = publish
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                dispatched = await self.dispatch_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {str(e)}")
+                dispatched = 0
+            if dispatched < self.batch_size:
+                # Пачка неполная — outbox разобран, ждём нового события или опроса
+                _wakeup.clear()
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), settings.outbox_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def dispatch_batch(self) -> int:
+        async with SessionLocal() as db:
+            now = datetime.now()
+            rows = (await db.scalars(
+                select(TaskEvents)
+                .where(TaskEvents.available_at <= now)
+                .order_by(TaskEvents.event_id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not rows:
+                return 0
+
+            sent = []
+            for row in rows:
+                try:
+                    await self.publish(row.payload, row.topics)
+                    sent.append(row.event_id)
+                except Exception as e:
+                    delay = min(2 ** row.attempts, settings.outbox_max_retry_delay)
+                    logger.error(f"Error publishing event {row.event_id} (attempt {row.attempts + 1}): {str(e)}")
+                    await db.execute(
+                        update(TaskEvents)
+                        .where(TaskEvents.event_id == row.event_id)
+                        .values(attempts=row.attempts + 1, available_at=now + timedelta(seconds=delay))
+                    )
+            if sent:
+                await db.execute(delete(TaskEvents).where(TaskEvents.event_id.in_(sent)))
+            await db.commit()
+            return len(rows)
@@ -0,0 +1,85 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class PageParams:
+    """Параметры keyset-пагинации: размер страницы и непрозрачный курсор"""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT, description="Размер страницы"),
+        cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor)"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor_value(key, value: Any) -> Any:
+    """Значение курсора в типе колонки key; ValueError — тип не тот"""
+    python_type = key.type.python_type
+    if python_type is datetime:
+        if not isinstance(value, str):
+            raise ValueError
+        return datetime.fromisoformat(value)
+    # bool — подкласс int, но в курсор по целочисленному ключу не попадает
+    if isinstance(value, bool) or not isinstance(value, python_type):
+        raise ValueError
+    return value
+
+
+def decode_cursor(cursor: str, keys: Sequence) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        return [decode_cursor_value(key, v) for key, v in zip(keys, values)]
+    except (ValueError, TypeError, NotImplementedError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_query(query: Select, keys: Sequence, page: PageParams) -> Select:
+    """
+    query постранично по ключу keys (уникальному в сумме, по возрастанию).
+    Стоимость страницы не зависит от глубины: вместо OFFSET — условие keys > курсор.
+    Берётся на строку больше страницы — по ней видно, есть ли следующая.
+    """
+    if page.cursor:
+        values = decode_cursor(page.cursor, keys)
+        if len(keys) == 1:
+            query = query.where(keys[0] > values[0])
+        else:
+            query = query.where(tuple_(*keys) > tuple_(*values))
+    return query.order_by(*keys).limit(page.limit + 1)
+
+
+def split_page(rows: list, keys: Sequence, page: PageParams) -> Tuple[list, Optional[str]]:
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor([getattr(rows[-1], key.key) for key in keys])
+    return rows, next_cursor
+
+
+async def paginate(db: AsyncSession, query: Select, keys: Sequence, page: PageParams) -> Tuple[list, Optional[str]]:
+    """Страница ORM-объектов select(Model)"""
+    return split_page((await db.scalars(page_query(query, keys, page))).all(), keys, page)
+
+
+async def paginate_rows(db: AsyncSession, query: Select, keys: Sequence, page: PageParams) -> Tuple[list, Optional[str]]:
+    """Страница строк-кортежей select(колонки...): без identity map и ORM-объектов"""
+    return split_page((await db.execute(page_query(query, keys, page))).all(), keys, page)
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+import secrets
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.engine import make_url
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Обработчик доставки события в локальные соединения процесса
+Deliver = Callable[[dict, List[str]], None]
+
+# Лимит полезной нагрузки NOTIFY в Postgres — 8000 байт
+NOTIFY_PAYLOAD_LIMIT = 7999
+# Место под заголовок части "#<id> <номер> <всего> "
+CHUNK_HEADER_RESERVE = 64
+
+
+def split_payload(payload: str, limit: int = NOTIFY_PAYLOAD_LIMIT) -> List[str]:
+    """
+    Сообщение больше лимита NOTIFY -> части "#<id> <номер> <всего> <кусок>".
+    payload — ASCII (json.dumps экранирует остальное), поэтому символ = байт.
+    """
+    if len(payload.encode()) <= limit:
+        return [payload]
+    size = limit - CHUNK_HEADER_RESERVE
+    pieces = [payload[start:start + size] for start in range(0, len(payload), size)]
+    message_id = secrets.token_hex(8)
+    return [f"#{message_id} {index} {len(pieces)} {piece}" for index, piece in enumerate(pieces)]
+
+
+class InMemoryBroker:
+    """Брокер для одного процесса: публикация сразу доставляется локально"""
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+    async def publish(self, event: dict, topics: Iterable[str]) -> None:
+        if self._deliver is not None:
+            self._deliver(event, list(topics))
+
+
+class PostgresBroker:
+    """
+    Брокер поверх LISTEN/NOTIFY той же БД: у каждого воркера одно выделенное
+    соединение, которое слушает канал и через которое уходят публикации.
+    Событие, опубликованное любым воркером, доставляется во все воркеры.
+    """
+
+    def __init__(self, dsn: str, channel: str, reconnect_delay: float = 1.0):
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._deliver: Optional[Deliver] = None
+        self._connection = None
+        self._lock = asyncio.Lock()  # asyncpg не допускает параллельных запросов в соединении
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._stopping = False
+        # Недособранные сообщения: (pid отправителя, id сообщения) -> полученные куски
+        self._partial: Dict[Tuple[int, str], List[str]] = {}
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        self._stopping = False
+        await self._connect()
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def publish(self, event: dict, topics: Iterable[str]) -> None:
+        """
+        Большое событие уходит частями в одной транзакции: они доставляются
+        подряд и все вместе либо никак. Ошибка пробрасывается — строка outbox
+        останется и будет опубликована повторно.
+        """
+        parts = split_payload(json.dumps({"event": event, "topics": list(topics)}))
+        async with self._lock:
+            if self._connection is None:
+                raise ConnectionError("Notification bus is not connected")
+            if len(parts) == 1:
+                await self._connection.execute("SELECT pg_notify($1, $2)", self.channel, parts[0])
+                return
+            async with self._connection.transaction():
+                for part in parts:
+                    await self._connection.execute("SELECT pg_notify($1, $2)", self.channel, part)
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        connection = await asyncpg.connect(self.dsn)
+        await connection.add_listener(self.channel, self._on_notify)
+        connection.add_termination_listener(self._on_terminate)
+        self._partial.clear()
+        self._connection = connection
+        logger.info(f"Listening for notifications on channel '{self.channel}'")
+
+    def _assemble(self, pid: int, part: str) -> Optional[str]:
+        """Добавляет часть сообщения; возвращает сообщение целиком, когда пришла последняя"""
+        message_id, index, count, piece = part[1:].split(" ", 3)
+        key = (pid, message_id)
+        pieces = self._partial.setdefault(key, [])
+        if int(index) != len(pieces):
+            del self._partial[key]
+            raise ValueError(f"Notification part {index} of {message_id} is out of order")
+        pieces.append(piece)
+        if len(pieces) < int(count):
+            return None
+        del self._partial[key]
+        return "".join(pieces)
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        try:
+            if payload.startswith("#"):
+                payload = self._assemble(pid, payload)
+                if payload is None:
+                    return
+            message = json.loads(payload)
+            self._deliver(message["event"], message["topics"])
+        except Exception as e:
+            logger.error(f"Error delivering notification: {str(e)}")
+
+    def _on_terminate(self, connection) -> None:
+        self._connection = None
+        if not self._stopping:
+            logger.warning("Notification bus connection lost, reconnecting")
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = self.reconnect_delay
+        while not self._stopping:
+            try:
+                await self._connect()
+                return
+            except Exception as e:
+                logger.error(f"Notification bus reconnect failed: {str(e)}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+
+def create_broker():
+    if settings.notify_backend == "postgres":
+        dsn = make_url(settings.database_url).set(drivername="postgresql")
+        return PostgresBroker(dsn.render_as_string(hide_password=False), settings.notify_channel)
+    return InMemoryBroker()
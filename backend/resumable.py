@@ -0,0 +1,319 @@
+"""
+Докачиваемые загрузки: большой файл передаётся частями по явным смещениям.
+
+    POST /uploads/sessions                  name, size[, sha256] -> session_id
+    PUT  /uploads/sessions/{id}?offset=N    тело: байты части как есть
+    GET  /uploads/sessions/{id}             полученные диапазоны байт
+    POST /uploads/sessions/{id}/finalize    [task_id] -> file_path, sha256, size
+
+Файл заранее выделяется (разреженным) в uploads/.partial. Каждая часть
+пишется потоком сразу на своё место через os.pwrite, поэтому части могут
+приходить в любом порядке, повторяться после сбоя или идти параллельно.
+Записанные диапазоны — строки upload_chunks, так что любой запрос сессии
+может обслужить любой воркер на том же хосте.
+
+sha256 считается по мере записи, пока части приходят в этот воркер по
+порядку. finalize дочитывает только то, что текущий хэш не покрыл (при
+последовательной загрузке — ничего), и переносит файл в хранилище по
+содержимому через os.replace. Запись частей держит разделяемый flock на
+частичном файле, finalize берёт исключительный: он дождётся частей в
+процессе записи, и ни одна часть не попадёт в уже сохранённый файл.
+"""
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import secrets
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, Request
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+from .db import SessionLocal
+from .files import HASH_CHUNK, PARTIAL_DIR, content_url, safe_name, store_blob, task_file_rows
+from .models import TaskFiles, Tasks, UploadChunks, UploadSessions
+from .sync import touch_task
+
+logger = logging.getLogger(__name__)
+
+
+class RunningHash:
+    """sha256 непрерывного начала файла, посчитанный по мере записи в этом процессе"""
+
+    def __init__(self):
+        self.hasher = hashlib.sha256()
+        self.hashed = 0  # байт с начала файла уже в hasher
+        self.chunk_ids: Set[int] = set()  # строки upload_chunks, записанные этим процессом
+        self.lock = threading.Lock()
+
+
+_running: Dict[str, RunningHash] = {}
+
+
+def partial_path(session_id: str) -> str:
+    return os.path.join(PARTIAL_DIR, f"{session_id}.part")
+
+
+def merge_ranges(ranges) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_ranges(received: List[Tuple[int, int]], size: int) -> List[Tuple[int, int]]:
+    missing, position = [], 0
+    for start, end in received:
+        if start > position:
+            missing.append((position, start))
+        position = max(position, end)
+    if position < size:
+        missing.append((position, size))
+    return missing
+
+
+async def received_ranges(db: AsyncSession, session_id: str) -> List[Tuple[int, int]]:
+    rows = await db.execute(select(UploadChunks.start, UploadChunks.end).where(UploadChunks.session_id == session_id))
+    return merge_ranges(tuple(row) for row in rows)
+
+
+async def session_state(db: AsyncSession, session: UploadSessions) -> dict:
+    received = await received_ranges(db, session.session_id)
+    return {
+        "session_id": session.session_id,
+        "name": session.name,
+        "size": session.size,
+        "received": received,
+        "complete": not missing_ranges(received, session.size),
+    }
+
+
+async def get_session(db: AsyncSession, session_id: str, for_update: bool = False) -> UploadSessions:
+    session = await db.get(UploadSessions, session_id, with_for_update=for_update)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+
+def _preallocate(path: str, size: int) -> None:
+    with open(path, "xb") as f:
+        f.truncate(size)
+
+
+async def create_session(db: AsyncSession, name: str, size: int, sha256: Optional[str]) -> UploadSessions:
+    if size > settings.upload_session_max_bytes:
+        raise HTTPException(status_code=413, detail=f"File is larger than {settings.upload_session_max_bytes} bytes")
+    session = UploadSessions(session_id=secrets.token_hex(16), name=safe_name(name), size=size, sha256=sha256)
+    await run_in_threadpool(_preallocate, partial_path(session.session_id), size)
+    db.add(session)
+    await db.commit()
+    _running[session.session_id] = RunningHash()
+    return session
+
+
+def _open_for_chunk(path: str) -> Optional[int]:
+    """fd частичного файла под разделяемой блокировкой; None — сессия уже завершена"""
+    try:
+        fd = os.open(path, os.O_WRONLY)
+    except FileNotFoundError:
+        return None
+    fcntl.flock(fd, fcntl.LOCK_SH)
+    try:
+        # Пока ждали блокировку, finalize мог перенести файл в хранилище
+        if os.stat(path).st_ino == os.fstat(fd).st_ino:
+            return fd
+    except FileNotFoundError:
+        pass
+    os.close(fd)
+    return None
+
+
+def _release(fd: int) -> None:
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def _write_block(fd: int, data: bytes, position: int, running: Optional[RunningHash], session_id: str) -> None:
+    view = memoryview(data)
+    offset = position
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view, offset = view[written:], offset + written
+    if running is None:
+        return
+    with running.lock:
+        if position == running.hashed:
+            running.hasher.update(data)
+            running.hashed += len(data)
+        elif position < running.hashed:
+            # Повторно записан уже посчитанный участок — доверять хэшу нельзя
+            _running.pop(session_id, None)
+
+
+async def write_chunk(request: Request, db: AsyncSession, session_id: str, offset: int) -> dict:
+    session = await get_session(db, session_id)
+    size = session.size
+    content_length = request.headers.get("content-length", "")
+    if offset > size or (content_length.isdigit() and offset + int(content_length) > size):
+        raise HTTPException(status_code=416, detail=f"Chunk does not fit into {size} bytes")
+    # Соединение с БД не держим, пока идёт тело запроса
+    await db.commit()
+
+    fd = await run_in_threadpool(_open_for_chunk, partial_path(session_id))
+    if fd is None:
+        raise HTTPException(status_code=409, detail="Upload session is already finalized")
+    running = _running.get(session_id)
+    position = offset
+    buffer = bytearray()
+    try:
+        async for data in request.stream():
+            if position + len(buffer) + len(data) > size:
+                raise HTTPException(status_code=416, detail=f"Chunk does not fit into {size} bytes")
+            buffer += data
+            if len(buffer) >= settings.upload_chunk_size:
+                block, buffer = bytes(buffer), bytearray()
+                await run_in_threadpool(_write_block, fd, block, position, running, session_id)
+                position += len(block)
+        if buffer:
+            await run_in_threadpool(_write_block, fd, bytes(buffer), position, running, session_id)
+            position += len(buffer)
+    finally:
+        try:
+            # Записанное учитываем и при обрыве: клиент продолжит с этого места
+            if position > offset:
+                chunk = UploadChunks(session_id=session_id, start=offset, end=position)
+                db.add(chunk)
+                await db.commit()
+                if running is not None:
+                    running.chunk_ids.add(chunk.chunk_id)
+        finally:
+            await run_in_threadpool(_release, fd)
+    return await session_state(db, session)
+
+
+def _lock_for_finalize(path: str) -> int:
+    """fd частичного файла под исключительной блокировкой: дожидается записываемых частей"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        raise HTTPException(status_code=409, detail="Upload session is already finalized")
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        # Пока ждали блокировку, параллельный finalize мог перенести файл в хранилище
+        if os.stat(path).st_ino == os.fstat(fd).st_ino:
+            return fd
+    except FileNotFoundError:
+        pass
+    os.close(fd)
+    raise HTTPException(status_code=409, detail="Upload session is already finalized")
+
+
+def _finish_hash(fd: int, running: Optional[RunningHash], size: int) -> str:
+    """Дочитывает то, что не попало в хэш на лету (обычно ничего)"""
+    hasher, position = (running.hasher.copy(), running.hashed) if running else (hashlib.sha256(), 0)
+    while position < size:
+        data = os.pread(fd, min(HASH_CHUNK, size - position), position)
+        if not data:
+            break
+        hasher.update(data)
+        position += len(data)
+    return hasher.hexdigest()
+
+
+async def drop_session(db: AsyncSession, session_id: str) -> None:
+    await db.execute(delete(UploadChunks).where(UploadChunks.session_id == session_id))
+    await db.execute(delete(UploadSessions).where(UploadSessions.session_id == session_id))
+    _running.pop(session_id, None)
+
+
+async def finalize_session(db: AsyncSession, session_id: str, task_id: Optional[int]) -> dict:
+    session = await get_session(db, session_id)
+    # Пока ждём блокировку файла и считаем хэш, соединение с БД не держим
+    await db.commit()
+
+    # Сначала файл, потом строки: write_chunk коммитит строку upload_chunks под
+    # разделяемой блокировкой файла, а её внешний ключ ждёт блокировку строки
+    # сессии. Взяв строку раньше файла, finalize и write_chunk ждали бы друг друга
+    # вечно — блокировку файла Postgres в графе ожиданий не видит.
+    path = partial_path(session_id)
+    fd = await run_in_threadpool(_lock_for_finalize, path)
+    try:
+        rows = (await db.execute(
+            select(UploadChunks.chunk_id, UploadChunks.start, UploadChunks.end)
+            .where(UploadChunks.session_id == session_id)
+        )).all()
+        await db.commit()
+        missing = missing_ranges(merge_ranges((row.start, row.end) for row in rows), session.size)
+        if missing:
+            raise HTTPException(status_code=409, detail={"message": "Upload is incomplete", "missing": missing})
+
+        running = _running.get(session_id)
+        if running is not None and any(
+            row.chunk_id not in running.chunk_ids and row.start < running.hashed for row in rows
+        ):
+            # Начало файла дописывал другой воркер — считаем хэш заново
+            running = None
+        sha256 = await run_in_threadpool(_finish_hash, fd, running, session.size)
+        if session.sha256 and session.sha256 != sha256:
+            await drop_session(db, session_id)
+            await db.commit()
+            await run_in_threadpool(os.remove, path)
+            raise HTTPException(status_code=422, detail="sha256 of the assembled file does not match")
+
+        # Сессия удаляется и файл прикрепляется одной транзакцией, а переносится
+        # в хранилище только после commit: при ошибке в БД сессия и частичный
+        # файл остаются на месте, и finalize можно повторить
+        await get_session(db, session_id, for_update=True)
+        file_path = content_url(sha256, session.name)
+        if task_id is not None:
+            if not await db.get(Tasks, task_id, with_for_update=True):
+                raise HTTPException(status_code=404, detail="Task not found")
+            # Тот же путь, что у assigned_files в create_task: вложение в конец списка.
+            # Файла в хранилище ещё нет — метаданные известны и без него
+            last = await db.scalar(select(func.max(TaskFiles.position)).where(TaskFiles.task_id == task_id))
+            described = {file_path: {"path": file_path, "name": session.name, "size": session.size, "sha256": sha256}}
+            await db.execute(insert(TaskFiles), task_file_rows(task_id, [file_path], described, 0 if last is None else last + 1))
+            await touch_task(db, task_id)
+        await drop_session(db, session_id)
+        await db.commit()
+        deduplicated = await run_in_threadpool(store_blob, path, sha256)
+    finally:
+        await run_in_threadpool(_release, fd)
+    return {"file_path": file_path, "name": session.name, "size": session.size, "sha256": sha256, "deduplicated": deduplicated}
+
+
+async def prune_upload_sessions(db: AsyncSession) -> int:
+    cutoff = datetime.now() - timedelta(hours=settings.upload_session_ttl_hours)
+    session_ids = list(await db.scalars(select(UploadSessions.session_id).where(UploadSessions.created_at < cutoff)))
+    for session_id in session_ids:
+        await drop_session(db, session_id)
+        await db.commit()
+        try:
+            await run_in_threadpool(os.remove, partial_path(session_id))
+        except FileNotFoundError:
+            pass
+    return len(session_ids)
+
+
+async def prune_upload_sessions_periodically() -> None:
+    """Фоновое удаление брошенных сессий загрузки и их частичных файлов"""
+    while True:
+        try:
+            async with SessionLocal() as db:
+                pruned = await prune_upload_sessions(db)
+            if pruned:
+                logger.info(f"Pruned {pruned} upload sessions")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Upload session pruning failed: {str(e)}")
+        await asyncio.sleep(settings.upload_session_prune_interval)
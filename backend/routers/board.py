@@ -1,98 +1,100 @@
 from typing import List
-from fastapi import APIRouter, HTTPException, Query, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 
 from ..models import Tasks, KanbanBoards
 from ..db import get_db
 from ..schemas.board import Board, BoardCreate, BoardUpdate, BoardWithTasks
 from ..schemas.task import Task
+from ..schemas.pagination import Page
+from ..pagination import PageParams, paginate
+from ..fastpath import select_task_rows, task_page_response
+from ..loaders import to_task_schemas
+from ..search import search_by_name
+from ..counters import read_counts
+from ..sync import scope_version
+from ..etag import make_etag, not_modified
 
 
 router = APIRouter()
 
 
-@router.get("/boards/{board_id}/tasks", response_model=List[Task], summary="Получить задачи по ID доски")
-def get_tasks(board_id: int, db: Session = Depends(get_db)):
-    tasks = db.query(Tasks).filter(Tasks.board_id == board_id).all()
-    return tasks
+@router.get("/boards/{board_id}/tasks", response_model=Page[Task], summary="Получить задачи по ID доски")
+async def get_tasks(board_id: int, page: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    return await task_page_response(db, select_task_rows(Tasks.board_id == board_id), [Tasks.task_id], page)
 
 #Создание канбан доски в БД 
 @router.post("/boards", response_model=Board, summary="Создать новую доску")
-def create_board(board: BoardCreate, db: Session = Depends(get_db)):
+async def create_board(board: BoardCreate, db: AsyncSession = Depends(get_db)):
     db_board = KanbanBoards(**board.model_dump())
     db.add(db_board)
-    db.commit()
-    db.refresh(db_board)
+    await db.commit()
+    await db.refresh(db_board)
     return db_board
 
 # Получение списка всех досок
-@router.get("/boards", response_model=List[Board], summary="Получить список всех досок")
-def get_boards(db: Session = Depends(get_db)):
-    return db.query(KanbanBoards).all()
+@router.get("/boards", response_model=Page[Board], summary="Получить список всех досок")
+async def get_boards(page: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    boards, next_cursor = await paginate(db, select(KanbanBoards), [KanbanBoards.board_id], page)
+    return Page(items=boards, next_cursor=next_cursor)
 
 # Получение доски по ID
 @router.get("/boards/{board_id}", response_model=Board, summary="Получить доску по ID")
-def get_board(board_id: int, db: Session = Depends(get_db)):
-    board = db.get(KanbanBoards, board_id)
+async def get_board(board_id: int, db: AsyncSession = Depends(get_db)):
+    board = await db.get(KanbanBoards, board_id)
     if not board:
         raise HTTPException(status_code=404, detail="Board not found")
     return board
 
 # Обновление информации о доске
 @router.put("/boards/{board_id}", response_model=Board, summary="Обновить данные доски по ID")
-def update_board(board_id: int, board_update: BoardUpdate, db: Session = Depends(get_db)):
-    board = db.get(KanbanBoards, board_id)
+async def update_board(board_id: int, board_update: BoardUpdate, db: AsyncSession = Depends(get_db)):
+    board = await db.get(KanbanBoards, board_id)
     if not board:
         raise HTTPException(status_code=404, detail="Board not found")
     # Обновляем только переданные поля
     for key, value in board_update.model_dump(exclude_unset=True).items():
         setattr(board, key, value)
-    db.commit()
-    db.refresh(board)
+    await db.commit()
+    await db.refresh(board)
     return board
 
 # Удаление доски по ID
 @router.delete("/boards/{board_id}", summary="Удалить доску по ID")
-def delete_board(board_id: int, db: Session = Depends(get_db)):
-    board = db.get(KanbanBoards, board_id)
+async def delete_board(board_id: int, db: AsyncSession = Depends(get_db)):
+    board = await db.get(KanbanBoards, board_id)
     if not board:
         raise HTTPException(status_code=404, detail="Board not found")
-    db.delete(board)
-    db.commit()
+    await db.delete(board)
+    await db.commit()
     return {"detail": "Доска успешно удалена"}
 
 
 
 # Поиск досок по названию
 @router.get("/boards/search/by-name", response_model=List[Board], summary="Поиск досок по названию")
-def search_boards(query: str = Query(..., description="Search query"), db: Session = Depends(get_db)):
+async def search_boards(query: str = Query(..., description="Search query"), limit: int = Query(20, ge=1, le=100), db: AsyncSession = Depends(get_db)):
     """Поиск досок по названию"""
-    return db.query(KanbanBoards).filter(KanbanBoards.title.ilike(f"%{query}%")).all()
+    return await search_by_name(db, KanbanBoards, query, limit)
 
 # Получение статистики по доске
 @router.get("/boards/{board_id}/stats", summary="Получить статистику по доске")
-def get_board_stats(board_id: int, db: Session = Depends(get_db)):
-    board = db.get(KanbanBoards, board_id)
+async def get_board_stats(board_id: int, db: AsyncSession = Depends(get_db)):
+    board = await db.get(KanbanBoards, board_id)
     if not board:
         raise HTTPException(status_code=404, detail="Board not found")
     
-    total_tasks = db.query(Tasks).filter(Tasks.board_id == board_id).count()
-    tasks_by_status = db.query(
-        Tasks.status,
-        func.count(Tasks.task_id)
-    ).filter(Tasks.board_id == board_id).group_by(Tasks.status).all()
-    
+    tasks_by_status = await read_counts(db, "board", board_id)
     return {
-        "board_name": board.title,
-        "total_tasks": total_tasks,
-        "tasks_by_status": dict(tasks_by_status)
+        "board_name": board.name,
+        "total_tasks": sum(tasks_by_status.values()),
+        "tasks_by_status": tasks_by_status
     }
 
 # Получение недавно созданных досок
 # @router.get("/boards/recent", response_model=List[BoardBase])
-# def get_recent_boards(days: int = 7, db: Session = Depends(get_db)):
+# def get_recent_boards(days: int = 7, db: AsyncSession = Depends(get_db)):
 #     cutoff_date = datetime.now() - timedelta(days=days)
 #     return db.query(KanbanBoards).filter(
 #         KanbanBoards.created_at >= cutoff_date
@@ -100,7 +102,7 @@ def get_board_stats(board_id: int, db: Session = Depends(get_db)):
 
 # # Получение досок с наибольшим количеством задач
 # @router.get("/boards/most-active", response_model=List[BoardBase])
-# def get_most_active_boards(limit: int = 5, db: Session = Depends(get_db)):
+# def get_most_active_boards(limit: int = 5, db: AsyncSession = Depends(get_db)):
 #     return db.query(
 #         KanbanBoards,
 #         func.count(Tasks.task_id).label('task_count')
@@ -109,13 +111,23 @@ def get_board_stats(board_id: int, db: Session = Depends(get_db)):
 #     ).limit(limit).all()
 
 @router.get("/boards/{board_id}/with-tasks", response_model=BoardWithTasks, summary="Получить доску с задачами")
-def get_board_with_tasks(board_id: int, db: Session = Depends(get_db)):
-    board = db.get(KanbanBoards, board_id)
+async def get_board_with_tasks(board_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    # Строка доски без ORM: её поля входят в ETag и в ответ
+    board = (await db.execute(select(
+        KanbanBoards.board_id, KanbanBoards.user_id, KanbanBoards.name,
+        KanbanBoards.created_at, KanbanBoards.updated_at,
+    ).where(KanbanBoards.board_id == board_id))).first()
     if not board:
         raise HTTPException(status_code=404, detail="Board not found")
-    
-    tasks = db.query(Tasks).filter(Tasks.board_id == board_id).all()
-    return BoardWithTasks(**board.__dict__, tasks=tasks)
+
+    # Версия считается до чтения задач: если между запросами что-то изменится,
+    # клиент получит свежие данные со старым ETag и просто перезапросит их позже
+    etag = make_etag("board", tuple(board), await scope_version(db, "board", board_id))
+    if cached := not_modified(request, response, etag):
+        return cached
+
+    tasks = (await db.scalars(select(Tasks).where(Tasks.board_id == board_id))).all()
+    return BoardWithTasks(**board._mapping, tasks=await to_task_schemas(db, tasks))
 
 '''
 {
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..db import engine
+from ..metrics import pool_stats, render_prometheus, request_stats
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse, summary="Метрики в формате Prometheus")
+async def get_metrics():
+    return PlainTextResponse(
+        render_prometheus(request_stats, engine.sync_engine.pool, pool_stats),
+        media_type=PROMETHEUS_CONTENT_TYPE,
+    )
+
+
+@router.get("/metrics/pool", summary="Статистика пула соединений с БД")
+async def get_pool_stats():
+    return pool_stats.snapshot(engine.sync_engine.pool)
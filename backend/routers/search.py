@@ -0,0 +1,23 @@
+from typing import List, Literal
+from fastapi import APIRouter, Query, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import get_db
+from ..schemas.search import SearchResults
+from ..search import SEARCH_TYPES, search_all
+
+
+router = APIRouter()
+
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+
+@router.get("/search", response_model=SearchResults, summary="Поиск по задачам, пользователям, группам и доскам")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Поисковый запрос"),
+    types: List[Literal["task", "user", "group", "board"]] = Query(list(SEARCH_TYPES), description="Типы результатов"),
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT, description="Результатов каждого типа"),
+    db: AsyncSession = Depends(get_db),
+):
+    return SearchResults(query=q, items=await search_all(db, q, types, limit))
@@ -0,0 +1,38 @@
+from typing import Optional
+from fastapi import APIRouter, Query, Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Tasks
+from ..db import get_db
+from ..schemas.sync import SyncResponse, Tombstone
+from ..pagination import DEFAULT_LIMIT, MAX_LIMIT
+from ..loaders import to_task_schemas
+from ..sync import parse_scope, changes_since
+
+
+router = APIRouter()
+
+
+@router.get("/sync", response_model=SyncResponse, summary="Изменения задач доски, группы или пользователя с момента курсора")
+async def sync(
+    scope: str = Query(..., description="board:<id>, group:<id> или user:<id>"),
+    since: Optional[str] = Query(None, description="next_cursor предыдущего ответа; без него — все задачи области"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT, description="Изменений за один ответ"),
+    db: AsyncSession = Depends(get_db),
+):
+    scope_type, scope_id = parse_scope(scope)
+    events, next_cursor, has_more = await changes_since(db, scope_type, scope_id, since, limit)
+
+    changed_ids = [task_id for task_id, reason in events if reason is None]
+    tasks = {}
+    if changed_ids:
+        tasks = {t.task_id: t for t in await db.scalars(select(Tasks).where(Tasks.task_id.in_(changed_ids)))}
+    # Задача, удалённая между запросами, придёт tombstone в следующей синхронизации
+    changed = await to_task_schemas(db, [tasks[task_id] for task_id in changed_ids if task_id in tasks])
+    return SyncResponse(
+        changed=changed,
+        removed=[Tombstone(task_id=task_id, reason=reason) for task_id, reason in events if reason is not None],
+        next_cursor=next_cursor,
+        has_more=has_more,
+    )
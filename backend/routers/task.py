@@ -1,25 +1,37 @@
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Query, Depends, UploadFile, File
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import ARRAY, Integer, any_, bindparam, insert, select, update
 from datetime import datetime, timedelta
-from fastapi.responses import FileResponse
 import os
-import json
 
-from ..models import Tasks, Users, users_tasks_table
+from ..models import TaskFiles, Tasks, Users, users_tasks_table, task_assigners_table
 from ..db import get_db
-from ..schemas.task import Task, TaskCreate, TaskUpdate, TaskResponse, TaskStatus, BulkTaskUpdate, TaskAssignment
-from sqlalchemy import Table, Column, Integer, String, DateTime, ForeignKey
-from .ws_notify import notify_students_about_task
+from ..schemas.task import Task, TaskCreate, TaskUpdate, TaskResponse, TaskStatus, BulkTaskUpdate, BulkTaskCreate, TaskAssignment
+from ..schemas.pagination import Page
+from ..schemas.upload import UploadedFile
+from ..pagination import PageParams
+from ..fastpath import select_task_rows, task_page_response
+from ..loaders import load_task_files, load_task_people, build_task, to_task_schemas, to_task_schema
+from ..search import search_tasks as find_tasks
+from .ws_notify import task_topics
+from ..outbox import enqueue_event, enqueue_events, wake_dispatcher
+from ..counters import CounterDeltas, read_total_counts
+from ..deadlines import deadline_scheduler
+from ..sync import add_tombstones, tombstones, touch_task
+from ..etag import make_etag, not_modified
+from ..downloads import file_response
+from ..files import SHA256_RE, UPLOAD_DIR, attach_files, blob_path, describe_files, receive_upload, task_file_rows
 
 router = APIRouter()
 
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), '..', 'uploads')
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Потолок задач в одном POST /tasks/bulk
+BULK_CREATE_LIMIT = 5000
+# Размер пачки ID в одном UPDATE для PUT /tasks/bulk/status
+BULK_UPDATE_CHUNK = 10000
 
-@router.post("/tasks", response_model=TaskResponse, summary="Создать новую задачу")
-def create_task(task: TaskCreate, db: Session = Depends(get_db)):
+def prepare_task_row(task: TaskCreate):
+    """TaskCreate -> (значения колонок tasks, ID исполнителя, ID назначившего, пути вложений)"""
     task_data = task.model_dump()
     # Устанавливаем дефолтные значения
     task_data["status"] = TaskStatus.TODO
@@ -36,15 +48,20 @@ def create_task(task: TaskCreate, db: Session = Depends(get_db)):
     user_id = task_data.pop("user_id")  # ID исполнителя (студента)
     assigner_id = task_data.pop("assigner_id", 1)  # ID назначившего (преподавателя)
 
-    # сериализация assigned_files
-    if "assigned_files" in task_data and task_data["assigned_files"] is not None:
-        task_data["assigned_files"] = json.dumps(task_data["assigned_files"])
+    # Вложения пишутся в task_files отдельными строками
+    file_paths = task_data.pop("assigned_files") or []
+    return task_data, user_id, assigner_id, file_paths
+
+@router.post("/tasks", response_model=TaskResponse, summary="Создать новую задачу")
+async def create_task(task: TaskCreate, db: AsyncSession = Depends(get_db)):
+    task_data, user_id, assigner_id, file_paths = prepare_task_row(task)
 
     # Создаем задачу
     db_task = Tasks(**task_data)
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    await db.flush()
+
+    files = await attach_files(db, db_task.task_id, file_paths)
 
     # Если указан исполнитель, добавляем запись в таблицу users_tasks
     if user_id is not None:
@@ -53,49 +70,123 @@ def create_task(task: TaskCreate, db: Session = Depends(get_db)):
             task_id=db_task.task_id,
             assigned_at=datetime.now()
         )
-        db.execute(stmt)
+        await db.execute(stmt)
 
     # Добавляем назначившего
-    assigner = db.get(Users, assigner_id)
+    assigner = await db.get(Users, assigner_id)
     if assigner:
-        db_task.assigners.append(assigner)
+        await db.execute(task_assigners_table.insert().values(
+            user_id=assigner_id,
+            task_id=db_task.task_id,
+            assigned_at=datetime.now()
+        ))
 
-    db.commit()
-    db.refresh(db_task)
+    deltas = CounterDeltas()
+    deltas.add(db_task.status, db_task.board_id, db_task.group_id, [user_id] if user_id is not None else [])
+    await deltas.apply(db)
+
+    await db.commit()
+    await db.refresh(db_task)
+    deadline_scheduler.task_changed(db_task.task_id, db_task.deadline, db_task.status)
 
-    # десериализация assigned_files для ответа
-    assigned_files = json.loads(db_task.assigned_files) if db_task.assigned_files else []
     response = TaskResponse(
-        **{**db_task.__dict__, "assigned_files": assigned_files},
+        **db_task.__dict__,
+        assigned_files=file_paths,
+        files=files,
         user_ids=[user_id] if user_id is not None else [],  # Добавляем ID исполнителя в ответ, если он есть
         assigner_id=assigner_id
     )
     return response
 
-@router.get("/tasks", response_model=List[Task], summary="Получить список всех задач")
-def get_tasks(group_id: Optional[int] = None, db: Session = Depends(get_db)):
-    query = db.query(Tasks)
-    if group_id:
-        query = query.filter(Tasks.group_id == group_id)
-    tasks = query.all()
-    # десериализация assigned_files для каждого задания
-    result = []
-    for t in tasks:
-        assigned_files = json.loads(t.assigned_files) if t.assigned_files else []
-        result.append(Task(**{**t.__dict__, "assigned_files": assigned_files}))
-    return result
+@router.post("/tasks/bulk", response_model=List[TaskResponse], summary="Массовое создание задач")
+async def create_tasks_bulk(bulk: BulkTaskCreate, db: AsyncSession = Depends(get_db)):
+    """
+    Создаёт задачи пачкой в одной транзакции: задачи — одним INSERT ... RETURNING,
+    связи users_tasks и task_assigners — многострочными INSERT, события — одной
+    пачкой в outbox. Либо список tasks, либо template + user_ids (по задаче на каждого).
+    """
+    prepared = [prepare_task_row(task) for task in bulk.expand()]
+    if not prepared:
+        return []
+    if len(prepared) > BULK_CREATE_LIMIT:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_CREATE_LIMIT} tasks per request")
 
-@router.get("/tasks/{task_id}", response_model=Task, summary="Получить задачу по ID")
-def get_task(task_id: int, db: Session = Depends(get_db)):
-    task = db.get(Tasks, task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    assigned_files = json.loads(task.assigned_files) if task.assigned_files else []
-    return Task(**{**task.__dict__, "assigned_files": assigned_files})
+    # Проверяем всех упомянутых пользователей одним запросом
+    referenced = {uid for _, user_id, assigner_id, _ in prepared for uid in (user_id, assigner_id) if uid is not None}
+    existing = set(await db.scalars(select(Users.user_id).where(Users.user_id.in_(referenced))))
+    missing = {user_id for _, user_id, _, _ in prepared if user_id is not None} - existing
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Users not found: {sorted(missing)}")
+
+    # У задач из шаблона вложения общие — каждый файл читается один раз
+    described = await describe_files(path for _, _, _, file_paths in prepared for path in file_paths)
+
+    db_tasks = (await db.scalars(
+        insert(Tasks).returning(Tasks, sort_by_parameter_order=True),
+        [task_data for task_data, _, _, _ in prepared],
+    )).all()
+    files = [task_file_rows(t.task_id, file_paths, described) for t, (_, _, _, file_paths) in zip(db_tasks, prepared)]
+    if any(files):
+        await db.execute(insert(TaskFiles), [row for rows in files for row in rows])
+
+    now = datetime.now()
+    assignments = [
+        {"user_id": user_id, "task_id": t.task_id, "assigned_at": now}
+        for t, (_, user_id, _, _) in zip(db_tasks, prepared) if user_id is not None
+    ]
+    # Как и в create_task, несуществующий назначивший просто не записывается
+    assigners = [
+        {"user_id": assigner_id, "task_id": t.task_id, "assigned_at": now}
+        for t, (_, _, assigner_id, _) in zip(db_tasks, prepared) if assigner_id in existing
+    ]
+    if assignments:
+        await db.execute(insert(users_tasks_table).values(assignments))
+    if assigners:
+        await db.execute(insert(task_assigners_table).values(assigners))
+
+    deltas = CounterDeltas()
+    for t, (_, user_id, _, _) in zip(db_tasks, prepared):
+        deltas.add(t.status, t.board_id, t.group_id, [user_id] if user_id is not None else [])
+    await deltas.apply(db)
+
+    timestamp = int(now.timestamp() * 1000)
+    enqueue_events(db, [
+        ({
+            "event": "new_task",
+            "user_id": user_id,
+            "task_id": t.task_id,
+            "timestamp": timestamp,
+        }, task_topics([user_id] if user_id is not None else [], t.board_id, t.group_id))
+        for t, (_, user_id, _, _) in zip(db_tasks, prepared)
+    ])
+    await db.commit()
+    wake_dispatcher()
+    for t in db_tasks:
+        deadline_scheduler.task_changed(t.task_id, t.deadline, t.status)
+
+    return [
+        TaskResponse(
+            **t.__dict__,
+            assigned_files=file_paths,
+            files=task_files,
+            user_ids=[user_id] if user_id is not None else [],
+            assigner_id=assigner_id,
+        )
+        for t, (_, user_id, assigner_id, file_paths), task_files in zip(db_tasks, prepared, files)
+    ]
+
+@router.get("/tasks", response_model=Page[Task], summary="Получить список всех задач")
+async def get_tasks(group_id: Optional[int] = None, page: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    query = select_task_rows()
+    if group_id:
+        query = query.where(Tasks.group_id == group_id)
+    return await task_page_response(db, query, [Tasks.task_id], page)
 
 @router.patch("/tasks/{task_id}", response_model=Task, summary="Обновить задачу")
-async def update_task(task_id: int, task_update: TaskUpdate, db: Session = Depends(get_db)):
-    task = db.query(Tasks).filter(Tasks.task_id == task_id).first()
+async def update_task(task_id: int, task_update: TaskUpdate, db: AsyncSession = Depends(get_db)):
+    # Блокировка строки: счётчики считаются от прежнего состояния задачи,
+    # и параллельное изменение не должно его подменить
+    task = await db.get(Tasks, task_id, with_for_update=True)
     if not task:
         raise HTTPException(
             status_code=404,
@@ -103,36 +194,49 @@ async def update_task(task_id: int, task_update: TaskUpdate, db: Session = Depen
         )
     
     update_data = task_update.model_dump(exclude_unset=True)
-    old_status = task.status
+    old_status, old_board_id, old_group_id = task.status, task.board_id, task.group_id
     for key, value in update_data.items():
         setattr(task, key, value)
     
-    db.commit()
-    db.refresh(task)
+    # Исполнители и назначившие задачи — одним запросом
+    people, assigners = await load_task_people(db, [task_id])
+    user_ids, assigner_ids = people.get(task_id, []), assigners.get(task_id, [])
+    files = (await load_task_files(db, [task_id])).get(task_id, [])
+
+    deltas = CounterDeltas()
+    deltas.remove(old_status, old_board_id, old_group_id, user_ids)
+    deltas.add(task.status, task.board_id, task.group_id, user_ids)
+    await deltas.apply(db)
+
+    # Перенос в другую доску/группу — tombstone для прежней
+    await add_tombstones(db, tombstones(
+        task_id, "moved",
+        board_id=old_board_id if task.board_id != old_board_id else None,
+        group_id=old_group_id if task.group_id != old_group_id else None,
+    ))
+    # Оповещаем студентов и преподавателей (assigners) одним событием:
+    # каждый подписанный сокет получит его ровно один раз.
+    # Событие пишется в outbox в той же транзакции, что и изменение задачи
+    notify_ids = sorted(set(user_ids + assigner_ids))
+    enqueue_event(db, {
+        "event": "update_status",
+        "user_ids": notify_ids,
+        "task_id": task_id,
+        "status": task.status.value if hasattr(task.status, 'value') else str(task.status),
+        "old_status": old_status.value if hasattr(old_status, 'value') else str(old_status),
+        "timestamp": int(datetime.now().timestamp() * 1000)
+    }, task_topics(notify_ids, task.board_id, task.group_id))
     
-    # Получаем всех пользователей, которым назначена задача
-    user_ids = [user.user_id for user in task.users]
-    # Оповещаем студентов и преподавателей (assigners)
-    assigner_ids = [assigner.user_id for assigner in getattr(task, 'assigners', [])]
-    notify_ids = set(user_ids + assigner_ids)
+    await db.commit()
+    await db.refresh(task)
+    wake_dispatcher()
+    deadline_scheduler.task_changed(task_id, task.deadline, task.status)
     
-    # Отправляем уведомления всем заинтересованным пользователям
-    for user_id in notify_ids:
-        await notify_students_about_task({
-            "event": "update_status",
-            "user_id": user_id,
-            "task_id": task_id,
-            "status": task.status.value if hasattr(task.status, 'value') else str(task.status),
-            "old_status": old_status.value if hasattr(old_status, 'value') else str(old_status),
-            "timestamp": int(datetime.now().timestamp() * 1000)
-        })
-    
-    return task
+    return build_task(task, user_ids, assigner_ids, files)
 
 @router.delete("/tasks/{task_id}", summary="Удалить задачу по ID")
-async def delete_task(task_id: int, db: Session = Depends(get_db)):
-    # Используем query вместо get для единообразия с другими методами
-    task = db.query(Tasks).filter(Tasks.task_id == task_id).first()
+async def delete_task(task_id: int, db: AsyncSession = Depends(get_db)):
+    task = await db.get(Tasks, task_id, with_for_update=True)
     if not task:
         raise HTTPException(
             status_code=404,
@@ -141,99 +245,192 @@ async def delete_task(task_id: int, db: Session = Depends(get_db)):
     
     try:
         # Получаем всех пользователей, которым назначена задача
-        user_ids = [user.user_id for user in task.users]
+        people, _ = await load_task_people(db, [task_id])
+        user_ids = people.get(task_id, [])
         
-        # Удаляем задачу
-        db.delete(task)
-        db.commit()
+        # Удаляем связи и саму задачу
+        await db.execute(users_tasks_table.delete().where(users_tasks_table.c.task_id == task_id))
+        await db.execute(task_assigners_table.delete().where(task_assigners_table.c.task_id == task_id))
+        await db.execute(TaskFiles.__table__.delete().where(TaskFiles.task_id == task_id))
+        await db.delete(task)
+
+        deltas = CounterDeltas()
+        deltas.remove(task.status, task.board_id, task.group_id, user_ids)
+        await deltas.apply(db)
+        await add_tombstones(db, tombstones(task_id, "deleted", task.board_id, task.group_id, user_ids))
         
         # Оповещаем студентов
-        for user_id in user_ids:
-            await notify_students_about_task({
-                "event": "delete_task",
-                "user_id": user_id,
-                "task_id": task_id,
-                "timestamp": int(datetime.now().timestamp() * 1000)
-            })
+        enqueue_event(db, {
+            "event": "delete_task",
+            "user_ids": user_ids,
+            "task_id": task_id,
+            "timestamp": int(datetime.now().timestamp() * 1000)
+        }, task_topics(user_ids, task.board_id, task.group_id))
+        await db.commit()
+        wake_dispatcher()
+        deadline_scheduler.task_removed(task_id)
         
         return {"detail": f"Task {task_id} deleted successfully"}
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error deleting task: {str(e)}"
         )
 
-@router.get("/tasks/status/{status}", response_model=List[Task], summary="Получить задачи по статусу")
-def get_tasks_by_status(status: TaskStatus, db: Session = Depends(get_db)):
-    return db.query(Tasks).filter(Tasks.status == status).all()
+@router.get("/tasks/status/{status}", response_model=Page[Task], summary="Получить задачи по статусу")
+async def get_tasks_by_status(status: TaskStatus, page: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    return await task_page_response(db, select_task_rows(Tasks.status == status), [Tasks.task_id], page)
 
-@router.get("/tasks/search", response_model=List[Task], summary="Поиск задач по названию")
-def search_tasks(query: str, db: Session = Depends(get_db)):
-    return db.query(Tasks).filter(Tasks.title.ilike(f"%{query}%")).all()
+@router.get("/tasks/search", response_model=List[Task], summary="Поиск задач по названию и описанию")
+async def search_tasks(query: str, limit: int = Query(20, ge=1, le=100), db: AsyncSession = Depends(get_db)):
+    return await to_task_schemas(db, await find_tasks(db, query, limit))
 
-@router.get("/tasks/upcoming", response_model=List[Task], summary="Получить задачи с истекающим дедлайном")
-def get_upcoming_tasks(days: int = 7, group_id: Optional[int] = None, db: Session = Depends(get_db)):
+@router.get("/tasks/upcoming", response_model=Page[Task], summary="Получить задачи с истекающим дедлайном")
+async def get_upcoming_tasks(days: int = 7, group_id: Optional[int] = None, page: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
     today = datetime.now()
     deadline = today + timedelta(days=days)
-    query = db.query(Tasks).filter(
+    query = select_task_rows(
         Tasks.deadline <= deadline,
         Tasks.status != TaskStatus.DONE
     )
     if group_id:
-        query = query.filter(Tasks.group_id == group_id)
-    return query.all()
+        query = query.where(Tasks.group_id == group_id)
+    return await task_page_response(db, query, [Tasks.deadline, Tasks.task_id], page)
+
+def ids_match(db: AsyncSession, column, ids: List[int]):
+    """column = ANY(:ids) одним параметром-массивом в Postgres, IN (...) в остальных СУБД"""
+    if db.bind.dialect.name == "postgresql":
+        return column == any_(bindparam("ids", ids, type_=ARRAY(Integer)))
+    return column.in_(ids)
 
 @router.put("/tasks/bulk/status", summary="Массовое обновление статуса задач")
-def bulk_update_task_status(update: BulkTaskUpdate, db: Session = Depends(get_db)):
-    tasks = db.query(Tasks).filter(Tasks.task_id.in_(update.task_ids)).all()
-    for task in tasks:
-        task.status = update.status
-    db.commit()
-    return {"detail": f"Updated {len(tasks)} tasks to status {update.status}"}
-
-@router.get("/tasks/priority/{priority}", response_model=List[Task], summary="Получить задачи по приоритету")
-def get_tasks_by_priority(priority: str, group_id: Optional[int] = None, db: Session = Depends(get_db)):
-    query = db.query(Tasks).filter(Tasks.priority == priority)
+async def bulk_update_task_status(bulk: BulkTaskUpdate, db: AsyncSession = Depends(get_db)):
+    """
+    Один UPDATE ... RETURNING на пачку ID: меняются только задачи с другим статусом,
+    прежний статус берётся из подзапроса с блокировкой строк. По изменённым
+    задачам в той же транзакции пишутся события update_status.
+    """
+    task_ids = list(dict.fromkeys(bulk.task_ids))
+    now = datetime.now()
+    changed = []
+    for start in range(0, len(task_ids), BULK_UPDATE_CHUNK):
+        chunk = task_ids[start:start + BULK_UPDATE_CHUNK]
+        old = (
+            select(Tasks.task_id, Tasks.status)
+            .where(ids_match(db, Tasks.task_id, chunk), Tasks.status != bulk.status)
+            .with_for_update()
+        )
+        if db.bind.dialect.name != "postgresql":
+            # SQLite разворачивает подзапрос в UPDATE ... FROM и вернул бы уже
+            # новый статус — читаем прежний отдельным запросом (запись
+            # в SQLite и так сериализована)
+            rows = (await db.execute(old.add_columns(Tasks.board_id, Tasks.group_id))).all()
+            if rows:
+                await db.execute(
+                    update(Tasks)
+                    .where(Tasks.task_id.in_([row.task_id for row in rows]))
+                    .values(status=bulk.status, updated_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+            changed += rows
+            continue
+        old = old.subquery("old")
+        stmt = (
+            update(Tasks)
+            .where(Tasks.task_id == old.c.task_id)
+            .values(status=bulk.status, updated_at=now)
+            .returning(Tasks.task_id, old.c.status, Tasks.board_id, Tasks.group_id)
+            .execution_options(synchronize_session=False)
+        )
+        changed += (await db.execute(stmt)).all()
+
+    people, assigners = await load_task_people(db, [row.task_id for row in changed])
+    timestamp = int(now.timestamp() * 1000)
+    deltas = CounterDeltas()
+    events = []
+    for task_id, old_status, board_id, group_id in changed:
+        deltas.remove(old_status, board_id, group_id, people.get(task_id, []))
+        deltas.add(bulk.status, board_id, group_id, people.get(task_id, []))
+        notify_ids = sorted(set(people.get(task_id, []) + assigners.get(task_id, [])))
+        events.append(({
+            "event": "update_status",
+            "user_ids": notify_ids,
+            "task_id": task_id,
+            "status": bulk.status.value,
+            "old_status": old_status.value if hasattr(old_status, 'value') else str(old_status),
+            "timestamp": timestamp
+        }, task_topics(notify_ids, board_id, group_id)))
+    await deltas.apply(db)
+    enqueue_events(db, events)
+    await db.commit()
+    wake_dispatcher()
+    # Завершённые выпадают из расписания, переоткрытые перечитываются
+    await deadline_scheduler.refresh(db, [row.task_id for row in changed])
+
+    return {
+        "detail": f"Updated {len(changed)} tasks to status {bulk.status.value}",
+        "updated": [
+            {"task_id": event["task_id"], "old_status": event["old_status"], "status": event["status"]}
+            for event, _ in events
+        ],
+    }
+
+@router.get("/tasks/priority/{priority}", response_model=Page[Task], summary="Получить задачи по приоритету")
+async def get_tasks_by_priority(priority: str, group_id: Optional[int] = None, page: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    query = select_task_rows(Tasks.priority == priority)
     if group_id:
-        query = query.filter(Tasks.group_id == group_id)
-    return query.all()
+        query = query.where(Tasks.group_id == group_id)
+    return await task_page_response(db, query, [Tasks.task_id], page)
 
-@router.get("/tasks/group/{group_id}", response_model=List[Task], summary="Получить задачи по группе")
-def get_tasks_by_group(group_id: int, db: Session = Depends(get_db)):
-    return db.query(Tasks).filter(Tasks.group_id == group_id).all()
+@router.get("/tasks/group/{group_id}", response_model=Page[Task], summary="Получить задачи по группе")
+async def get_tasks_by_group(group_id: int, page: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    return await task_page_response(db, select_task_rows(Tasks.group_id == group_id), [Tasks.task_id], page)
 
 @router.get("/tasks/stats", summary="Получить статистику по задачам")
-def get_task_stats(db: Session = Depends(get_db)):
-    total_tasks = db.query(Tasks).count()
-    tasks_by_status = db.query(
-        Tasks.status,
-        func.count(Tasks.task_id)
-    ).group_by(Tasks.status).all()
-    
+async def get_task_stats(db: AsyncSession = Depends(get_db)):
+    tasks_by_status = await read_total_counts(db)
     return {
-        "total_tasks": total_tasks,
-        "tasks_by_status": dict(tasks_by_status)
+        "total_tasks": sum(tasks_by_status.values()),
+        "tasks_by_status": tasks_by_status
     }
 
+# Объявлен после статических путей /tasks/..., иначе перехватывал бы их
+@router.get("/tasks/{task_id}", response_model=Task, summary="Получить задачу по ID")
+async def get_task(task_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    # Позиция изменения меняется при любой записи задачи, включая смену исполнителей
+    version = (await db.execute(
+        select(Tasks.change_xid, Tasks.change_seq, Tasks.updated_at).where(Tasks.task_id == task_id)
+    )).first()
+    if not version:
+        raise HTTPException(status_code=404, detail="Task not found")
+    etag = make_etag("task", task_id, tuple(version))
+    if cached := not_modified(request, response, etag):
+        return cached
+
+    task = await db.get(Tasks, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return await to_task_schema(db, task)
+
 @router.post("/users_tasks", summary="Назначить задачу пользователю")
-async def assign_task_to_user(assignment: TaskAssignment, db: Session = Depends(get_db)):
+async def assign_task_to_user(assignment: TaskAssignment, db: AsyncSession = Depends(get_db)):
     # Проверяем существование пользователя
-    user = db.get(Users, assignment.user_id)
+    user = await db.get(Users, assignment.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Проверяем существование задачи
-    task = db.get(Tasks, assignment.task_id)
+    # Проверяем существование задачи (строка блокируется до commit — см. update_task)
+    task = await db.get(Tasks, assignment.task_id, with_for_update=True)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
     # Проверяем, не назначена ли уже задача этому пользователю
-    existing_assignment = db.query(users_tasks_table).filter(
+    existing_assignment = (await db.execute(select(users_tasks_table).where(
         users_tasks_table.c.user_id == assignment.user_id,
         users_tasks_table.c.task_id == assignment.task_id
-    ).first()
+    ))).first()
     
     if existing_assignment:
         raise HTTPException(status_code=400, detail="Task already assigned to this user")
@@ -244,25 +441,33 @@ async def assign_task_to_user(assignment: TaskAssignment, db: Session = Depends(
         task_id=assignment.task_id,
         assigned_at=datetime.now()
     )
-    db.execute(stmt)
-    db.commit()
-    
-    await notify_students_about_task({
+    await db.execute(stmt)
+    deltas = CounterDeltas()
+    deltas.add(task.status, user_ids=[assignment.user_id])
+    await deltas.apply(db)
+    await touch_task(db, assignment.task_id)
+    enqueue_event(db, {
         "event": "new_task",
         "user_id": assignment.user_id,
         "task_id": assignment.task_id,
         "timestamp": int(datetime.now().timestamp() * 1000)  # ms
-    })
+    }, task_topics([assignment.user_id], task.board_id, task.group_id))
+    await db.commit()
+    wake_dispatcher()
     
     return {"detail": "Task assigned successfully"}
 
 @router.delete("/users_tasks", summary="Отменить назначение задачи пользователю")
-def remove_task_assignment(assignment: TaskAssignment, db: Session = Depends(get_db)):
+async def remove_task_assignment(assignment: TaskAssignment, db: AsyncSession = Depends(get_db)):
+    task = await db.get(Tasks, assignment.task_id, with_for_update=True)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task assignment not found")
+
     # Проверяем существование назначения
-    existing_assignment = db.query(users_tasks_table).filter(
+    existing_assignment = (await db.execute(select(users_tasks_table).where(
         users_tasks_table.c.user_id == assignment.user_id,
         users_tasks_table.c.task_id == assignment.task_id
-    ).first()
+    ))).first()
     
     if not existing_assignment:
         raise HTTPException(status_code=404, detail="Task assignment not found")
@@ -272,26 +477,31 @@ def remove_task_assignment(assignment: TaskAssignment, db: Session = Depends(get
         users_tasks_table.c.user_id == assignment.user_id,
         users_tasks_table.c.task_id == assignment.task_id
     )
-    db.execute(stmt)
-    db.commit()
+    await db.execute(stmt)
+    deltas = CounterDeltas()
+    deltas.remove(task.status, user_ids=[assignment.user_id])
+    await deltas.apply(db)
+    await add_tombstones(db, tombstones(assignment.task_id, "unassigned", user_ids=[assignment.user_id]))
+    await touch_task(db, assignment.task_id)
+    await db.commit()
     
     return {"detail": "Task assignment removed successfully"}
 
-@router.get("/users_tasks/{user_id}", response_model=List[Task], summary="Получить все задачи пользователя")
-def get_user_tasks(user_id: int, db: Session = Depends(get_db)):
-    user = db.get(Users, user_id)
+@router.get("/users_tasks/{user_id}", response_model=Page[Task], summary="Получить все задачи пользователя")
+async def get_user_tasks(user_id: int, page: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await db.get(Users, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    tasks = db.query(Tasks).join(Tasks.users).filter(Users.user_id == user_id).all()
-    result = []
-    for t in tasks:
-        assigned_files = json.loads(t.assigned_files) if t.assigned_files else []
-        result.append(Task(**{**t.__dict__, "assigned_files": assigned_files}))
-    return result
+    return await task_page_response(
+        db,
+        select_task_rows(users_tasks_table.c.user_id == user_id).join(users_tasks_table),
+        [Tasks.task_id],
+        page,
+    )
 
 @router.get("/tasks/check/{task_id}", summary="Проверить существование задачи")
-def check_task_exists(task_id: int, db: Session = Depends(get_db)):
-    task = db.query(Tasks).filter(Tasks.task_id == task_id).first()
+async def check_task_exists(task_id: int, db: AsyncSession = Depends(get_db)):
+    task = await db.get(Tasks, task_id)
     if not task:
         return {"exists": False, "detail": f"Task with ID {task_id} not found"}
     return {
@@ -301,20 +511,36 @@ def check_task_exists(task_id: int, db: Session = Depends(get_db)):
         "status": task.status.value if hasattr(task.status, 'value') else str(task.status)
     }
 
-@router.post("/upload-file", summary="Загрузить файл для задачи")
-def upload_file(file: UploadFile = File(...)):
-    file_location = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_location, "wb") as f:
-        f.write(file.file.read())
-    # Возвращаем путь, который будет сохраняться в assigned_files
-    return {"file_path": f"/uploads/{file.filename}"}
-
-@router.get("/uploads/{filename}", summary="Скачать файл задачи")
-def download_file(filename: str):
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    if not os.path.exists(file_path):
+# Тело разбирается вручную (потоком), поэтому форма описана для OpenAPI явно
+UPLOAD_FORM = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"file": {"type": "string", "format": "binary"}},
+            "required": ["file"],
+        }}},
+    }
+}
+
+@router.post("/upload-file", response_model=UploadedFile, summary="Загрузить файл для задачи", openapi_extra=UPLOAD_FORM)
+async def upload_file(request: Request):
+    # file_path передаётся в assigned_files при создании задачи
+    return await receive_upload(request)
+
+# Range, ETag и кэширование — в backend/downloads.py
+@router.api_route("/uploads/{sha256}/{filename}", methods=["GET", "HEAD"], summary="Скачать файл задачи по хэшу содержимого")
+def download_blob(sha256: str, filename: str, request: Request):
+    if not SHA256_RE.match(sha256) or not os.path.isfile(blob_path(sha256)):
+        raise HTTPException(status_code=404, detail="File not found")
+    return file_response(request, blob_path(sha256), filename, sha256)
+
+@router.api_route("/uploads/{filename}", methods=["GET", "HEAD"], summary="Скачать файл задачи")
+def download_file(filename: str, request: Request):
+    file_path = os.path.join(UPLOAD_DIR, os.path.basename(filename))
+    if not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(file_path, filename=filename)
+    return file_response(request, file_path, filename)
 
 '''
 {
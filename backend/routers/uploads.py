@@ -0,0 +1,44 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import get_db
+from ..schemas.upload import UploadedFile, UploadFinalize, UploadSession, UploadSessionCreate
+from ..resumable import create_session, finalize_session, get_session, session_state, write_chunk
+
+
+router = APIRouter()
+
+# Тело части — сырые байты, для OpenAPI описано явно
+CHUNK_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}},
+    }
+}
+
+
+@router.post("/uploads/sessions", response_model=UploadSession, summary="Начать возобновляемую загрузку файла")
+async def create_upload_session(upload: UploadSessionCreate, db: AsyncSession = Depends(get_db)):
+    session = await create_session(db, upload.name, upload.size, upload.sha256)
+    return await session_state(db, session)
+
+
+@router.get("/uploads/sessions/{session_id}", response_model=UploadSession, summary="Полученные части загрузки")
+async def get_upload_session(session_id: str, db: AsyncSession = Depends(get_db)):
+    return await session_state(db, await get_session(db, session_id))
+
+
+@router.put("/uploads/sessions/{session_id}", response_model=UploadSession, summary="Загрузить часть файла", openapi_extra=CHUNK_BODY)
+async def put_upload_chunk(
+    session_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="Смещение части в файле"),
+    db: AsyncSession = Depends(get_db),
+):
+    return await write_chunk(request, db, session_id, offset)
+
+
+@router.post("/uploads/sessions/{session_id}/finalize", response_model=UploadedFile, summary="Завершить загрузку и проверить хэш")
+async def finalize_upload_session(session_id: str, body: Optional[UploadFinalize] = None, db: AsyncSession = Depends(get_db)):
+    return await finalize_session(db, session_id, body.task_id if body else None)
@@ -1,7 +1,7 @@
-from typing import Annotated, List
-from fastapi import APIRouter, HTTPException, Query, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from typing import List
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from datetime import datetime, timedelta
 
 from ..models import Users, Tasks, KanbanBoards, users_tasks_table
@@ -9,127 +9,136 @@ from ..db import get_db
 from ..schemas.board import Board
 from ..schemas.task import Task
 from ..schemas.user import User, UserCreate, UserUpdate
+from ..schemas.pagination import Page
+from ..pagination import PageParams, paginate
+from ..fastpath import select_task_rows, task_page_response
+from ..search import search_by_name
+from ..counters import read_counts
+from ..sync import scope_version
+from ..etag import make_etag, not_modified
 
 router = APIRouter()
 
 # Создание пользователя в БД 
 @router.post("/users", response_model=User, summary="Создать нового пользователя")
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     db_user = Users(**user.model_dump())
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 # Получение задач по ID пользователя
-@router.get("/users/{user_id}/tasks", response_model=List[Task], summary="Получить задачи пользователя по ID")
-def get_tasks_for_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.get(Users, user_id)
-    if not user:
+@router.get("/users/{user_id}/tasks", response_model=Page[Task], summary="Получить задачи пользователя по ID")
+async def get_tasks_for_user(user_id: int, request: Request, response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    if await db.scalar(select(Users.user_id).where(Users.user_id == user_id)) is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return user.tasks
+    etag = make_etag("user_tasks", user_id, page.limit, page.cursor, await scope_version(db, "user", user_id))
+    if cached := not_modified(request, response, etag):
+        return cached
+    # Готовый Response: заголовки ETag переносим с подставленного response сами
+    return await task_page_response(
+        db,
+        select_task_rows(users_tasks_table.c.user_id == user_id).join(users_tasks_table),
+        [Tasks.task_id],
+        page,
+        headers=response.headers,
+    )
 
 # Получить всех пользователей
-@router.get("/users", response_model=List[User], summary="Получить всех пользователей")
-def get_users(db: Session = Depends(get_db)):
-    return db.query(Users).all()
+@router.get("/users", response_model=Page[User], summary="Получить всех пользователей")
+async def get_users(page: PageParams = Depends(), db: AsyncSession = Depends(get_db)):
+    users, next_cursor = await paginate(db, select(Users), [Users.user_id], page)
+    return Page(items=users, next_cursor=next_cursor)
+
+# Поиск пользователей по имени (объявлен до /users/{user_id}, иначе тот перехватывает путь)
+@router.get("/users/search", response_model=List[User], summary="Поиск пользователей по имени")
+async def search_users(query: str, limit: int = Query(20, ge=1, le=100), db: AsyncSession = Depends(get_db)):
+    return await search_by_name(db, Users, query, limit)
 
 # Получить всех пользователей
 @router.get("/users/{user_id}", response_model=User, summary="Получить пользователя по ID")
-def get_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.get(Users, user_id)
+async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
+    user = await db.get(Users, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 # Получение досок пользователя
 @router.get("/users/{user_id}/boards", response_model=List[Board], summary="Получить доски пользователя по ID")
-def get_user_boards(user_id: int, db: Session = Depends(get_db)):
-    return db.query(KanbanBoards).filter(KanbanBoards.user_id == user_id).all()
+async def get_user_boards(user_id: int, db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(KanbanBoards).where(KanbanBoards.user_id == user_id))).all()
 
 # Обновление пользователя
 @router.put("/users/{user_id}", response_model=User, summary="Обновить данные пользователя")
-def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db)):
-    user = db.get(Users, user_id)
+async def update_user(user_id: int, user_update: UserUpdate, db: AsyncSession = Depends(get_db)):
+    user = await db.get(Users, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     for key, value in user_update.model_dump(exclude_unset=True).items():
         setattr(user, key, value)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 # Удаление пользователя
 @router.delete("/users/{user_id}", summary="Удалить пользователя по ID")
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.get(Users, user_id)
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)):
+    user = await db.get(Users, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
     return {"detail": "User deleted successfully"}
 
 # Получение статистики пользователя
 @router.get("/users/{user_id}/stats", summary="Получить статистику пользователя")
-def get_user_stats(user_id: int, db: Session = Depends(get_db)):
-    user = db.get(Users, user_id)
+async def get_user_stats(user_id: int, db: AsyncSession = Depends(get_db)):
+    user = await db.get(Users, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    total_tasks = len(user.tasks)
-    tasks_by_status = db.query(
-        Tasks.status,
-        func.count(Tasks.task_id)
-    ).join(users_tasks_table).filter(
-        users_tasks_table.c.user_id == user_id
-    ).group_by(Tasks.status).all()
-    
-    total_boards = db.query(KanbanBoards).filter(
+    tasks_by_status = await read_counts(db, "user", user_id)
+    total_boards = await db.scalar(select(func.count(KanbanBoards.board_id)).where(
         KanbanBoards.user_id == user_id
-    ).count()
+    ))
     
     return {
         "user_name": user.name,
-        "total_tasks": total_tasks,
-        "tasks_by_status": dict(tasks_by_status),
+        "total_tasks": sum(tasks_by_status.values()),
+        "tasks_by_status": tasks_by_status,
         "total_boards": total_boards
     }
 
-# Поиск пользователей по имени
-@router.get("/users/search", response_model=List[User], summary="Поиск пользователей по имени")
-def search_users(query: str, db: Session = Depends(get_db)):
-    return db.query(Users).filter(Users.name.ilike(f"%{query}%")).all()
-
 # Получение пользователей по роли
 @router.get("/users/role/{role}", response_model=List[User], summary="Получить пользователей по роли")
-def get_users_by_role(role: str, db: Session = Depends(get_db)):
-    return db.query(Users).filter(Users.role == role).all()
+async def get_users_by_role(role: str, db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(Users).where(Users.role == role))).all()
 
 # Получение активных пользователей
 @router.get("/users/active", response_model=List[User], summary="Получить активных пользователей за последние дни")
-def get_active_users(days: int = 30, db: Session = Depends(get_db)):
+async def get_active_users(days: int = 30, db: AsyncSession = Depends(get_db)):
     cutoff_date = datetime.now() - timedelta(days=days)
-    return db.query(Users).join(
+    return (await db.scalars(select(Users).join(
         users_tasks_table
     ).join(
         Tasks
-    ).filter(
+    ).where(
         Tasks.updated_at >= cutoff_date
-    ).distinct().all()
+    ).distinct())).all()
 
 # Получение пользователей с наибольшим количеством задач
 @router.get("/users/most-tasks", response_model=List[User], summary="Получить пользователей с наибольшим количеством задач")
-def get_users_with_most_tasks(limit: int = 5, db: Session = Depends(get_db)):
-    return db.query(
-        Users,
-        func.count(users_tasks_table.c.task_id).label('task_count')
+async def get_users_with_most_tasks(limit: int = 5, db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(
+        Users
     ).join(
         users_tasks_table
     ).group_by(
         Users.user_id
     ).order_by(
         func.count(users_tasks_table.c.task_id).desc()
-    ).limit(limit).all()
+    ).limit(limit))).all()
 
 '''
 {
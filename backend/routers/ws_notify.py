@@ -1,25 +1,271 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import List
+from collections import defaultdict
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import json
 import logging
 
+from ..config import settings
+from ..pubsub import create_broker
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-active_connections: List[WebSocket] = []
+
+
+def user_topic(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def board_topic(board_id: int) -> str:
+    return f"board:{board_id}"
+
+def group_topic(group_id: int) -> str:
+    return f"group:{group_id}"
+
+def task_topics(user_ids: Iterable[int] = (), board_id: Optional[int] = None, group_id: Optional[int] = None) -> Set[str]:
+    """Темы, на которые публикуется событие задачи"""
+    topics = {user_topic(user_id) for user_id in user_ids}
+    if board_id is not None:
+        topics.add(board_topic(board_id))
+    if group_id is not None:
+        topics.add(group_topic(group_id))
+    return topics
+
+
+# Сообщение в очереди соединения: событие и его заранее закодированный JSON
+Message = Tuple[dict, str]
+
+
+def coalesce(messages: List[Message]) -> List[Message]:
+    """
+    Склеивает пачку событий, не теряя состояния задачи:
+    update_status склеивается только с предыдущим update_status (сохраняется
+    самый ранний old_status), а после new_task — вливается в него (new_task
+    остаётся, в нём новый status). delete_task заменяет предыдущие update_status,
+    но new_task не выбрасывает. Напоминания о дедлайне склеиваются только
+    с такими же. Остальные события не склеиваются. Порядок — по последнему появлению.
+    """
+    merged: List[Optional[Message]] = []
+    last: Dict[int, Tuple[str, int]] = {}  # задача -> (событие, индекс в merged), к которому клеится update_status
+    updates: Dict[int, List[int]] = {}  # задача -> индексы её update_status в merged
+    reminders: Dict[Tuple[str, int], int] = {}  # (вид напоминания, задача) -> индекс в merged
+
+    def replace(index: int, event: dict) -> int:
+        merged[index] = None
+        merged.append((event, json.dumps(event)))
+        return len(merged) - 1
+
+    for event, text in messages:
+        task_id = event.get("task_id")
+        kind = event.get("event", "")
+        if task_id is None:
+            merged.append((event, text))
+            continue
+        if kind.startswith("deadline_"):
+            index = reminders.get((kind, task_id))
+            if index is not None:
+                merged[index] = None
+            merged.append((event, text))
+            reminders[(kind, task_id)] = len(merged) - 1
+            continue
+
+        previous_kind, index = last.get(task_id, (None, -1))
+        if kind == "update_status" and previous_kind == "update_status":
+            previous = merged[index][0]
+            if "old_status" in previous:
+                event = {**event, "old_status": previous["old_status"]}
+            updates[task_id].remove(index)
+            index = replace(index, event)
+            updates[task_id].append(index)
+            last[task_id] = (kind, index)
+            continue
+        if kind == "update_status" and previous_kind == "new_task":
+            created = merged[index][0]
+            created = {**created, "status": event.get("status"), "timestamp": event.get("timestamp")}
+            merged[index] = (created, json.dumps(created))
+            continue
+        if kind == "delete_task":
+            for index in updates.pop(task_id, []):
+                merged[index] = None
+        merged.append((event, text))
+        if kind == "update_status":
+            updates.setdefault(task_id, []).append(len(merged) - 1)
+        last[task_id] = (kind, len(merged) - 1)
+    return [message for message in merged if message is not None]
+
+
+class Connection:
+    """
+    Соединение с собственной ограниченной очередью исходящих сообщений.
+    Очередь разбирает отдельная задача-писатель, поэтому медленный клиент
+    не задерживает ни остальных, ни HTTP-запрос, породивший событие.
+    События, накопившиеся за окно склейки, уходят одним кадром-массивом.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        queue_size: int = settings.ws_send_queue_size,
+        send_timeout: float = settings.ws_send_timeout,
+        policy: str = settings.ws_slow_consumer_policy,
+        coalesce_window: float = settings.ws_coalesce_window_ms / 1000,
+    ):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.send_timeout = send_timeout
+        self.policy = policy
+        self.coalesce_window = coalesce_window
+        self.dropped = 0
+        self.closed = False
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, message: Message) -> bool:
+        """Ставит сообщение в очередь без ожидания; False — соединение отключено"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            if self.policy == "disconnect":
+                logger.warning("Slow WebSocket consumer: send queue is full, disconnecting")
+                self.close()
+                return False
+            # drop_oldest: свежие события важнее устаревших
+            self.queue.get_nowait()
+            self.queue.put_nowait(message)
+            self.dropped += 1
+        return True
+
+    async def _write_loop(self) -> None:
+        try:
+            while True:
+                messages = [await self.queue.get()]
+                if self.coalesce_window > 0:
+                    # Даём накопиться пачке (bulk-операции, серия перетаскиваний)
+                    await asyncio.sleep(self.coalesce_window)
+                while not self.queue.empty():
+                    messages.append(self.queue.get_nowait())
+                await asyncio.wait_for(self.websocket.send_text(self._frame(messages)), self.send_timeout)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error sending notification: {str(e)}")
+            self.close()
+
+    @staticmethod
+    def _frame(messages: List[Message]) -> str:
+        """Одно событие — объект, как раньше; несколько — массив из уже закодированных частей"""
+        messages = coalesce(messages) if len(messages) > 1 else messages
+        if len(messages) == 1:
+            return messages[0][1]
+        return "[" + ",".join(text for _, text in messages) + "]"
+
+    def stop(self) -> None:
+        """Убирает соединение из реестра и останавливает писателя"""
+        if self.closed:
+            return
+        self.closed = True
+        registry.remove(self)
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
+    def close(self) -> None:
+        """Отключает медленного или сломанного клиента со стороны сервера"""
+        if self.closed:
+            return
+        self.stop()
+        asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self) -> None:
+        try:
+            # 1013 Try Again Later: клиент может переподключиться и догнать состояние
+            await asyncio.wait_for(self.websocket.close(code=1013), self.send_timeout)
+        except Exception:
+            pass
+
+
+class ConnectionRegistry:
+    """
+    Индекс подписок: тема ("user:1", "board:2", "group:3") -> множество соединений.
+    Событие уходит только соединениям, подписанным на его темы; добавление и
+    удаление соединения — O(число его тем), а не O(всех соединений).
+    """
+
+    def __init__(self):
+        self._by_topic: Dict[str, Set[Connection]] = defaultdict(set)
+        self._topics_of: Dict[Connection, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._topics_of)
+
+    def add(self, connection: Connection, topics: Iterable[str] = ()) -> None:
+        self._topics_of.setdefault(connection, set())
+        for topic in topics:
+            self.subscribe(connection, topic)
+
+    def subscribe(self, connection: Connection, topic: str) -> None:
+        if connection not in self._topics_of:
+            return
+        self._topics_of[connection].add(topic)
+        self._by_topic[topic].add(connection)
+
+    def unsubscribe(self, connection: Connection, topic: str) -> None:
+        self._topics_of.get(connection, set()).discard(topic)
+        connections = self._by_topic.get(topic)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self._by_topic[topic]
+
+    def remove(self, connection: Connection) -> None:
+        for topic in self._topics_of.pop(connection, ()):
+            connections = self._by_topic.get(topic)
+            if connections is not None:
+                connections.discard(connection)
+                if not connections:
+                    del self._by_topic[topic]
+
+    def connections_for(self, topics: Iterable[str]) -> Set[Connection]:
+        result: Set[Connection] = set()
+        for topic in topics:
+            result |= self._by_topic.get(topic, set())
+        return result
+
+
+registry = ConnectionRegistry()
+broker = create_broker()
 
 @router.websocket("/ws/tasks")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    user_id: Optional[int] = Query(None),
+    board_id: List[int] = Query([]),
+    group_id: List[int] = Query([]),
+):
+    """
+    Подписки задаются query-параметрами (?user_id=1&board_id=2&group_id=3)
+    и сообщениями клиента {"action": "subscribe"|"unsubscribe", "topic": "board:2"}.
+    """
+    connection = Connection(websocket)
     try:
         await websocket.accept()
-        active_connections.append(websocket)
-        logger.info(f"New WebSocket connection established. Total connections: {len(active_connections)}")
+        topics = {board_topic(b) for b in board_id} | {group_topic(g) for g in group_id}
+        if user_id is not None:
+            topics.add(user_topic(user_id))
+        registry.add(connection, topics)
+        connection.start()
+        logger.info(f"New WebSocket connection established. Total connections: {len(registry)}")
         
         while True:
             try:
                 data = await websocket.receive_text()
                 logger.debug(f"Received message: {data}")
+                handle_client_message(connection, data)
             except WebSocketDisconnect:
                 logger.info("WebSocket disconnected")
                 break
@@ -29,28 +275,47 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"Error accepting WebSocket connection: {str(e)}")
     finally:
-        if websocket in active_connections:
-            active_connections.remove(websocket)
-            logger.info(f"WebSocket connection removed. Total connections: {len(active_connections)}")
+        connection.stop()
+        logger.info(f"WebSocket connection removed. Total connections: {len(registry)}")
+
+def handle_client_message(connection: Connection, data: str) -> None:
+    try:
+        message = json.loads(data)
+    except ValueError:
+        return  # не JSON (например, ping) — игнорируем
+    if not isinstance(message, dict) or not isinstance(message.get("topic"), str):
+        return
+    if message.get("action") == "subscribe":
+        registry.subscribe(connection, message["topic"])
+    elif message.get("action") == "unsubscribe":
+        registry.unsubscribe(connection, message["topic"])
 
 def get_ws_connections():
-    return active_connections
+    return registry
 
 def get_ws_router():
     return router
 
+def deliver_local(event: dict, topics: Iterable[str]) -> None:
+    """
+    Ставит событие в очереди всех соединений этого процесса, подписанных хотя бы
+    на одну из тем (каждому — один раз). Не ждёт отправки.
+    """
+    message = (event, json.dumps(event))  # кодируем один раз на всех получателей
+    for connection in registry.connections_for(topics):
+        connection.enqueue(message)
+    logger.debug(f"Notification queued: {event}")
+
+async def publish(event: dict, topics: Iterable[str]):
+    """Публикует событие через шину: его получат подписчики во всех воркерах"""
+    await broker.publish(event, topics)
+
+async def start_notifications():
+    await broker.start(deliver_local)
+
+async def stop_notifications():
+    await broker.stop()
+
 async def notify_students_about_task(task_data: dict):
-    disconnected = []
-    for connection in active_connections:
-        try:
-            await connection.send_json(task_data)
-            logger.debug(f"Notification sent to client: {task_data}")
-        except Exception as e:
-            logger.error(f"Error sending notification: {str(e)}")
-            disconnected.append(connection)
-    
-    # Удаляем отключенные соединения
-    for conn in disconnected:
-        if conn in active_connections:
-            active_connections.remove(conn)
-            logger.info(f"Removed disconnected client. Total connections: {len(active_connections)}") 
\ No newline at end of file
+    """Событие для одного пользователя task_data["user_id"]"""
+    await publish(task_data, [user_topic(task_data["user_id"])])
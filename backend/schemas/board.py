@@ -2,28 +2,28 @@ from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel
 
+from .task import Task
+
 class BoardBase(BaseModel):
-    title: str
-    description: Optional[str] = None
+    name: str
+    user_id: Optional[int] = None
 
 class BoardCreate(BoardBase):
     pass
 
 class BoardUpdate(BaseModel):
-    title: Optional[str] = None
-    description: Optional[str] = None
+    name: Optional[str] = None
 
 class Board(BoardBase):
     board_id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
-    user_id: int
 
     class Config:
         from_attributes = True
 
 class BoardWithTasks(Board):
-    tasks: List[dict]
+    tasks: List[Task]
 
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -0,0 +1,12 @@
+from typing import List, Literal
+from pydantic import BaseModel
+
+class SearchResult(BaseModel):
+    type: Literal["task", "user", "group", "board"]
+    id: int
+    title: str
+    rank: float  # релевантность внутри своего типа, больше — лучше
+
+class SearchResults(BaseModel):
+    query: str
+    items: List[SearchResult]
@@ -0,0 +1,14 @@
+from typing import List, Literal
+from pydantic import BaseModel
+
+from .task import Task
+
+class Tombstone(BaseModel):
+    task_id: int
+    reason: Literal["deleted", "moved", "unassigned"]
+
+class SyncResponse(BaseModel):
+    changed: List[Task]  # новые и изменённые задачи области
+    removed: List[Tombstone]  # задачи, ушедшие из области
+    next_cursor: str  # передаётся как since в следующем запросе
+    has_more: bool  # True — изменений больше, чем limit, стоит запросить ещё раз
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import List, Optional, Dict
-from pydantic import BaseModel, Field, field_serializer, field_validator
+from pydantic import BaseModel, Field, field_serializer, field_validator, model_validator
 from enum import Enum
 
 class TaskStatus(str, Enum):
@@ -13,11 +13,20 @@ class TaskPriority(str, Enum):
     MEDIUM = "medium"
     HIGH = "high"
 
+class TaskFile(BaseModel):
+    path: str  # /uploads/<имя> или внешний URL
+    name: Optional[str] = None
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
 class TaskBase(BaseModel):
     title: str
     description: Optional[str] = None
     deadline: Optional[datetime] = None
-    assigned_files: Optional[List[str]] = None
+    assigned_files: Optional[List[str]] = None  # пути вложений; метаданные — в files
     group_id: Optional[int] = None
     board_id: Optional[int] = None
     assigner_id: Optional[int] = 1  # ID пользователя, который назначил задачу (по умолчанию 1)
@@ -25,12 +34,7 @@ class TaskBase(BaseModel):
     @field_validator('assigned_files', mode='before')
     @classmethod
     def parse_assigned_files(cls, v):
-        if v is None:
-            return []
-        if isinstance(v, str):
-            import json
-            return json.loads(v)
-        return v
+        return [] if v is None else v
 
 class TaskCreate(TaskBase):
     user_id: Optional[int] = None  # ID исполнителя задачи (студента)
@@ -56,6 +60,8 @@ class Task(TaskBase):
     status: TaskStatus
     priority: Optional[TaskPriority] = None
     user_ids: List[int] = []  # ID исполнителей задачи
+    assigner_ids: List[int] = []  # ID назначивших задачу
+    files: List[TaskFile] = []  # вложения с размером и хэшем, в порядке assigned_files
 
     class Config:
         from_attributes = True
@@ -76,6 +82,7 @@ class TaskResponse(TaskBase):
     board_id: Optional[int] = None
     user_ids: List[int]  # ID исполнителей
     assigner_id: int  # ID назначившего
+    files: List[TaskFile] = []
     status: TaskStatus
     priority: Optional[TaskPriority] = None
 
@@ -95,6 +102,25 @@ class TaskStats(BaseModel):
     tasks_by_status: Dict[str, int]
     tasks_by_priority: Dict[str, int]
 
+class BulkTaskCreate(BaseModel):
+    tasks: List[TaskCreate] = []  # произвольный список задач
+    template: Optional[TaskCreate] = None  # либо одна задача-шаблон...
+    user_ids: List[int] = []  # ...размноженная на каждого исполнителя
+
+    @model_validator(mode='after')
+    def check_template(self):
+        if self.user_ids and self.template is None:
+            raise ValueError("user_ids requires template")
+        if self.template is not None and not self.user_ids:
+            raise ValueError("template requires user_ids")
+        return self
+
+    def expand(self) -> List[TaskCreate]:
+        tasks = list(self.tasks)
+        if self.template is not None:
+            tasks += [self.template.model_copy(update={"user_id": user_id}) for user_id in self.user_ids]
+        return tasks
+
 class BulkTaskUpdate(BaseModel):
     task_ids: List[int]
     status: TaskStatus
@@ -0,0 +1,24 @@
+from typing import List, Optional, Tuple
+from pydantic import BaseModel, Field
+
+class UploadedFile(BaseModel):
+    file_path: str  # передаётся в assigned_files при создании задачи
+    name: str
+    size: int
+    sha256: str
+    deduplicated: bool  # такой файл уже был в хранилище
+
+class UploadSessionCreate(BaseModel):
+    name: str = Field(min_length=1, max_length=255)
+    size: int = Field(ge=0, description="Размер файла в байтах")
+    sha256: Optional[str] = Field(None, pattern="^[0-9a-f]{64}$", description="Ожидаемый хэш, проверяется при завершении")
+
+class UploadSession(BaseModel):
+    session_id: str
+    name: str
+    size: int
+    received: List[Tuple[int, int]]  # полученные диапазоны [start, end)
+    complete: bool
+
+class UploadFinalize(BaseModel):
+    task_id: Optional[int] = Field(None, gt=0, description="Сразу прикрепить файл к задаче")
@@ -0,0 +1,119 @@
+"""
+Поиск по задачам, пользователям, группам и доскам с опорой на индексы.
+
+В Postgres задачи ищутся полнотекстово (GIN по выражению tsvector из
+models.task_search_vector), имена — через pg_trgm (GIN-индексы
+gin_trgm_ops). В остальных СУБД — ILIKE.
+"""
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import Float, case, func, literal, or_, select, text, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Groups, KanbanBoards, Tasks, Users, task_search_vector
+
+SEARCH_TYPES = ("task", "user", "group", "board")
+
+_WORD = re.compile(r"\w+")
+
+
+def prefix_tsquery(query: str) -> Optional[str]:
+    """'отчёт лаб' -> 'отчёт:* & лаб:*' — каждое слово ищется как префикс"""
+    words = _WORD.findall(query.lower())
+    return " & ".join(f"{word}:*" for word in words) if words else None
+
+
+def like_pattern(query: str) -> str:
+    """Подстрока для ILIKE с экранированными спецсимволами"""
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def match_tasks(db: AsyncSession, query: str) -> Optional[Tuple]:
+    """(условие, ранг) для задач по названию и описанию; None — в запросе нет слов"""
+    if db.bind.dialect.name == "postgresql":
+        tsquery = prefix_tsquery(query)
+        if tsquery is None:
+            return None
+        tsquery = func.to_tsquery(text("'simple'::regconfig"), tsquery)
+        vector = task_search_vector()
+        # 32 — нормировка rank / (rank + 1), чтобы ранг лежал в [0, 1)
+        return vector.op("@@")(tsquery), func.ts_rank(vector, tsquery, 32)
+    pattern = like_pattern(query)
+    return (
+        or_(Tasks.title.ilike(pattern, escape="\\"), Tasks.description.ilike(pattern, escape="\\")),
+        case((Tasks.title.ilike(pattern, escape="\\"), 1.0), else_=0.5),
+    )
+
+
+def match_name(db: AsyncSession, column, query: str) -> Tuple:
+    """(условие, ранг) для поиска по имени/названию"""
+    pattern = like_pattern(query)
+    if db.bind.dialect.name == "postgresql":
+        # %> — похожесть на любое слово имени, ILIKE — точная подстрока;
+        # оба оператора обслуживаются триграммным GIN-индексом
+        return (
+            or_(column.op("%>")(query), column.ilike(pattern, escape="\\")),
+            func.word_similarity(query, column),
+        )
+    return column.ilike(pattern, escape="\\"), literal(1.0, Float)
+
+
+async def search_tasks(db: AsyncSession, query: str, limit: int) -> Sequence[Tasks]:
+    match = match_tasks(db, query)
+    if match is None:
+        return []
+    condition, rank = match
+    return (await db.scalars(
+        select(Tasks).where(condition).order_by(rank.desc(), Tasks.task_id).limit(limit)
+    )).all()
+
+
+async def search_by_name(db: AsyncSession, model, query: str, limit: int) -> Sequence:
+    condition, rank = match_name(db, model.name, query)
+    key = model.__mapper__.primary_key[0]
+    return (await db.scalars(
+        select(model).where(condition).order_by(rank.desc(), key).limit(limit)
+    )).all()
+
+
+async def search_all(db: AsyncSession, query: str, types: Sequence[str], limit: int) -> List[dict]:
+    """
+    Смешанная выдача одним запросом: по ветке UNION ALL на тип, в каждой
+    не больше limit лучших совпадений; общий список упорядочен по рангу.
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    branches = []
+    if "task" in types:
+        match = match_tasks(db, query)
+        if match is not None:
+            condition, rank = match
+            branches.append(
+                select(literal("task").label("type"), Tasks.task_id.label("id"), Tasks.title.label("title"), rank.label("rank"))
+                .where(condition).order_by(rank.desc(), Tasks.task_id).limit(limit)
+            )
+    for type_, model, key in (
+        ("user", Users, Users.user_id),
+        ("group", Groups, Groups.group_id),
+        ("board", KanbanBoards, KanbanBoards.board_id),
+    ):
+        if type_ in types:
+            condition, rank = match_name(db, model.name, query)
+            branches.append(
+                select(literal(type_).label("type"), key.label("id"), model.name.label("title"), rank.label("rank"))
+                .where(condition).order_by(rank.desc(), key).limit(limit)
+            )
+    if not branches:
+        return []
+
+    # Каждая ветка — подзапрос: ORDER BY/LIMIT внутри UNION поддерживают не все СУБД
+    results = union_all(*(select(*branch.subquery().c) for branch in branches)).subquery()
+    rows = await db.execute(select(results).order_by(results.c.rank.desc(), results.c.type, results.c.id))
+    return [
+        {"type": type_, "id": id_, "title": title, "rank": float(rank)}
+        for type_, id_, title, rank in rows
+    ]
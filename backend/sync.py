@@ -0,0 +1,189 @@
+"""
+Дельта-синхронизация: задачи доски, группы или исполнителя, изменённые после курсора.
+
+Каждая строка задачи и каждое надгробие несут позицию изменения (change_xid,
+change_seq), см. models.next_change_seq / current_change_xid. Значения
+последовательности берутся до commit, поэтому транзакция, закоммиченная
+поздно, может нести change_seq меньше, чем у уже видимых строк. Поэтому
+в Postgres чтение ограничено xmin снимка: все транзакции ниже него
+завершены, и позади выданного курсора потом ничего не появится. Строки
+ещё не завершённых транзакций заберёт следующая синхронизация.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, insert, null, select, text, tuple_, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .db import SessionLocal
+from .models import TaskTombstones, Tasks, users_tasks_table
+from .pagination import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+SCOPE_TYPES = ("board", "group", "user")
+
+# Ключи курсора: позиция последнего отданного изменения и время выдачи курсора
+CURSOR_KEYS = (TaskTombstones.change_xid, TaskTombstones.change_seq, TaskTombstones.task_id, TaskTombstones.created_at)
+
+
+def parse_scope(scope: str) -> Tuple[str, int]:
+    """'board:12' -> ('board', 12)"""
+    scope_type, _, scope_id = scope.partition(":")
+    if scope_type not in SCOPE_TYPES or not scope_id.isdigit():
+        raise HTTPException(status_code=400, detail="scope must be board:<id>, group:<id> or user:<id>")
+    return scope_type, int(scope_id)
+
+
+def tombstones(task_id: int, reason: str, board_id: Optional[int] = None, group_id: Optional[int] = None,
+               user_ids: Iterable[int] = ()) -> List[dict]:
+    rows = [
+        {"task_id": task_id, "scope_type": scope_type, "scope_id": scope_id, "reason": reason}
+        for scope_type, scope_id in (("board", board_id), ("group", group_id))
+        if scope_id is not None
+    ]
+    rows += [
+        {"task_id": task_id, "scope_type": "user", "scope_id": user_id, "reason": reason}
+        for user_id in user_ids
+    ]
+    return rows
+
+
+async def add_tombstones(db: AsyncSession, rows: List[dict]) -> None:
+    if rows:
+        await db.execute(insert(TaskTombstones), rows)
+
+
+async def touch_task(db: AsyncSession, task_id: int) -> None:
+    """Сдвигает позицию изменения задачи (например, при смене исполнителей)"""
+    await db.execute(
+        update(Tasks)
+        .where(Tasks.task_id == task_id)
+        .values(updated_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def visible_horizon(db: AsyncSession) -> Optional[int]:
+    """Транзакции с номером меньше горизонта завершены; None — ограничения нет"""
+    if db.bind.dialect.name != "postgresql":
+        return None
+    return await db.scalar(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint"))
+
+
+def scope_condition(scope_type: str, scope_id: int):
+    if scope_type == "board":
+        return Tasks.board_id == scope_id
+    if scope_type == "group":
+        return Tasks.group_id == scope_id
+    return Tasks.task_id.in_(select(users_tasks_table.c.task_id).where(users_tasks_table.c.user_id == scope_id))
+
+
+async def scope_version(db: AsyncSession, scope_type: str, scope_id: int) -> tuple:
+    """
+    Версия области для ETag: число задач и суммы change_seq задач и tombstone.
+    Любая запись берёт из последовательности номер больше прежнего, поэтому
+    сумма растёт при каждом изменении, даже если транзакции фиксируются
+    не в порядке номеров (с max так не получилось бы). Считается по
+    покрывающим индексам, без чтения самих задач.
+    """
+    removed = (
+        select(func.coalesce(func.sum(TaskTombstones.change_seq), 0))
+        .where(TaskTombstones.scope_type == scope_type, TaskTombstones.scope_id == scope_id)
+        .scalar_subquery()
+    )
+    row = (await db.execute(
+        select(func.count(), func.coalesce(func.sum(Tasks.change_seq), 0), removed)
+        .select_from(Tasks)
+        .where(scope_condition(scope_type, scope_id))
+    )).one()
+    return tuple(row)
+
+
+async def changes_since(db: AsyncSession, scope_type: str, scope_id: int, cursor: Optional[str], limit: int):
+    """
+    Изменения области после курсора: ([(task_id, reason)], next_cursor, has_more).
+    reason None — задача добавлена или изменена, иначе это tombstone.
+    """
+    now = datetime.now()
+    position = None
+    if cursor:
+        *position, issued_at = decode_cursor(cursor, CURSOR_KEYS)
+        if issued_at < now - timedelta(days=settings.sync_tombstone_retention_days):
+            raise HTTPException(status_code=410, detail="Cursor expired, full reload required")
+    horizon = await visible_horizon(db)
+
+    def window(xid, seq, task_id):
+        conditions = []
+        if position is not None:
+            conditions.append(tuple_(xid, seq, task_id) > tuple_(*position))
+        if horizon is not None:
+            conditions.append(xid < horizon)
+        return conditions
+
+    # В каждой ветке свой ORDER BY/LIMIT по индексу области, затем общий порядок
+    changed = (
+        select(Tasks.change_xid.label("xid"), Tasks.change_seq.label("seq"), Tasks.task_id, null().label("reason"))
+        .where(scope_condition(scope_type, scope_id), *window(Tasks.change_xid, Tasks.change_seq, Tasks.task_id))
+        .order_by(Tasks.change_xid, Tasks.change_seq, Tasks.task_id)
+        .limit(limit + 1)
+        .subquery()
+    )
+    removed = (
+        select(TaskTombstones.change_xid, TaskTombstones.change_seq, TaskTombstones.task_id, TaskTombstones.reason)
+        .where(
+            TaskTombstones.scope_type == scope_type,
+            TaskTombstones.scope_id == scope_id,
+            *window(TaskTombstones.change_xid, TaskTombstones.change_seq, TaskTombstones.task_id),
+        )
+        .order_by(TaskTombstones.change_xid, TaskTombstones.change_seq, TaskTombstones.task_id)
+        .limit(limit + 1)
+        .subquery()
+    )
+    merged = union_all(select(*changed.c), select(*removed.c)).subquery()
+    rows = (await db.execute(
+        select(merged).order_by(merged.c.xid, merged.c.seq, merged.c.task_id).limit(limit + 1)
+    )).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        last = rows[-1]
+        next_position = [last.xid, last.seq, last.task_id]
+    else:
+        next_position = position or [-1, -1, -1]
+    if not has_more and horizon is not None:
+        # Всё, что ниже горизонта, отдано — следующий запрос начнёт с него
+        next_position = max(next_position, [horizon, -1, -1])
+
+    # Внутри страницы от задачи остаётся последнее событие
+    latest = {}
+    for row in rows:
+        latest[row.task_id] = row.reason
+    return list(latest.items()), encode_cursor([*next_position, now]), has_more
+
+
+async def prune_tombstones(db: AsyncSession) -> int:
+    cutoff = datetime.now() - timedelta(days=settings.sync_tombstone_retention_days)
+    result = await db.execute(delete(TaskTombstones).where(TaskTombstones.created_at < cutoff))
+    await db.commit()
+    return result.rowcount
+
+
+async def prune_tombstones_periodically() -> None:
+    """Фоновая чистка tombstone старше срока хранения курсора"""
+    while True:
+        try:
+            async with SessionLocal() as db:
+                pruned = await prune_tombstones(db)
+            if pruned:
+                logger.info(f"Pruned {pruned} sync tombstones")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Tombstone pruning failed: {str(e)}")
+        await asyncio.sleep(settings.sync_prune_interval)
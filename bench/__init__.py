@@ -0,0 +1 @@
+"""Бенчмарки бэкенда; каждый модуль запускается через python -m bench.<имя>."""
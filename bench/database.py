@@ -0,0 +1,26 @@
+"""Подготовка базы, общая для бенчмарков."""
+import os
+import tempfile
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def use_database(database_url: Optional[str]) -> str:
+    """
+    Выставляет DATABASE_URL (по умолчанию — новый временный файл SQLite).
+    Вызывать до импорта backend.db, где создаётся engine.
+    """
+    os.environ["DATABASE_URL"] = database_url or "sqlite+aiosqlite:///" + os.path.join(
+        tempfile.mkdtemp(prefix="kanban-bench-"), "bench.db"
+    )
+    return os.environ["DATABASE_URL"]
+
+
+def migrate() -> None:
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "backend", "migrations"))
+    command.upgrade(config, "head")
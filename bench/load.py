@@ -0,0 +1,367 @@
+"""
+Нагрузочный бенчмарк горячих эндпоинтов.
+
+Заполняет базу до заданного масштаба, прогоняет каждый сценарий
+фиксированным числом параллельных клиентов и печатает по каждому JSON:
+задержки p50/p95/p99, пропускную способность, ошибки и число SQL-запросов
+на запрос. Ключи стабильны, так что два прогона (две версии бэкенда)
+можно сравнивать напрямую.
+
+Заполнение: пользователи, группы, доски, задачи, исполнители и назначившие
+генерируются с фиксированным зерном. Доска, группа и студент задачи
+выбираются по закону Ципфа (--skew): есть горячие доски и перегруженные
+студенты, как в жизни. Строки вставляются через COPY в Postgres и
+executemany в остальных СУБД, затем пересчитываются счётчики. База,
+в которой уже есть задачи, используется как есть.
+
+Запросы идут в приложение внутри процесса через ASGI, с запущенным
+lifespan (включая диспетчер outbox и прочие фоновые задачи). Запросы к БД
+считаются событием before_cursor_execute движка, только внутри HTTP-запросов
+(запросы фоновых задач в счёт не идут). С --url запросы идут
+в запущенный сервер; число запросов к БД тогда неизвестно (null), а база
+только заполняется — через --database-url.
+
+    python -m bench.load [--database-url URL] [--tasks 20000] [--concurrency 16]
+                         [--requests 500] [--scenario tasks_list ...] [--output run.json]
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .database import ROOT, migrate, use_database
+
+# Строк в одном executemany (COPY грузит таблицу целиком)
+SEED_BATCH = 5000
+WORDS = (
+    "отчёт", "лабораторная", "курсовая", "презентация", "проект", "эссе", "тест", "домашнее",
+    "задание", "семинар", "алгебра", "физика", "история", "программирование", "базы", "данных",
+    "report", "lab", "essay", "project", "review", "draft", "quiz", "homework",
+)
+STATUSES = ("todo", "in_progress", "done")
+PRIORITIES = ("low", "medium", "high")
+
+
+@dataclass
+class Scale:
+    users: int
+    groups: int
+    boards: int
+    tasks: int
+    assignees: float  # в среднем исполнителей на задачу
+    skew: float  # показатель распределения Ципфа
+    seed: int
+
+
+class Zipf:
+    """Выбор из 1..n с весом 1/k^s: небольшая доля id получает большую долю выборок"""
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self.ids = range(1, n + 1)
+        self.cum_weights = list(accumulate(1 / k ** s for k in self.ids))
+        self.rng = rng
+
+    def __call__(self) -> int:
+        return self.rng.choices(self.ids, cum_weights=self.cum_weights)[0]
+
+    def sample(self, k: int) -> set:
+        chosen = set()
+        while len(chosen) < min(k, len(self.ids)):
+            chosen.add(self())
+        return chosen
+
+
+def generate(scale: Scale) -> Dict[str, List[dict]]:
+    """Строки таблиц; первые ~5% пользователей — преподаватели, остальные — студенты"""
+    rng = random.Random(scale.seed)
+    now = datetime.now().replace(microsecond=0)
+    teachers = max(1, scale.users // 20)
+    students = scale.users - teachers
+
+    rows: Dict[str, List[dict]] = {"users": [], "groups": [], "user_groups": [], "kanban_boards": [],
+                                   "tasks": [], "users_tasks": [], "task_assigners": []}
+    for user_id in range(1, scale.users + 1):
+        rows["users"].append({
+            "user_id": user_id, "telegram_id": 1_000_000 + user_id, "name": f"User {user_id}",
+            "role": "teacher" if user_id <= teachers else "student",
+            "email": f"user{user_id}@bench.local", "created_at": now - timedelta(days=rng.randint(0, 365)),
+        })
+    for group_id in range(1, scale.groups + 1):
+        rows["groups"].append({"group_id": group_id, "name": f"Group {group_id}",
+                               "description": None, "created_at": now})
+    group_of = Zipf(scale.groups, scale.skew, rng)
+    for user_id in range(teachers + 1, scale.users + 1):
+        rows["user_groups"].append({"user_id": user_id, "group_id": group_of()})
+    for board_id in range(1, scale.boards + 1):
+        rows["kanban_boards"].append({"board_id": board_id, "user_id": rng.randint(1, teachers),
+                                      "name": f"Board {board_id}", "created_at": now, "updated_at": now})
+
+    board_of = Zipf(scale.boards, scale.skew, rng)
+    student = Zipf(max(students, 1), scale.skew, rng)
+    for task_id in range(1, scale.tasks + 1):
+        created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+        words = rng.sample(WORDS, 4)
+        rows["tasks"].append({
+            "task_id": task_id, "title": " ".join(words[:2]).capitalize() + f" {task_id}",
+            "description": " ".join(words) + " " + " ".join(rng.choices(WORDS, k=12)),
+            "deadline": now + timedelta(hours=rng.randint(-24 * 14, 24 * 60)) if rng.random() < 0.9 else None,
+            "status": rng.choices(STATUSES, weights=(5, 2, 3))[0], "priority": rng.choice(PRIORITIES),
+            "group_id": group_of(), "board_id": board_of(), "created_at": created_at, "updated_at": created_at,
+            "change_xid": 0, "change_seq": task_id,
+        })
+        # Число исполнителей: 1 + геометрическое со средним assignees - 1
+        extra = 0
+        while rng.random() < 1 - 1 / max(scale.assignees, 1.0):
+            extra += 1
+        if students:
+            for offset in student.sample(1 + extra):
+                rows["users_tasks"].append({"user_id": teachers + offset, "task_id": task_id, "assigned_at": created_at})
+        rows["task_assigners"].append({"user_id": rng.randint(1, teachers), "task_id": task_id, "assigned_at": created_at})
+    return rows
+
+
+async def copy_rows(db, table, rows: List[dict]) -> None:
+    """COPY в Postgres (asyncpg copy_records_to_table), executemany в остальных СУБД"""
+    from sqlalchemy import insert
+
+    if not rows:
+        return
+    if db.bind.dialect.name != "postgresql":
+        for start in range(0, len(rows), SEED_BATCH):
+            await db.execute(insert(table), rows[start:start + SEED_BATCH])
+        return
+    columns = list(rows[0])
+    connection = await (await db.connection()).get_raw_connection()
+    await connection.driver_connection.copy_records_to_table(
+        table.name, columns=columns, records=[tuple(row[c] for c in columns) for row in rows],
+    )
+
+
+async def seed(scale: Scale) -> bool:
+    """Заполняет пустую базу; False — задачи уже есть, база используется как есть"""
+    from sqlalchemy import func, select, text
+
+    from backend.counters import rebuild_counters
+    from backend.db import SessionLocal
+    from backend.models import Base, Tasks
+
+    async with SessionLocal() as db:
+        if await db.scalar(select(func.count()).select_from(Tasks)):
+            return False
+        rows = generate(scale)
+        for name in ("users", "groups", "user_groups", "kanban_boards", "tasks", "users_tasks", "task_assigners"):
+            await copy_rows(db, Base.metadata.tables[name], rows[name])
+        if db.bind.dialect.name == "postgresql":
+            # Идентификаторы заданы явно — сдвигаем последовательности за них
+            for table, column in (("users", "user_id"), ("groups", "group_id"),
+                                  ("kanban_boards", "board_id"), ("tasks", "task_id")):
+                await db.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                    f"(SELECT max({column}) FROM {table}))"
+                ))
+            await db.execute(text("SELECT setval('task_change_seq', (SELECT max(change_seq) FROM tasks))"))
+        await rebuild_counters(db)
+        await db.commit()
+        if db.bind.dialect.name == "postgresql":
+            await db.execute(text("ANALYZE"))
+            await db.commit()
+    return True
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # rng -> (путь, тело запроса)
+    request: Callable[[random.Random], tuple]
+
+
+def scenarios(scale: Scale) -> List[Scenario]:
+    """Запросы к горячим эндпоинтам; id выбираются с тем же перекосом, что и данные"""
+    rng = random.Random(scale.seed + 1)
+    teachers = max(1, scale.users // 20)
+    board = Zipf(scale.boards, scale.skew, rng)
+    group = Zipf(scale.groups, scale.skew, rng)
+    student = Zipf(max(scale.users - teachers, 1), scale.skew, rng)
+    task = Zipf(scale.tasks, 0.5, rng)  # правок больше у небольшой доли задач
+
+    def patch_status(r: random.Random) -> tuple:
+        return f"/tasks/{task()}", {"status": r.choice(STATUSES)}
+
+    return [
+        Scenario("tasks_list", "GET", lambda r: ("/tasks?limit=100", None)),
+        Scenario("tasks_list_group", "GET", lambda r: (f"/tasks?group_id={group()}&limit=100", None)),
+        Scenario("board_with_tasks", "GET", lambda r: (f"/boards/{board()}/with-tasks", None)),
+        Scenario("user_tasks", "GET", lambda r: (f"/users_tasks/{teachers + student()}?limit=100", None)),
+        Scenario("tasks_upcoming", "GET", lambda r: ("/tasks/upcoming?days=7&limit=100", None)),
+        Scenario("tasks_stats", "GET", lambda r: ("/tasks/stats", None)),
+        Scenario("board_stats", "GET", lambda r: (f"/boards/{board()}/stats", None)),
+        Scenario("user_stats", "GET", lambda r: (f"/users/{teachers + student()}/stats", None)),
+        Scenario("tasks_search", "GET", lambda r: (f"/tasks/search?query={r.choice(WORDS)}", None)),
+        Scenario("search", "GET", lambda r: (f"/search?q={r.choice(WORDS)[:4]}", None)),
+        Scenario("patch_status", "PATCH", patch_status),
+    ]
+
+
+class QueryCounter:
+    """
+    Число SQL-запросов HTTP-запросов (before_cursor_execute). Фоновые задачи
+    lifespan — диспетчер outbox, напоминания о дедлайнах, чистки — опрашивают
+    БД сами по себе и не считаются: учитываются только запросы внутри
+    HTTP-запроса, который MetricsMiddleware отмечает в current_usage.
+    """
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        from backend.metrics import current_usage
+
+        self.count = 0
+        self._current_usage = current_usage
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args) -> None:
+        if self._current_usage.get() is not None:
+            self.count += 1
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Перцентиль по ближайшему рангу"""
+    index = max(int(round(q / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+async def run_scenario(client, scenario: Scenario, args, queries: Optional[QueryCounter]) -> dict:
+    rng = random.Random(f"{args.seed}:{scenario.name}")
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def issue() -> None:
+        path, body = scenario.request(rng)
+        started = perf_counter()
+        response = await client.request(scenario.method, path, json=body)
+        latencies.append(perf_counter() - started)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    async def worker(total: int, counter: List[int]) -> None:
+        while counter[0] < total:
+            counter[0] += 1
+            await issue()
+
+    # Прогрев: соединения пула, кэш компиляции запросов
+    await worker(args.warmup, [0])
+    latencies.clear()
+    statuses.clear()
+
+    queries_before = queries.count if queries else 0
+    started = perf_counter()
+    counter = [0]
+    await asyncio.gather(*(worker(args.requests, counter) for _ in range(args.concurrency)))
+    elapsed = perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": dict(sorted(statuses.items())),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "mean": round(statistics.fmean(latencies) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3),
+        },
+        "queries_per_request": round((queries.count - queries_before) / len(latencies), 2) if queries else None,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, scale: Scale) -> dict:
+    import httpx
+
+    from backend.db import engine
+
+    seeded = await seed(scale)
+    selected = [s for s in scenarios(scale) if not args.scenario or s.name in args.scenario]
+    results = {}
+    if args.url:
+        await engine.dispose()
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            for scenario in selected:
+                results[scenario.name] = await run_scenario(client, scenario, args, None)
+    else:
+        from backend.main import app
+
+        queries = QueryCounter(engine)
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                for scenario in selected:
+                    results[scenario.name] = await run_scenario(client, scenario, args, queries)
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "target": args.url or "in-process",
+            "seeded": seeded,
+            "scale": scale.__dict__,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+        },
+        "scenarios": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latency, throughput and queries per request of the hot endpoints")
+    parser.add_argument("--database-url", help="database to seed and use (default: a temporary SQLite file)")
+    parser.add_argument("--url", help="drive a running server at this base URL instead of the app in-process")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--groups", type=int, default=40)
+    parser.add_argument("--boards", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--assignees", type=float, default=1.5, help="average assignees per task")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of boards/groups/students")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--scenario", action="append", help="run only these scenarios (repeatable)")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    scale = Scale(args.users, args.groups, args.boards, args.tasks, args.assignees, args.skew, args.seed)
+    use_database(args.database_url)
+    migrate()
+    report = json.dumps(asyncio.run(run(args, scale)), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        sys.stdout.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Сериализация Page[Task]: ORM-путь против backend/fastpath.py.
+
+Отдаёт одну и ту же страницу задач обоими способами и печатает медианное
+время на страницу, ускорение и совпадают ли JSON-ответы:
+
+- orm:  select(Tasks) + loaders.to_task_schemas + валидация response_model
+        в FastAPI + JSONResponse (так списки работали раньше)
+- fast: выборка колонок задач + fastpath.task_page_response
+
+По умолчанию создаётся и заполняется временная база SQLite; с
+--database-url задачи добавляются в эту базу до --tasks штук.
+
+    python -m bench.serialization [--tasks 5000] [--page 1000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from .database import migrate, use_database
+
+
+async def seed(tasks: int) -> None:
+    """Дозаполняет базу до tasks задач: по исполнителю и два вложения на задачу"""
+    from sqlalchemy import func, insert, select
+
+    from backend.counters import rebuild_counters
+    from backend.db import SessionLocal
+    from backend.models import Groups, KanbanBoards, TaskFiles, Tasks, Users, task_assigners_table, users_tasks_table
+
+    async with SessionLocal() as db:
+        existing = await db.scalar(select(func.count()).select_from(Tasks))
+        if existing >= tasks:
+            return
+        if not await db.scalar(select(func.count()).select_from(Users)):
+            now = datetime.now()
+            await db.execute(insert(Users), [
+                {"user_id": i, "telegram_id": 10_000 + i, "name": f"User {i}",
+                 "role": "teacher" if i == 1 else "student", "email": f"user{i}@bench.local", "created_at": now}
+                for i in range(1, 51)
+            ])
+            await db.execute(insert(Groups).values(group_id=1, name="Bench", created_at=now))
+            await db.execute(insert(KanbanBoards).values(board_id=1, user_id=1, name="Bench", created_at=now))
+        user_ids = list(await db.scalars(select(Users.user_id)))
+
+        now = datetime.now()
+        statuses = ["todo", "in_progress", "done"]
+        new_ids = (await db.scalars(
+            insert(Tasks).returning(Tasks.task_id, sort_by_parameter_order=True),
+            [
+                {"title": f"Task {i}", "description": f"Description of task {i} " * 4,
+                 "deadline": now + timedelta(days=i % 30), "status": statuses[i % 3],
+                 "priority": ["low", "medium", "high"][i % 3], "group_id": 1, "board_id": 1,
+                 "created_at": now, "updated_at": now}
+                for i in range(existing, tasks)
+            ],
+        )).all()
+        await db.execute(insert(users_tasks_table), [
+            {"user_id": user_ids[task_id % len(user_ids)], "task_id": task_id, "assigned_at": now} for task_id in new_ids
+        ])
+        await db.execute(insert(task_assigners_table), [
+            {"user_id": user_ids[0], "task_id": task_id, "assigned_at": now} for task_id in new_ids
+        ])
+        await db.execute(insert(TaskFiles), [
+            {"task_id": task_id, "position": position, "path": f"/uploads/{task_id}-{position}.pdf",
+             "name": f"{task_id}-{position}.pdf", "size": 1024 * (position + 1), "sha256": "0" * 64}
+            for task_id in new_ids for position in range(2)
+        ])
+        await rebuild_counters(db)
+        await db.commit()
+
+
+async def orm_page(page) -> bytes:
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    from sqlalchemy import select
+
+    from backend.db import SessionLocal
+    from backend.loaders import to_task_schemas
+    from backend.models import Tasks
+    from backend.pagination import paginate
+    from backend.schemas.pagination import Page
+    from backend.schemas.task import Task
+
+    field = create_response_field(name="Response_get_tasks", type_=Page[Task], mode="serialization")
+    async with SessionLocal() as db:
+        tasks, next_cursor = await paginate(db, select(Tasks), [Tasks.task_id], page)
+        content = Page(items=await to_task_schemas(db, tasks), next_cursor=next_cursor)
+        return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+async def fast_page(page) -> bytes:
+    from backend.db import SessionLocal
+    from backend.fastpath import select_task_rows, task_page_response
+    from backend.models import Tasks
+
+    async with SessionLocal() as db:
+        return (await task_page_response(db, select_task_rows(), [Tasks.task_id], page)).body
+
+
+async def measure(render, page, repeat: int) -> list:
+    await render(page)  # прогрев: соединения пула, кэш компиляции запросов
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        await render(page)
+        timings.append(perf_counter() - started)
+    return timings
+
+
+async def run(args) -> None:
+    from backend.db import engine
+    from backend.pagination import PageParams
+
+    try:
+        await seed(args.tasks)
+        page = PageParams(limit=args.page, cursor=None)
+        orm_body, fast_body = await orm_page(page), await fast_page(page)
+        results = {
+            "orm": await measure(orm_page, page, args.repeat),
+            "fast": await measure(fast_page, page, args.repeat),
+        }
+    finally:
+        await engine.dispose()
+
+    print(f"page of {args.page} tasks, {args.repeat} runs, {len(fast_body)} bytes")
+    for name, timings in results.items():
+        print(f"{name:>5}: median {statistics.median(timings) * 1000:8.2f} ms, min {min(timings) * 1000:8.2f} ms")
+    print(f"speedup: {statistics.median(results['orm']) / statistics.median(results['fast']):.1f}x")
+    print(f"identical payload: {json.loads(orm_body) == json.loads(fast_body)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare ORM and fast serialization of a task page")
+    parser.add_argument("--tasks", type=int, default=5000, help="tasks in the database")
+    parser.add_argument("--page", type=int, default=1000, help="page size (at most 1000, as in the API)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--database-url", help="use this database instead of a temporary SQLite file")
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    migrate()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Нагрузочный тест рассылки /ws/tasks через WebSocket на длительном прогоне.
+
+Открывает N WebSocket-клиентов внутри процесса (без сети: каждый клиент —
+ASGI-скоуп websocket, чьи send/receive — очереди) и подписывает всех на одну
+доску, так что каждое изменение задачи расходится по всем сокетам. Часть
+клиентов медленные: читают один кадр раз в --slow-delay, а отправка на
+сервере ждёт, пока клиент заберёт предыдущий кадр, — так для Connection
+и выглядит медленный читатель на настоящем сокете. Изменения — запросы
+PATCH /tasks/{id} через настоящий эндпоинт, outbox и брокер с постоянной
+частотой в течение --duration секунд. Раз в --sample-interval часть
+быстрых клиентов переподключается (--churn).
+
+Печатает JSON:
+- перцентили задержки доставки (PATCH отправлен -> кадр прочитан клиентом)
+  отдельно для быстрых и медленных клиентов, доставлено/отброшено/отключено;
+- память на соединение: прирост RSS и кучи Python (tracemalloc, без
+  выделений самого теста) при открытии соединений;
+- перцентили задержки цикла событий по задаче, которая спит 10 мс (клиенты
+  делят цикл с сервером, но их доля в нём мала);
+- хронологию RSS, размера реестра, топиков и задач asyncio, а также что
+  осталось в реестре после ухода всех клиентов (должно быть ноль).
+
+    python -m bench.ws_soak [--clients 1000] [--slow 0.05] [--rate 20] [--duration 60]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import random
+import sys
+import tracemalloc
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from .database import migrate, use_database
+from .load import Scale, percentile, seed
+
+LAG_PROBE_INTERVAL = 0.01
+RESERVOIR_SIZE = 100_000
+
+
+class Reservoir:
+    """Равномерная выборка фиксированного размера: память не растёт за время прогона"""
+
+    def __init__(self, size: int = RESERVOIR_SIZE, rng: Optional[random.Random] = None):
+        self.size = size
+        self.values: List[float] = []
+        self.seen = 0
+        self.max = 0.0
+        self.rng = rng or random.Random(0)
+
+    def add(self, value: float) -> None:
+        self.seen += 1
+        self.max = max(self.max, value)
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            index = self.rng.randrange(self.seen)
+            if index < self.size:
+                self.values[index] = value
+
+    def summary(self) -> dict:
+        if not self.values:
+            return {"count": 0}
+        values = sorted(self.values)
+        return {
+            "count": self.seen,
+            "p50": round(percentile(values, 50) * 1000, 3),
+            "p95": round(percentile(values, 95) * 1000, 3),
+            "p99": round(percentile(values, 99) * 1000, 3),
+            "max": round(self.max * 1000, 3),
+        }
+
+
+def rss_bytes() -> int:
+    """Текущий RSS процесса (Linux: /proc; иначе — пиковый из getrusage)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Client:
+    """WebSocket-клиент внутри процесса: ASGI-сокет приложения на двух очередях"""
+
+    def __init__(self, app, query: str, slow_delay: float, sent_at: Dict[int, float], latency: Reservoir):
+        self.app = app
+        self.query = query
+        self.slow_delay = slow_delay
+        self.sent_at = sent_at
+        self.latency = latency
+        self.to_server: asyncio.Queue = asyncio.Queue()
+        # Один непрочитанный кадр: дальше send сервера ждёт, как на медленном сокете
+        self.from_server: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.accepted = asyncio.Event()
+        self.close_code: Optional[int] = None
+        self.delivered = 0
+        self._app_task: Optional[asyncio.Task] = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def connect(self) -> None:
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "http_version": "1.1",
+            "path": "/ws/tasks", "raw_path": b"/ws/tasks", "root_path": "",
+            "query_string": self.query.encode(), "headers": [(b"host", b"bench")],
+            "client": ("127.0.0.1", 0), "server": ("bench", 80), "subprotocols": [],
+        }
+        await self.to_server.put({"type": "websocket.connect"})
+        self._app_task = asyncio.create_task(self.app(scope, self.to_server.get, self._send))
+        self._reader = asyncio.create_task(self._read_loop())
+        await self.accepted.wait()
+
+    async def _send(self, message: dict) -> None:
+        if message["type"] == "websocket.accept":
+            self.accepted.set()
+        elif message["type"] == "websocket.send":
+            await self.from_server.put(message["text"])
+        elif message["type"] == "websocket.close":
+            self.close_code = message.get("code", 1000)
+            self.accepted.set()
+
+    async def _read_loop(self) -> None:
+        while True:
+            text = await self.from_server.get()
+            received = perf_counter()
+            frame = json.loads(text)
+            for event in frame if isinstance(frame, list) else [frame]:
+                sent = self.sent_at.get(event.get("task_id"))
+                if event.get("event") == "update_status" and sent is not None:
+                    self.latency.add(received - sent)
+                    self.delivered += 1
+            if self.slow_delay:
+                await asyncio.sleep(self.slow_delay)
+
+    async def disconnect(self) -> None:
+        await self.to_server.put({"type": "websocket.disconnect", "code": 1000})
+        try:
+            await asyncio.wait_for(self._app_task, 5)
+        except asyncio.TimeoutError:
+            self._app_task.cancel()
+        self._reader.cancel()
+
+
+async def probe_loop_lag(lag: Reservoir, window: List[float]) -> None:
+    """На сколько позже обещанного просыпается sleep — задержка цикла событий"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        value = max(loop.time() - started - LAG_PROBE_INTERVAL, 0.0)
+        lag.add(value)
+        window.append(value)
+
+
+async def send_updates(client, args, sent_at: Dict[int, float], stop: asyncio.Event, stats: dict) -> None:
+    """PATCH статуса задач по кругу с постоянной частотой"""
+    statuses = ("todo", "in_progress")
+    task_id, round_ = 0, 0
+    loop = asyncio.get_running_loop()
+    next_at = loop.time()
+    while not stop.is_set():
+        task_id = task_id % args.tasks + 1
+        if task_id == 1:
+            round_ += 1
+        sent_at[task_id] = perf_counter()
+        response = await client.patch(f"/tasks/{task_id}", json={"status": statuses[round_ % 2]})
+        stats["updates"] += 1
+        if response.status_code != 200:
+            stats["update_errors"] += 1
+        next_at += 1 / args.rate
+        await asyncio.sleep(max(next_at - loop.time(), 0))
+
+
+async def run(args) -> dict:
+    import httpx
+
+    from backend.main import app
+    from backend.routers.ws_notify import registry
+
+    await seed(Scale(users=100, groups=1, boards=1, tasks=args.tasks, assignees=1.0, skew=1.0, seed=1))
+    rng = random.Random(1)
+    sent_at: Dict[int, float] = {}
+    fast_latency, slow_latency, lag = Reservoir(rng=rng), Reservoir(rng=rng), Reservoir(rng=rng)
+    query = "board_id=1"
+
+    def new_client(slow: bool) -> Client:
+        return Client(app, query, args.slow_delay if slow else 0.0,
+                      sent_at, slow_latency if slow else fast_latency)
+
+    async with app.router.lifespan_context(app):
+        tasks_baseline = len(asyncio.all_tasks())
+        gc.collect()
+        rss_before = rss_bytes()
+        tracemalloc.start()
+        heap_before = tracemalloc.take_snapshot()
+        slow_count = int(args.clients * args.slow)
+        clients = [new_client(i < slow_count) for i in range(args.clients)]
+        for start in range(0, len(clients), 100):
+            await asyncio.gather(*(c.connect() for c in clients[start:start + 100]))
+        gc.collect()
+        heap_diff = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)]
+        ).compare_to(heap_before.filter_traces([tracemalloc.Filter(False, __file__)]), "filename")
+        tracemalloc.stop()
+        rss_after = rss_bytes()
+        memory = {
+            "connections": len(registry),
+            "rss_bytes_per_connection": round((rss_after - rss_before) / args.clients),
+            "python_heap_bytes_per_connection": round(sum(d.size_diff for d in heap_diff) / args.clients),
+        }
+
+        window: List[float] = []
+        prober = asyncio.create_task(probe_loop_lag(lag, window))
+        stop = asyncio.Event()
+        stats = {"updates": 0, "update_errors": 0, "reconnects": 0}
+        timeline = []
+        started = perf_counter()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60) as http:
+            updater = asyncio.create_task(send_updates(http, args, sent_at, stop, stats))
+            while perf_counter() - started < args.duration:
+                await asyncio.sleep(args.sample_interval)
+                # Переподключения: соединения должны уходить из реестра без следа
+                fast = [c for c in clients if not c.slow_delay and c.close_code is None]
+                for client in rng.sample(fast, int(len(fast) * args.churn)):
+                    await client.disconnect()
+                    clients.remove(client)
+                    replacement = new_client(False)
+                    await replacement.connect()
+                    clients.append(replacement)
+                    stats["reconnects"] += 1
+                timeline.append({
+                    "t": round(perf_counter() - started, 1),
+                    "rss_mb": round(rss_bytes() / 2 ** 20, 1),
+                    "registry_connections": len(registry),
+                    "registry_topics": len(registry._by_topic),
+                    "asyncio_tasks": len(asyncio.all_tasks()),
+                    "loop_lag_max_ms": round(max(window, default=0.0) * 1000, 3),
+                    "updates": stats["updates"],
+                })
+                window.clear()
+            stop.set()
+            await updater
+            # Даём доставить последние события
+            await asyncio.sleep(max(args.slow_delay * 2, 1.0))
+
+        dropped = sum(connection.dropped for connection in list(registry._topics_of))
+        disconnected = sum(1 for c in clients if c.close_code is not None)
+        for start in range(0, len(clients), 100):
+            await asyncio.gather(*(c.disconnect() for c in clients[start:start + 100]))
+        prober.cancel()
+        await asyncio.sleep(0.1)
+        gc.collect()
+        leftover = {
+            "registry_connections": len(registry),
+            "registry_topics": len(registry._by_topic),
+            "asyncio_tasks_over_baseline": len(asyncio.all_tasks()) - tasks_baseline,
+        }
+
+    fast_clients = [c for c in clients if not c.slow_delay]
+    slow_clients = [c for c in clients if c.slow_delay]
+    return {
+        "meta": {
+            "clients": args.clients, "slow_clients": slow_count, "slow_delay_s": args.slow_delay,
+            "rate_per_s": args.rate, "duration_s": args.duration, "tasks": args.tasks, "churn": args.churn,
+        },
+        "updates": stats,
+        "delivery_latency_ms": {"fast": fast_latency.summary(), "slow": slow_latency.summary()},
+        "delivered_per_client": {
+            "fast_mean": round(sum(c.delivered for c in fast_clients) / max(len(fast_clients), 1), 1),
+            "slow_mean": round(sum(c.delivered for c in slow_clients) / max(len(slow_clients), 1), 1),
+        },
+        "dropped_messages": dropped,
+        "disconnected_by_server": disconnected,
+        "memory": memory,
+        "loop_lag_ms": lag.summary(),
+        "timeline": timeline,
+        "after_close": leftover,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="WebSocket fan-out soak test")
+    parser.add_argument("--database-url", help="default: a temporary SQLite file")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--slow", type=float, default=0.05, help="share of slow clients")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="seconds a slow client spends per frame")
+    parser.add_argument("--rate", type=float, default=20.0, help="task updates per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--tasks", type=int, default=200, help="tasks updated in turn")
+    parser.add_argument("--sample-interval", type=float, default=5.0)
+    parser.add_argument("--churn", type=float, default=0.02, help="share of fast clients reconnecting per sample")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    use_database(args.database_url)
+    migrate()
+    # Строка INFO на каждое соединение заглушила бы отчёт
+    logging.getLogger("backend.routers.ws_notify").setLevel(logging.WARNING)
+    report = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        sys.stdout.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
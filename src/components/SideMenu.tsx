@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { cn } from '../lib/utils';
+import { fetchAllPages } from '../lib/api';
 
 interface Group {
   group_id: number;
@@ -26,9 +27,7 @@ export const SideMenu: React.FC<SideMenuProps> = ({
   useEffect(() => {
     const fetchGroups = async () => {
       try {
-        const response = await fetch('http://localhost:8000/groups');
-        const data = await response.json();
-        setGroups(data);
+        setGroups(await fetchAllPages<Group>('http://localhost:8000/groups'));
       } catch (error) {
         console.error('Ошибка при загрузке групп:', error);
       }
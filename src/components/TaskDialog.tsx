@@ -4,6 +4,7 @@ import { Button } from './ui/button';
 import { Input } from './ui/input';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from './ui/select';
 import { useAuth } from '../lib/auth/AuthContext';
+import { fetchAllPages } from '../lib/api';
 import { CalendarIcon, UserIcon, FlagIcon } from 'lucide-react';
 
 interface TaskDialogProps {
@@ -39,12 +40,12 @@ export const TaskDialog: React.FC<TaskDialogProps> = ({
 
   React.useEffect(() => {
     if (!open || userType !== 'teacher') return;
-    fetch('http://localhost:8000/users')
-      .then(res => res.json())
-      .then(data => {
-        const students = data.filter((u: any) => u.role === 'student');
+    fetchAllPages('http://localhost:8000/users')
+      .then(items => {
+        const students = items.filter((u: any) => u.role === 'student');
         setUsers(students);
-      });
+      })
+      .catch(error => console.error('Ошибка при загрузке пользователей:', error));
   }, [open, userType]);
 
   const handleSubmit = async (e: React.FormEvent<HTMLFormElement>) => {
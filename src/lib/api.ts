@@ -0,0 +1,25 @@
+// Размер страницы при выгрузке списка целиком (MAX_LIMIT бэкенда)
+const PAGE_LIMIT = 1000;
+
+interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+}
+
+// Загружает все страницы постраничного списка, следуя next_cursor до конца
+export async function fetchAllPages<T = any>(url: string): Promise<T[]> {
+  const separator = url.includes('?') ? '&' : '?';
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const pageUrl: string = `${url}${separator}limit=${PAGE_LIMIT}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+    const response = await fetch(pageUrl);
+    if (!response.ok) {
+      throw new Error(`${pageUrl}: ${response.status}`);
+    }
+    const page: Page<T> = await response.json();
+    items.push(...page.items);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return items;
+}
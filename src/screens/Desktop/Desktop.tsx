@@ -7,6 +7,7 @@ import { ViewByAnima } from "./sections/ViewByAnima/ViewByAnima";
 import { TaskDialog } from "../../components/TaskDialog";
 import { DraggableTask } from "./sections/DraggableTask";
 import { useAuth } from '../../lib/auth/AuthContext';
+import { fetchAllPages } from '../../lib/api';
 
 export interface Task {
   id: number;
@@ -33,16 +34,11 @@ export const Desktop = (): JSX.Element => {
   const fetchTasks = async () => {
     if (!selectedGroup) return;
     try {
-      let response, data;
-      if (userType === 'student' && currentUser) {
-        response = await fetch(`http://localhost:8000/users_tasks/${currentUser.user_id}`);
-        data = await response.json();
-        // data — массив задач, назначенных студенту
-      } else {
-        response = await fetch(`http://localhost:8000/tasks/group/${selectedGroup.id}`);
-        data = await response.json();
-      }
-      const mappedTasks = data.map((task: any) => ({
+      // Списки постраничные: загружаем все страницы по next_cursor
+      const items = userType === 'student' && currentUser
+        ? await fetchAllPages(`http://localhost:8000/users_tasks/${currentUser.user_id}`)
+        : await fetchAllPages(`http://localhost:8000/tasks/group/${selectedGroup.id}`);
+      const mappedTasks = items.map((task: any) => ({
         id: task.task_id,
         subject: task.title,
         description: task.description || '',
@@ -70,10 +66,8 @@ export const Desktop = (): JSX.Element => {
   useEffect(() => {
     const fetchUsers = async () => {
       try {
-        const response = await fetch('http://localhost:8000/users');
-        const data = await response.json();
         const userMap: Record<number, string> = {};
-        data.forEach((user: any) => {
+        (await fetchAllPages('http://localhost:8000/users')).forEach((user: any) => {
           userMap[user.user_id] = user.name;
         });
         setUsers(userMap);
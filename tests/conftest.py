@@ -0,0 +1,53 @@
+"""
+Тесты гоняют приложение на временной базе SQLite (aiosqlite), схема — миграциями.
+Адрес базы выставляется до импорта backend: engine создаётся при импорте backend.db.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(prefix="kanban-test-"), "test.db")
+
+
+def migrate() -> None:
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "backend", "migrations"))
+    command.upgrade(config, "head")
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Один TestClient на сессию: lifespan приложения запускается один раз
+    from fastapi.testclient import TestClient
+
+    migrate()
+    from backend.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def count_queries():
+    """Счётчик SQL-запросов HTTP-запросов (фоновые задачи приложения не считаются)"""
+    from sqlalchemy import event
+
+    from backend.db import engine
+    from backend.metrics import current_usage
+
+    counter = {"queries": 0}
+
+    def on_execute(*args):
+        if current_usage.get() is not None:
+            counter["queries"] += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+    yield counter
+    event.remove(engine.sync_engine, "before_cursor_execute", on_execute)
@@ -0,0 +1,19 @@
+import pytest
+from pydantic import ValidationError
+
+from backend.schemas.task import BulkTaskCreate
+
+
+def test_template_is_expanded_per_user():
+    bulk = BulkTaskCreate(template={"title": "Отчёт"}, user_ids=[1, 2])
+    assert [(task.title, task.user_id) for task in bulk.expand()] == [("Отчёт", 1), ("Отчёт", 2)]
+
+
+@pytest.mark.parametrize("payload", [
+    {"user_ids": [1]},
+    {"template": {"title": "Отчёт"}},
+    {"template": {"title": "Отчёт"}, "user_ids": []},
+])
+def test_template_and_user_ids_go_together(payload):
+    with pytest.raises(ValidationError):
+        BulkTaskCreate(**payload)
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+from collections import Counter
+
+import pytest
+from sqlalchemy import event
+
+from backend.models import TaskEvents
+
+
+def database():
+    return sqlite3.connect(os.environ["DATABASE_URL"].split(":///", 1)[1])
+
+
+def counters() -> Counter:
+    with database() as connection:
+        rows = connection.execute("SELECT scope_type, scope_id, status, count FROM task_counters").fetchall()
+    connection.close()
+    return Counter({(scope_type, scope_id, status): count for scope_type, scope_id, status, count in rows})
+
+
+@pytest.fixture
+def written_events():
+    """Строки task_events, записанные за тест (диспетчер outbox удаляет их после публикации)"""
+    written = []
+
+    def on_insert(mapper, connection, target):
+        written.append(target.payload)
+
+    event.listen(TaskEvents, "after_insert", on_insert)
+    yield written
+    event.remove(TaskEvents, "after_insert", on_insert)
+
+
+def test_bulk_status_across_boards(client, written_events):
+    client.post("/users", json={"telegram_id": 301, "name": "Исполнитель", "role": "student",
+                                "email": "u301@example.com"})
+    user_id = next(user["user_id"] for user in client.get("/users?limit=1000").json()["items"]
+                   if user["telegram_id"] == 301)
+    boards = [client.post("/boards", json={"name": f"Доска {i}"}).json()["board_id"] for i in range(2)]
+    created = client.post("/tasks/bulk", json={"tasks": [
+        {"title": "A", "board_id": boards[0], "user_id": user_id},
+        {"title": "B", "board_id": boards[1], "user_id": user_id},
+        {"title": "C", "board_id": boards[1]},
+    ]}).json()
+    task_ids = [task["task_id"] for task in created]
+    client.put("/tasks/bulk/status", json={"task_ids": task_ids[1:2], "status": "in_progress"})
+    client.put("/tasks/bulk/status", json={"task_ids": task_ids[2:], "status": "done"})
+    before = counters()
+    written_events.clear()
+
+    response = client.put("/tasks/bulk/status", json={"task_ids": task_ids + task_ids[:1], "status": "done"})
+    assert response.status_code == 200
+    updated = sorted(response.json()["updated"], key=lambda row: row["task_id"])
+    assert updated == [
+        {"task_id": task_ids[0], "old_status": "todo", "status": "done"},
+        {"task_id": task_ids[1], "old_status": "in_progress", "status": "done"},
+    ]
+
+    # По событию update_status на каждую изменённую задачу, для неизменённой — ни одного
+    assert sorted((e["event"], e["task_id"], e["old_status"]) for e in written_events) == [
+        ("update_status", task_ids[0], "todo"),
+        ("update_status", task_ids[1], "in_progress"),
+    ]
+
+    after = counters()
+    delta = {key: after[key] - before[key] for key in before.keys() | after.keys() if after[key] != before[key]}
+    expected = Counter()
+    for task_id, old_status, board_id in ((task_ids[0], "todo", boards[0]), (task_ids[1], "in_progress", boards[1])):
+        for scope in (("board", board_id), ("user", user_id)):
+            expected[(*scope, old_status)] -= 1
+            expected[(*scope, "done")] += 1
+    with database() as connection:
+        group_ids = dict(connection.execute(
+            f"SELECT task_id, group_id FROM tasks WHERE task_id IN ({task_ids[0]}, {task_ids[1]})"
+        ).fetchall())
+    connection.close()
+    for task_id, old_status in ((task_ids[0], "todo"), (task_ids[1], "in_progress")):
+        if group_ids[task_id] is not None:
+            expected[("group", group_ids[task_id], old_status)] -= 1
+            expected[("group", group_ids[task_id], "done")] += 1
+    assert delta == {key: value for key, value in expected.items() if value}
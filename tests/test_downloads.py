@@ -0,0 +1,109 @@
+import hashlib
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from backend.downloads import MAX_RANGES, RangeNotSatisfiable, file_response, parse_range
+
+DATA = bytes(range(256)) * 4  # 1024 байта
+
+
+@pytest.fixture(scope="module")
+def downloads(tmp_path_factory):
+    # Отдельное маленькое приложение: file_response не зависит от маршрутов и БД
+    path = str(tmp_path_factory.mktemp("downloads") / "file.bin")
+    with open(path, "wb") as f:
+        f.write(DATA)
+    sha256 = hashlib.sha256(DATA).hexdigest()
+    app = FastAPI()
+
+    @app.get("/blob")
+    async def blob(request: Request):
+        return file_response(request, path, "file.bin", sha256)
+
+    @app.get("/legacy")
+    async def legacy(request: Request):
+        return file_response(request, path, "file.bin")
+
+    return TestClient(app)
+
+
+def test_suffix_and_open_ranges():
+    assert parse_range("bytes=-100", 1024) == [(924, 1023)]
+    assert parse_range("bytes=-5000", 1024) == [(0, 1023)]
+    assert parse_range("bytes=1000-", 1024) == [(1000, 1023)]
+    assert parse_range("bytes=10-5000", 1024) == [(10, 1023)]
+
+
+def test_overlapping_and_adjacent_ranges_are_merged():
+    assert parse_range("bytes=500-600, 0-10, 550-700, 11-20", 1024) == [(0, 20), (500, 700)]
+
+
+def test_unknown_or_invalid_range_is_ignored():
+    assert parse_range("items=0-10", 1024) is None
+    assert parse_range("bytes=20-10", 1024) is None
+    assert parse_range("bytes=abc", 1024) is None
+
+
+def test_too_many_ranges_fall_back_to_full_file(downloads):
+    spec = ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(MAX_RANGES + 1))
+    assert parse_range(f"bytes={spec}", 1024) is None
+    response = downloads.get("/blob", headers={"Range": f"bytes={spec}"})
+    assert response.status_code == 200
+    assert response.content == DATA
+
+
+def test_unsatisfiable_range(downloads):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=2000-", 1024)
+    response = downloads.get("/blob", headers={"Range": "bytes=2000-3000"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1024"
+
+
+def test_single_range(downloads):
+    response = downloads.get("/blob", headers={"Range": "bytes=-100"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 924-1023/1024"
+    assert response.content == DATA[924:]
+
+
+def test_if_range_mismatch_returns_full_file(downloads):
+    response = downloads.get("/blob", headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+    assert response.status_code == 200
+    assert response.content == DATA
+    etag = response.headers["etag"]
+    response = downloads.get("/blob", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 206
+    # Слабый ETag не годится для If-Range
+    weak = downloads.get("/legacy").headers["etag"]
+    assert downloads.get("/legacy", headers={"Range": "bytes=0-9", "If-Range": weak}).status_code == 200
+
+
+def test_multipart_byteranges(downloads):
+    response = downloads.get("/blob", headers={"Range": "bytes=0-9,100-109"})
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    assert int(response.headers["content-length"]) == len(response.content)
+    boundary = content_type.split("boundary=")[1].encode()
+    body = response.content
+    assert body.endswith(b"\r\n--" + boundary + b"--\r\n")
+    assert b"Content-Range: bytes 0-9/1024\r\n\r\n" + DATA[0:10] in body
+    assert b"Content-Range: bytes 100-109/1024\r\n\r\n" + DATA[100:110] in body
+
+
+def test_not_modified(downloads):
+    response = downloads.get("/blob")
+    assert response.headers["cache-control"].endswith("immutable")
+    assert downloads.get("/blob", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+    response = downloads.get("/legacy")
+    last_modified = response.headers["last-modified"]
+    assert downloads.get("/legacy", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert downloads.get("/legacy", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    # If-None-Match важнее If-Modified-Since
+    assert downloads.get("/legacy", headers={
+        "If-None-Match": '"other"', "If-Modified-Since": last_modified,
+    }).status_code == 200
@@ -0,0 +1,26 @@
+import hashlib
+import os
+
+from backend import files
+
+
+def test_legacy_file_is_hashed_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(files, "UPLOAD_DIR", str(tmp_path))
+    files.legacy_sha256.cache_clear()
+    path = tmp_path / "отчёт.pdf"
+    path.write_bytes(b"first")
+
+    opened = []
+    real_open = open
+    monkeypatch.setattr("builtins.open", lambda *args, **kwargs: opened.append(args[0]) or real_open(*args, **kwargs))
+    for _ in range(3):
+        description = files.describe_file("/uploads/отчёт.pdf")
+    assert description["sha256"] == hashlib.sha256(b"first").hexdigest()
+    assert description["size"] == 5
+    assert opened == [str(path)]
+
+    # Файл перезаписан — новый размер и mtime, хэш считается заново
+    path.write_bytes(b"second")
+    os.utime(path, ns=(0, 10 ** 9))
+    assert files.describe_file("/uploads/отчёт.pdf")["sha256"] == hashlib.sha256(b"second").hexdigest()
+    assert len(opened) == 2
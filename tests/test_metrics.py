@@ -0,0 +1,18 @@
+import re
+
+
+def metric(client, name: str, **labels) -> float:
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{name}\{{{re.escape(label_text)}\}} (\S+)$", client.get("/metrics").text, re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_db_rows_are_counted_per_request(client):
+    for i in range(3):
+        client.post("/boards", json={"name": f"Метрики {i}"})
+    before = metric(client, "http_request_db_rows_sum", method="GET", route="/boards")
+
+    boards = client.get("/boards?limit=1000").json()["items"]
+    # Одна страница — один SELECT; строк столько, сколько досок в ответе
+    assert metric(client, "http_request_db_rows_sum", method="GET", route="/boards") - before == len(boards)
+    assert metric(client, "http_request_db_rows_count", method="GET", route="/boards") >= 1
@@ -0,0 +1,38 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from backend.models import Tasks
+from backend.pagination import decode_cursor, encode_cursor
+
+
+def raw_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    deadline = datetime(2024, 3, 1, 12, 30)
+    keys = [Tasks.deadline, Tasks.task_id]
+    assert decode_cursor(encode_cursor([deadline, 7]), keys) == [deadline, 7]
+
+
+@pytest.mark.parametrize("values", [["abc"], [True], [1.5], [None], [[1]], [1, 2]])
+def test_cursor_with_wrong_values_is_rejected(values):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(raw_cursor(values), [Tasks.task_id])
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("values", [[5, 1], ["not a date", 1], ["2024-03-01T12:30:00", "1"]])
+def test_cursor_with_wrong_datetime_key_is_rejected(values):
+    with pytest.raises(HTTPException):
+        decode_cursor(raw_cursor(values), [Tasks.deadline, Tasks.task_id])
+
+
+def test_invalid_cursor_is_400(client):
+    response = client.get("/tasks", params={"cursor": raw_cursor(["abc"])})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
@@ -0,0 +1,49 @@
+import json
+
+from backend.pubsub import NOTIFY_PAYLOAD_LIMIT, PostgresBroker, split_payload
+
+
+def listener(delivered: list) -> PostgresBroker:
+    broker = PostgresBroker("postgresql://localhost/test", "task_events")
+    broker._deliver = lambda event, topics: delivered.append((event, topics))
+    return broker
+
+
+def test_small_payload_is_sent_as_is():
+    payload = json.dumps({"event": {"task_id": 1}, "topics": ["user:1"]})
+    assert split_payload(payload) == [payload]
+
+
+def test_large_payload_is_split_and_reassembled():
+    event = {"event": "update_status", "task_id": 1, "description": "отчёт " * 5000}
+    payload = json.dumps({"event": event, "topics": ["board:1"]})
+    parts = split_payload(payload)
+    assert len(parts) > 1
+    assert all(len(part.encode()) <= NOTIFY_PAYLOAD_LIMIT for part in parts)
+
+    delivered = []
+    broker = listener(delivered)
+    for part in parts:
+        broker._on_notify(None, 42, "task_events", part)
+    assert delivered == [(event, ["board:1"])]
+    assert broker._partial == {}
+
+
+def test_parts_of_different_senders_do_not_mix():
+    first = split_payload(json.dumps({"event": {"n": "a" * 20000}, "topics": ["user:1"]}))
+    second = split_payload(json.dumps({"event": {"n": "b" * 20000}, "topics": ["user:2"]}))
+    delivered = []
+    broker = listener(delivered)
+    for a, b in zip(first, second):
+        broker._on_notify(None, 1, "task_events", a)
+        broker._on_notify(None, 2, "task_events", b)
+    assert [topics for _, topics in delivered] == [["user:1"], ["user:2"]]
+
+
+def test_out_of_order_part_drops_the_message():
+    parts = split_payload(json.dumps({"event": {"n": "a" * 20000}, "topics": ["user:1"]}))
+    delivered = []
+    broker = listener(delivered)
+    for part in parts[1:]:
+        broker._on_notify(None, 1, "task_events", part)
+    assert delivered == []
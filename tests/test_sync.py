@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.config import settings
+from backend.pagination import encode_cursor
+
+
+def sync(client, scope: str, since: str = None, limit: int = 100) -> dict:
+    params = {"scope": scope, "limit": limit}
+    if since:
+        params["since"] = since
+    response = client.get("/sync", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def changed_ids(result: dict) -> list:
+    return [task["task_id"] for task in result["changed"]]
+
+
+def removed(result: dict) -> list:
+    return [(row["task_id"], row["reason"]) for row in result["removed"]]
+
+
+@pytest.fixture
+def user_id(client):
+    client.post("/users", json={"telegram_id": 401, "name": "Синхронизация", "role": "student",
+                                "email": "u401@example.com"})
+    return next(user["user_id"] for user in client.get("/users?limit=1000").json()["items"]
+                if user["telegram_id"] == 401)
+
+
+def new_board(client) -> int:
+    return client.post("/boards", json={"name": "Синхронизация"}).json()["board_id"]
+
+
+def test_cursor_round_trip(client):
+    board_id = new_board(client)
+    task_ids = [task["task_id"] for task in client.post("/tasks/bulk", json={"tasks": [
+        {"title": f"Задача {i}", "board_id": board_id} for i in range(3)
+    ]}).json()]
+
+    first = sync(client, f"board:{board_id}", limit=2)
+    assert first["has_more"]
+    second = sync(client, f"board:{board_id}", first["next_cursor"], limit=2)
+    assert not second["has_more"]
+    assert sorted(changed_ids(first) + changed_ids(second)) == sorted(task_ids)
+
+    # Ничего не менялось — пусто, курсор годится повторно
+    idle = sync(client, f"board:{board_id}", second["next_cursor"])
+    assert idle["changed"] == [] and idle["removed"] == []
+
+    client.patch(f"/tasks/{task_ids[1]}", json={"status": "done"})
+    after = sync(client, f"board:{board_id}", idle["next_cursor"])
+    assert changed_ids(after) == [task_ids[1]]
+    assert after["changed"][0]["status"] == "done"
+
+
+def test_tombstones_after_move_unassign_and_delete(client, user_id):
+    board_id, other_board_id = new_board(client), new_board(client)
+    moved, unassigned, deleted = [task["task_id"] for task in client.post("/tasks/bulk", json={"tasks": [
+        {"title": "Перенос", "board_id": board_id, "user_id": user_id},
+        {"title": "Снятие", "board_id": board_id, "user_id": user_id},
+        {"title": "Удаление", "board_id": board_id, "user_id": user_id},
+    ]}).json()]
+    board_cursor = sync(client, f"board:{board_id}")["next_cursor"]
+    user_cursor = sync(client, f"user:{user_id}")["next_cursor"]
+    other_cursor = sync(client, f"board:{other_board_id}")["next_cursor"]
+
+    client.patch(f"/tasks/{moved}", json={"board_id": other_board_id})
+    response = client.request("DELETE", "/users_tasks", json={"user_id": user_id, "task_id": unassigned})
+    assert response.status_code == 200
+    assert client.delete(f"/tasks/{deleted}").status_code == 200
+
+    board = sync(client, f"board:{board_id}", board_cursor)
+    assert sorted(removed(board)) == [(moved, "moved"), (deleted, "deleted")]
+    assert changed_ids(board) == [unassigned]
+
+    assert changed_ids(sync(client, f"board:{other_board_id}", other_cursor)) == [moved]
+
+    user = sync(client, f"user:{user_id}", user_cursor)
+    assert sorted(removed(user)) == [(unassigned, "unassigned"), (deleted, "deleted")]
+    assert changed_ids(user) == [moved]
+
+
+def test_expired_cursor(client):
+    issued_at = datetime.now() - timedelta(days=settings.sync_tombstone_retention_days + 1)
+    response = client.get("/sync", params={"scope": "board:1", "since": encode_cursor([0, 0, 0, issued_at])})
+    assert response.status_code == 410
+
+
+def test_invalid_scope_and_cursor(client):
+    assert client.get("/sync", params={"scope": "team:1"}).status_code == 400
+    assert client.get("/sync", params={"scope": "board:1", "since": "abc"}).status_code == 400
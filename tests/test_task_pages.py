@@ -0,0 +1,29 @@
+import pytest
+
+
+@pytest.fixture(scope="module")
+def tasks(client):
+    for telegram_id, role in ((101, "teacher"), (102, "student"), (103, "student")):
+        client.post("/users", json={"telegram_id": telegram_id, "name": f"User {telegram_id}",
+                                    "role": role, "email": f"u{telegram_id}@example.com"})
+    users = [user["user_id"] for user in client.get("/users").json()["items"]]
+    response = client.post("/tasks/bulk", json={"tasks": [
+        {"title": f"Task {i}", "user_id": users[1 + i % 2], "assigner_id": users[0],
+         "assigned_files": [f"/uploads/file-{i}.pdf"]}
+        for i in range(60)
+    ]})
+    assert response.status_code == 200
+    return response.json()
+
+
+def page_queries(client, count_queries, limit: int) -> int:
+    count_queries["queries"] = 0
+    response = client.get(f"/tasks?limit={limit}")
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == limit
+    return count_queries["queries"]
+
+
+def test_task_page_query_count_does_not_depend_on_page_size(client, tasks, count_queries):
+    # Исполнители, назначившие и вложения грузятся пачкой на страницу, а не по задаче
+    assert page_queries(client, count_queries, 2) == page_queries(client, count_queries, 50)
@@ -0,0 +1,19 @@
+import os
+import sqlite3
+
+
+def database_path() -> str:
+    return os.environ["DATABASE_URL"].split(":///", 1)[1]
+
+
+def test_stats_include_tasks_without_board(client):
+    # Задачи без доски (например, из старых данных) не попадают в счётчики досок
+    with sqlite3.connect(database_path()) as connection:
+        connection.execute("INSERT INTO tasks (title, status, board_id, group_id) VALUES ('Без доски', 'todo', NULL, NULL)")
+        total, = connection.execute("SELECT count(*) FROM tasks").fetchone()
+        todo, = connection.execute("SELECT count(*) FROM tasks WHERE status = 'todo'").fetchone()
+    connection.close()
+
+    stats = client.get("/tasks/stats").json()
+    assert stats["total_tasks"] == total
+    assert stats["tasks_by_status"]["todo"] == todo
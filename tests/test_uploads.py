@@ -0,0 +1,133 @@
+import hashlib
+import os
+import sqlite3
+
+import pytest
+
+from backend import files, resumable
+
+
+@pytest.fixture(autouse=True)
+def storage(tmp_path, monkeypatch):
+    # Хранилище и частичные файлы — во временном каталоге, а не в backend/uploads
+    monkeypatch.setattr(files, "BLOB_DIR", str(tmp_path / "sha256"))
+    monkeypatch.setattr(resumable, "PARTIAL_DIR", str(tmp_path))
+    return tmp_path
+
+
+def start(client, data: bytes, sha256: str = None) -> str:
+    body = {"name": "отчёт.pdf", "size": len(data)}
+    if sha256:
+        body["sha256"] = sha256
+    response = client.post("/uploads/sessions", json=body)
+    assert response.status_code == 200
+    return response.json()["session_id"]
+
+
+def put(client, session_id: str, data: bytes, start: int, end: int) -> dict:
+    response = client.put(f"/uploads/sessions/{session_id}?offset={start}", content=data[start:end])
+    assert response.status_code == 200
+    return response.json()
+
+
+def finalize(client, session_id: str, **body):
+    return client.post(f"/uploads/sessions/{session_id}/finalize", json=body or None)
+
+
+def test_out_of_order_and_overlapping_chunks(client):
+    data = os.urandom(3000)
+    session_id = start(client, data, hashlib.sha256(data).hexdigest())
+    put(client, session_id, data, 2000, 3000)
+    put(client, session_id, data, 0, 1200)
+    state = put(client, session_id, data, 1000, 2100)
+    assert state["received"] == [[0, 3000]] and state["complete"]
+
+    response = finalize(client, session_id)
+    assert response.status_code == 200
+    uploaded = response.json()
+    assert uploaded["sha256"] == hashlib.sha256(data).hexdigest()
+    assert uploaded["size"] == 3000 and not uploaded["deduplicated"]
+    with open(files.blob_path(uploaded["sha256"]), "rb") as f:
+        assert f.read() == data
+    assert client.get(f"/uploads/sessions/{session_id}").status_code == 404
+
+
+def test_incomplete_upload_is_rejected(client):
+    data = os.urandom(1000)
+    session_id = start(client, data)
+    put(client, session_id, data, 0, 300)
+    put(client, session_id, data, 600, 1000)
+
+    response = finalize(client, session_id)
+    assert response.status_code == 409
+    assert response.json()["detail"]["missing"] == [[300, 600]]
+    # Сессия жива — можно дослать недостающее
+    put(client, session_id, data, 300, 600)
+    assert finalize(client, session_id).status_code == 200
+
+
+def test_sha256_mismatch(client, storage):
+    data = os.urandom(500)
+    session_id = start(client, data, "0" * 64)
+    put(client, session_id, data, 0, 500)
+
+    response = finalize(client, session_id)
+    assert response.status_code == 422
+    assert client.get(f"/uploads/sessions/{session_id}").status_code == 404
+    assert not os.path.exists(resumable.partial_path(session_id))
+
+
+def test_same_content_is_deduplicated(client):
+    data = os.urandom(800)
+    first, second = start(client, data), start(client, data)
+    put(client, first, data, 0, 800)
+    put(client, second, data, 0, 800)
+
+    assert finalize(client, first).json()["deduplicated"] is False
+    uploaded = finalize(client, second).json()
+    assert uploaded["deduplicated"] is True
+    assert not os.path.exists(resumable.partial_path(second))
+
+
+def test_start_written_by_another_worker_is_rehashed(client):
+    data = os.urandom(1000)
+    session_id = start(client, data)
+    put(client, session_id, data, 0, 1000)
+
+    # Другой воркер того же хоста переписал начало файла: в хэше этого процесса его нет
+    rewritten = os.urandom(400)
+    fd = os.open(resumable.partial_path(session_id), os.O_WRONLY)
+    os.pwrite(fd, rewritten, 0)
+    os.close(fd)
+    with sqlite3.connect(os.environ["DATABASE_URL"].split(":///", 1)[1]) as connection:
+        connection.execute(
+            "INSERT INTO upload_chunks (session_id, start, \"end\") VALUES (?, 0, 400)", (session_id,)
+        )
+    connection.close()
+
+    response = finalize(client, session_id)
+    assert response.status_code == 200
+    assert response.json()["sha256"] == hashlib.sha256(rewritten + data[400:]).hexdigest()
+
+
+def test_finalize_attaches_file_to_task(client):
+    task = client.post("/tasks", json={"title": "Отчёт"}).json()
+    data = os.urandom(200)
+    session_id = start(client, data)
+    put(client, session_id, data, 0, 200)
+
+    uploaded = finalize(client, session_id, task_id=task["task_id"]).json()
+    attached = client.get(f"/tasks/{task['task_id']}").json()["assigned_files"]
+    assert attached[-1] == uploaded["file_path"]
+    assert finalize(client, session_id).status_code in (404, 409)
+
+
+def test_finalize_for_missing_task_keeps_session(client):
+    data = os.urandom(200)
+    session_id = start(client, data)
+    put(client, session_id, data, 0, 200)
+
+    assert finalize(client, session_id, task_id=10 ** 6).status_code == 404
+    # Ничего не перенесено и не удалено — повтор без задачи проходит
+    assert os.path.exists(resumable.partial_path(session_id))
+    assert finalize(client, session_id).status_code == 200
@@ -0,0 +1,65 @@
+import json
+
+from backend.routers.ws_notify import coalesce
+
+
+def message(**event) -> tuple:
+    return event, json.dumps(event)
+
+
+def events(messages: list) -> list:
+    result = coalesce(messages)
+    assert all(json.loads(text) == event for event, text in result)
+    return [event for event, _ in result]
+
+
+def created(task_id: int, timestamp: int = 1) -> tuple:
+    return message(event="new_task", user_id=7, task_id=task_id, timestamp=timestamp)
+
+
+def updated(task_id: int, old_status: str, status: str, timestamp: int = 1) -> tuple:
+    return message(event="update_status", user_ids=[7], task_id=task_id,
+                   status=status, old_status=old_status, timestamp=timestamp)
+
+
+def deleted(task_id: int, timestamp: int = 1) -> tuple:
+    return message(event="delete_task", user_ids=[7], task_id=task_id, timestamp=timestamp)
+
+
+def test_updates_keep_earliest_old_status():
+    result = events([updated(1, "todo", "in_progress", 1), updated(1, "in_progress", "done", 2)])
+    assert [(e["event"], e["old_status"], e["status"], e["timestamp"]) for e in result] == [
+        ("update_status", "todo", "done", 2),
+    ]
+
+
+def test_update_is_folded_into_new_task():
+    result = events([created(1, 1), updated(1, "todo", "in_progress", 2), updated(1, "in_progress", "done", 3)])
+    assert result == [{"event": "new_task", "user_id": 7, "task_id": 1, "status": "done", "timestamp": 3}]
+
+
+def test_new_task_after_update_is_kept():
+    result = events([updated(1, "todo", "done"), created(1)])
+    assert [e["event"] for e in result] == ["update_status", "new_task"]
+
+
+def test_delete_replaces_updates():
+    result = events([updated(1, "todo", "done"), updated(2, "todo", "done"), deleted(1)])
+    assert [(e["event"], e["task_id"]) for e in result] == [("update_status", 2), ("delete_task", 1)]
+
+
+def test_delete_keeps_new_task():
+    result = events([created(1), updated(1, "todo", "done"), deleted(1)])
+    assert [e["event"] for e in result] == ["new_task", "delete_task"]
+
+
+def test_reminders_merge_only_with_same_kind():
+    due_soon = message(event="deadline_due_soon", user_ids=[7], task_id=1, timestamp=1)
+    overdue = message(event="deadline_overdue", user_ids=[7], task_id=1, timestamp=2)
+    result = events([due_soon, updated(1, "todo", "in_progress"), overdue, due_soon])
+    assert [e["event"] for e in result] == ["update_status", "deadline_overdue", "deadline_due_soon"]
+
+
+def test_events_without_task_are_kept():
+    ping = message(event="ping")
+    assert events([ping, ping]) == [{"event": "ping"}, {"event": "ping"}]